@@ -0,0 +1,245 @@
+# cache.py
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Optional
+from dotenv import load_dotenv
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from .cassette import cassette
+from .metrics import cache_requests
+
+load_dotenv()
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 24 * 60 * 60))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+
+# Set to True for the duration of a request to skip cache reads (fresh responses are still stored).
+cache_bypass = contextvars.ContextVar("cache_bypass", default=False)
+
+
+@contextmanager
+def bypassing_cache(active: bool = True):
+    """
+    Skips cache reads inside the block when `active`, on top of any request-wide bypass.
+    """
+    token = cache_bypass.set(cache_bypass.get() or active)
+    try:
+        yield
+    finally:
+        cache_bypass.reset(token)
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    created_at: float
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+
+class SQLiteCache:
+    """
+    Small persistent key/value store with per-entry TTL and LRU eviction.
+
+    Every call opens its own connection, so one file can be shared by threads
+    and by every uvicorn worker process. Values are stored as JSON.
+    """
+
+    def __init__(self, name: str, max_entries: int = 1000, path: Optional[str] = None):
+        self.path = path or os.path.join(CACHE_DIR, "cache.sqlite")
+        self.table = name
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        Returns the entry for key, including expired ones so callers can serve stale data.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT value, created_at, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return CacheEntry(value=json.loads(row[0]), created_at=row[1], expires_at=row[2])
+
+    def set(self, key: str, value: Any, ttl: float):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value), now, now + ttl, now),
+            )
+            # Evict least recently used entries beyond the size limit
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key: str):
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def keys(self) -> list[str]:
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(f"SELECT key FROM {self.table}")]
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class BackgroundRefresher:
+    """
+    Runs stale-while-revalidate refreshes: at most one in flight per key,
+    on an asyncio task when called from the loop or a daemon thread otherwise.
+    """
+
+    def __init__(self):
+        self._keys = set()
+        self._lock = threading.Lock()
+        self._tasks = set()
+
+    def _claim(self, key: str) -> bool:
+        with self._lock:
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+            return True
+
+    def _release(self, key: str):
+        with self._lock:
+            self._keys.discard(key)
+
+    def start(self, key: str, func, *args):
+        if not self._claim(key):
+            return
+
+        def run():
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Background refresh failed for {key}: {e}")
+            finally:
+                self._release(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def astart(self, key: str, coro_func, *args):
+        if not self._claim(key):
+            return
+
+        async def run():
+            try:
+                await coro_func(*args)
+            except Exception as e:
+                print(f"Background refresh failed for {key}: {e}")
+            finally:
+                self._release(key)
+
+        # A fresh context, so the refresh does not report to the triggering run's callbacks and metrics.
+        # Keep a reference so the task is not garbage collected mid-flight.
+        task = asyncio.create_task(run(), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+class LLMCache(BaseCache):
+    """
+    LangChain cache backed by SQLiteCache, set as `cache=` on the chat models
+    so the existing `prompt | llm` chains are cached without touching the graph.
+
+    Keys are a SHA-256 of the model's llm_string (model name, temperature and
+    other params) and the rendered prompt.
+    """
+
+    def __init__(self, ttl: float = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.store = SQLiteCache("llm_responses", max_entries=max_entries)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str):
+        if cache_bypass.get():
+            self.misses += 1
+            cache_requests.inc("llm", "miss")
+            return None
+        entry = self.store.get(self._key(prompt, llm_string))
+        if entry is None or not entry.fresh:
+            self.misses += 1
+            cache_requests.inc("llm", "miss")
+            return None
+        self.hits += 1
+        cache_requests.inc("llm", "hit")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", LangChainBetaWarning)
+            generations = [loads(generation) for generation in entry.value]
+        for generation in generations:
+            # Lets the metrics callback tell cache hits from billed calls
+            if hasattr(generation, "message"):
+                generation.message.response_metadata["cached"] = True
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        self.store.set(
+            self._key(prompt, llm_string),
+            [dumps(generation) for generation in return_val],
+            self.ttl,
+        )
+
+    def clear(self, **kwargs):
+        self.store.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self.store),
+        }
+
+
+# In cassette mode every model call is recorded or replayed in front of the response cache
+llm_cache = cassette.llm_cache(LLMCache() if LLM_CACHE_ENABLED else None)
@@ -0,0 +1,513 @@
+# cassette.py
+"""
+Record/replay of the pipeline's external traffic, for offline and reproducible benchmarks.
+
+CASSETTE_MODE=record captures, in the JSON Lines file at CASSETTE_PATH:
+- every chat model call the agents make (rendered prompt, response, latency),
+  through the LangChain cache hook the models already use;
+- every research tool call (Tavily search, current time);
+- every HTTP call made by tools/ and url_agent (LinkedIn, media downloads,
+  the Render summarizer, webhooks).
+
+CASSETTE_MODE=replay answers the same calls from the file instead: a call that
+repeats gets the recorded responses in order, and a call that was never recorded
+raises CassetteMiss rather than reaching the network. Each replayed call waits its
+recorded latency times CASSETTE_LATENCY_SCALE: 0 answers at once, 1 reproduces the
+recorded timing, so routing, caching and concurrency changes can be measured
+against real traffic shapes.
+
+Replayed model calls are not flagged as cached, so the router and metrics treat
+them as real calls. Record and replay with an empty CACHE_DIR (or bypass_cache)
+so the URL and research caches miss in both runs.
+"""
+import asyncio
+import base64
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from collections import defaultdict
+import httpx
+import requests
+from dotenv import load_dotenv
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from requests.structures import CaseInsensitiveDict
+from .metrics import cassette_calls
+
+load_dotenv()
+
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").lower() # off, record or replay
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", os.path.join("cassettes", "default.jsonl"))
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", 0))
+CASSETTE_MAX_BODY = int(os.getenv("CASSETTE_MAX_BODY", 1024 * 1024)) # Larger HTTP bodies keep only their size and digest
+
+# Response bodies kept whole when recording; anything else (media) is passed through and only hashed
+RECORDED_CONTENT_TYPES = ("application/json", "text/")
+
+# Recomputed by the client, meaningless once the body is stored decoded, or private
+DROPPED_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection", "keep-alive", "set-cookie"}
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+def _digest(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def _http_keys(method: str, url: str, body) -> tuple:
+    """
+    Replay keys for an HTTP call: method, URL and body digest first, then method
+    and URL alone, so a request whose body changed still gets the recorded answer.
+    Streamed bodies (file uploads) are matched on method and URL only.
+    """
+    base = f"{method} {url}"
+    return (_digest(f"{base}\n{_digest(body)}"), _digest(base)) if body else (_digest(base),)
+
+
+def _encode_body(content: bytes) -> dict:
+    body = {"body_size": len(content), "body_sha256": _digest(content)}
+    if len(content) > CASSETTE_MAX_BODY:
+        return body
+    try:
+        return {**body, "body": content.decode("utf-8"), "body_encoding": "utf-8"}
+    except UnicodeDecodeError:
+        return {**body, "body": base64.b64encode(content).decode("ascii"), "body_encoding": "base64"}
+
+
+def _decode_body(entry: dict) -> bytes:
+    if "body" not in entry:
+        # Stand-in of the recorded size, distinct per recorded body so media hashes still differ
+        seed = entry["body_sha256"].encode("ascii")
+        return (seed * (entry["body_size"] // len(seed) + 1))[:entry["body_size"]]
+    if entry["body_encoding"] == "base64":
+        return base64.b64decode(entry["body"])
+    return entry["body"].encode("utf-8")
+
+
+def _headers(headers) -> dict:
+    return {name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS}
+
+
+def _records_body(headers) -> bool:
+    """
+    Whether a response is buffered and stored whole: API answers (JSON or text) up
+    to CASSETTE_MAX_BODY, and empty bodies. Media downloads stream through instead.
+    """
+    length = headers.get("content-length", "")
+    if length == "0":
+        return True
+    if length.isdigit() and int(length) > CASSETTE_MAX_BODY:
+        return False
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return content_type.startswith(RECORDED_CONTENT_TYPES) or content_type.endswith("+json")
+
+
+class _BodyDigest:
+    """
+    Size and digest of a body that streams through to the caller, recorded once it
+    has been read to the end. A body the caller stops reading early is not recorded.
+    """
+
+    def __init__(self, record):
+        self._record = record
+        self._sha256 = hashlib.sha256()
+        self._size = 0
+        self._done = False
+
+    def update(self, chunk: bytes) -> bytes:
+        self._sha256.update(chunk)
+        self._size += len(chunk)
+        return chunk
+
+    def finish(self):
+        if not self._done:
+            self._done = True
+            return self._record(body_size=self._size, body_sha256=self._sha256.hexdigest())
+
+
+class _DigestStream(httpx.AsyncByteStream):
+    def __init__(self, response: httpx.Response, digest: _BodyDigest):
+        self.response = response
+        self.digest = digest
+
+    async def __aiter__(self):
+        async for chunk in self.response.aiter_bytes():
+            yield self.digest.update(chunk)
+        if (recorded := self.digest.finish()) is not None:
+            await recorded
+
+    async def aclose(self):
+        await self.response.aclose()
+
+
+class _DigestRaw:
+    """
+    Stands in for a requests response's raw body; requests reads it through stream()
+    (iter_content, .content) or read().
+    """
+
+    def __init__(self, raw, digest: _BodyDigest):
+        self._raw = raw
+        self._digest = digest
+
+    def stream(self, *args, **kwargs):
+        for chunk in self._raw.stream(*args, **kwargs):
+            yield self._digest.update(chunk)
+        self._digest.finish()
+
+    def read(self, amt=None, *args, **kwargs):
+        chunk = self._raw.read(amt, *args, **kwargs)
+        self._digest.update(chunk)
+        if amt is None or not chunk:
+            self._digest.finish()
+        return chunk
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class Cassette:
+    """
+    One cassette file, either being recorded or replayed. The transport, session,
+    tool and llm_cache helpers wrap their argument in cassette mode and return it
+    unchanged otherwise.
+    """
+
+    def __init__(self, path=CASSETTE_PATH, mode=CASSETTE_MODE, latency_scale=CASSETTE_LATENCY_SCALE):
+        if mode not in ("off", "record", "replay"):
+            raise ValueError(f"CASSETTE_MODE must be off, record or replay, not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.recorded = 0
+        self.replayed = 0
+        self.missed = 0
+        self._entries = defaultdict(list) # (kind, key) -> entries in recorded order
+        self._cursors = defaultdict(int)
+        self._lock = threading.Lock()
+        if mode == "record":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        elif mode == "replay":
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                for key in entry["keys"]:
+                    self._entries[(entry["kind"], key)].append(entry)
+
+    def record(self, kind: str, keys: tuple, latency: float, **data):
+        """
+        Appends one call. Every process appends whole lines, so several uvicorn
+        workers can record into the same file; delete it to start over.
+        """
+        line = json.dumps({"kind": kind, "keys": list(keys), "latency": round(latency, 6), "recorded_at": time.time(), **data}, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+            self.recorded += 1
+        cassette_calls.inc(kind, "recorded")
+
+    def replay(self, kind: str, keys: tuple, label: str = None) -> dict:
+        """
+        Returns the next recorded entry under the first key that has one, cycling
+        through them when a call repeats more often than it was recorded.
+        """
+        with self._lock:
+            for key in keys:
+                entries = self._entries.get((kind, key))
+                if entries:
+                    index = self._cursors[(kind, key)]
+                    self._cursors[(kind, key)] = index + 1
+                    self.replayed += 1
+                    break
+            else:
+                self.missed += 1
+                entries = None
+        if entries is None:
+            cassette_calls.inc(kind, "missed")
+            raise CassetteMiss(f"No {kind} call recorded in {self.path} matches {label or keys[0]}")
+        cassette_calls.inc(kind, "replayed")
+        return entries[index % len(entries)]
+
+    def delay(self, entry: dict) -> float:
+        return entry["latency"] * self.latency_scale
+
+    def transport(self, transport: httpx.AsyncBaseTransport = None):
+        """
+        Wraps an httpx transport; None stands for httpx's default one and is kept as None outside cassette mode.
+        """
+        if not self.enabled:
+            return transport
+        return CassetteTransport(transport or httpx.AsyncHTTPTransport(), self)
+
+    def session(self, session: requests.Session = None) -> requests.Session:
+        """
+        Routes every adapter mounted on `session` (a new plain session if None) through the cassette.
+        """
+        session = session or requests.Session()
+        if self.enabled:
+            for prefix, adapter in list(session.adapters.items()):
+                session.mount(prefix, CassetteAdapter(self, adapter))
+        return session
+
+    def tool(self, tool):
+        """
+        Wraps a LangChain tool so its calls are recorded or replayed by name and input.
+        """
+        if not self.enabled:
+            return tool
+        from langchain_core.tools import StructuredTool
+
+        # Agents pass a tool its raw input string, other callers a dict of arguments
+        def tool_input(args, kwargs):
+            return args[0] if args else kwargs
+
+        def keys(value):
+            return (_digest(f"{tool.name}\n{json.dumps(value, sort_keys=True, default=str)}"),)
+
+        def run(*args, **kwargs):
+            value = tool_input(args, kwargs)
+            if not self.recording:
+                entry = self.replay("tool", keys(value), f"{tool.name}({value!r})")
+                time.sleep(self.delay(entry))
+                return entry["output"]
+            start = time.perf_counter()
+            output = tool.invoke(value)
+            self.record("tool", keys(value), time.perf_counter() - start, name=tool.name, input=value, output=output)
+            return output
+
+        async def arun(*args, **kwargs):
+            value = tool_input(args, kwargs)
+            if not self.recording:
+                entry = self.replay("tool", keys(value), f"{tool.name}({value!r})")
+                await asyncio.sleep(self.delay(entry))
+                return entry["output"]
+            start = time.perf_counter()
+            output = await tool.ainvoke(value)
+            await asyncio.to_thread(self.record, "tool", keys(value), time.perf_counter() - start, name=tool.name, input=value, output=output)
+            return output
+
+        return StructuredTool.from_function(func=run, coroutine=arun, name=tool.name, description=tool.description, args_schema=tool.args_schema)
+
+    def llm_cache(self, inner: BaseCache = None):
+        return CassetteLLMCache(self, inner) if self.enabled else inner
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "latency_scale": self.latency_scale,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "missed": self.missed,
+        }
+
+
+# Start times of the model calls in flight in this context, by cache key. LangChain calls lookup()
+# and update() from the same context, and a call that fails never reaches update(), so its start
+# stays in its own context (and is overwritten by a retry) instead of timing another call.
+_call_starts = contextvars.ContextVar("cassette_call_starts", default={})
+
+
+class CassetteLLMCache(BaseCache):
+    """
+    LangChain cache hook in front of the response cache (`inner`, may be None).
+    Recording never reads `inner`, so every call reaches the provider and its
+    latency is measured from the cache miss to the stored result.
+    """
+
+    def __init__(self, cassette: Cassette, inner: BaseCache = None):
+        self.cassette = cassette
+        self.inner = inner
+
+    @staticmethod
+    def _keys(prompt: str, llm_string: str) -> tuple:
+        # The prompt alone as a fallback: a routing change that picks another model still gets an answer
+        return _digest(f"{llm_string}\n{prompt}"), _digest(prompt)
+
+    def _start(self, keys: tuple):
+        # A new dict each time, so concurrent calls (each in its own task context) never share one
+        _call_starts.set({**_call_starts.get(), keys[0]: time.perf_counter()})
+
+    def _elapsed(self, keys: tuple) -> float:
+        starts = _call_starts.get()
+        start = starts.get(keys[0], time.perf_counter())
+        _call_starts.set({key: value for key, value in starts.items() if key != keys[0]})
+        return time.perf_counter() - start
+
+    @staticmethod
+    def _generations(entry: dict) -> list:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", LangChainBetaWarning)
+            return [loads(generation) for generation in entry["response"]]
+
+    def lookup(self, prompt: str, llm_string: str):
+        keys = self._keys(prompt, llm_string)
+        if self.cassette.recording:
+            self._start(keys)
+            return None
+        entry = self.cassette.replay("llm", keys)
+        time.sleep(self.cassette.delay(entry))
+        return self._generations(entry)
+
+    async def alookup(self, prompt: str, llm_string: str):
+        keys = self._keys(prompt, llm_string)
+        if self.cassette.recording:
+            self._start(keys)
+            return None
+        entry = self.cassette.replay("llm", keys)
+        await asyncio.sleep(self.cassette.delay(entry))
+        return self._generations(entry)
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        if self.inner is not None:
+            self.inner.update(prompt, llm_string, return_val)
+        if self.cassette.recording:
+            keys = self._keys(prompt, llm_string)
+            self.cassette.record(
+                "llm", keys, self._elapsed(keys),
+                llm_string=llm_string, prompt=prompt, response=[dumps(generation) for generation in return_val],
+            )
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val):
+        await asyncio.to_thread(self.update, prompt, llm_string, return_val)
+
+    def clear(self, **kwargs):
+        if self.inner is not None:
+            self.inner.clear(**kwargs)
+
+    def stats(self) -> dict:
+        return {**(self.inner.stats() if self.inner is not None else {}), "cassette": self.cassette.stats()}
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that records the calls it forwards, or answers them from the
+    cassette. A replayed upload still drains its request body, so whatever feeds
+    the upload (file reads, a relayed download) runs as it did when recorded.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, cassette: Cassette):
+        self.transport = transport
+        self.cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        buffered = isinstance(request.stream, httpx.ByteStream)
+        keys = _http_keys(request.method, str(request.url), request.content if buffered else None)
+        if not self.cassette.recording:
+            entry = self.cassette.replay("http", keys, f"{request.method} {request.url}")
+            if not buffered:
+                async for _ in request.stream:
+                    pass
+            await asyncio.sleep(self.cassette.delay(entry))
+            return httpx.Response(entry["status"], headers=entry["headers"], content=_decode_body(entry), request=request)
+        start = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        headers = _headers(response.headers)
+
+        def record(**body):
+            return asyncio.to_thread(
+                self.cassette.record, "http", keys, time.perf_counter() - start,
+                method=request.method, url=str(request.url), status=response.status_code, headers=headers, **body,
+            )
+
+        if not _records_body(response.headers):
+            stream = _DigestStream(response, _BodyDigest(record))
+            return httpx.Response(response.status_code, headers=headers, stream=stream, request=request, extensions=response.extensions)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        await record(**_encode_body(content))
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request, extensions=response.extensions)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class CassetteAdapter(requests.adapters.HTTPAdapter):
+    """
+    requests counterpart of CassetteTransport, around the adapter it replaces on a session.
+    """
+
+    def __init__(self, cassette: Cassette, adapter: requests.adapters.BaseAdapter):
+        super().__init__()
+        self.cassette = cassette
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        buffered = request.body is None or isinstance(request.body, (bytes, str))
+        keys = _http_keys(request.method, request.url, request.body if buffered else None)
+        if not self.cassette.recording:
+            entry = self.cassette.replay("http", keys, f"{request.method} {request.url}")
+            if not buffered:
+                self._drain(request.body)
+            time.sleep(self.cassette.delay(entry))
+            return self._response(request, entry)
+        start = time.perf_counter()
+        response = self.adapter.send(request, **kwargs)
+
+        def record(**body):
+            self.cassette.record(
+                "http", keys, time.perf_counter() - start,
+                method=request.method, url=request.url, status=response.status_code,
+                headers=_headers(response.headers), **body,
+            )
+
+        if not _records_body(response.headers):
+            response.raw = _DigestRaw(response.raw, _BodyDigest(record))
+            return response
+        record(**_encode_body(response.content))
+        return response
+
+    @staticmethod
+    def _drain(body):
+        if hasattr(body, "read"):
+            while body.read(64 * 1024):
+                pass
+        else:
+            for _ in body:
+                pass
+
+    @staticmethod
+    def _response(request, entry: dict) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response._content = _decode_body(entry)
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.reason = "Replayed"
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+cassette = Cassette()
+
+# Plain requests session for calls that are not LinkedIn API calls (media downloads, the Render API)
+http_session = cassette.session()
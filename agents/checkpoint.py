@@ -0,0 +1,165 @@
+# checkpoint.py
+"""
+SQLite checkpointer for the LangGraph app.
+
+Every superstep of a run is saved under the run's thread id, together with the
+writes of nodes that finished in a superstep that later failed. Invoking the app
+again with the same thread id and no input resumes at the node that failed, with
+research, analysis and earlier drafts intact.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Optional, Sequence
+from dotenv import load_dotenv
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+load_dotenv()
+
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", os.path.join(os.getenv("CACHE_DIR", ".cache"), "checkpoints.sqlite"))
+CHECKPOINT_RETENTION = float(os.getenv("CHECKPOINT_RETENTION", 24 * 60 * 60)) # Runs untouched for this long are deleted
+CHECKPOINT_PRUNE_INTERVAL = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL", 10 * 60))
+CHECKPOINT_RUN_LEASE_TTL = float(os.getenv("CHECKPOINT_RUN_LEASE_TTL", 5 * 60)) # A run that saves nothing for this long is no longer "in progress"
+
+
+class SQLiteCheckpointer(SqliteSaver):
+    """
+    langgraph's SqliteSaver, with retention and the async methods the app needs.
+
+    SqliteSaver keeps one connection per process behind a lock; the async methods
+    run the same code in a worker thread, like the other SQLite stores here. When
+    each run was last written is kept in a side table, and runs untouched for
+    `retention` are pruned from put(), at most once per `prune_interval`.
+
+    A run being executed holds a lease (claim_run), so no second request resumes it
+    at the same time; every checkpoint of the run renews the lease for `run_lease_ttl`.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, retention=CHECKPOINT_RETENTION, prune_interval=CHECKPOINT_PRUNE_INTERVAL, run_lease_ttl=CHECKPOINT_RUN_LEASE_TTL):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # The lock in SqliteSaver.cursor() makes sharing the connection across threads safe
+        super().__init__(sqlite3.connect(path, timeout=5, check_same_thread=False))
+        self.path = path
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self.run_lease_ttl = run_lease_ttl
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+        with self.cursor() as cur:
+            cur.execute("CREATE TABLE IF NOT EXISTS checkpoint_runs (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)")
+            cur.execute("CREATE INDEX IF NOT EXISTS checkpoint_runs_updated ON checkpoint_runs (updated_at)")
+            cur.execute("CREATE TABLE IF NOT EXISTS checkpoint_run_leases (thread_id TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = str(config["configurable"]["thread_id"])
+        now = time.time()
+        with self.cursor() as cur:
+            cur.execute("INSERT OR REPLACE INTO checkpoint_runs (thread_id, updated_at) VALUES (?, ?)", (thread_id, now))
+            cur.execute("UPDATE checkpoint_run_leases SET expires_at = ? WHERE thread_id = ?", (now + self.run_lease_ttl, thread_id))
+        self._maybe_prune()
+        return saved
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM checkpoint_runs WHERE thread_id = ?", (str(thread_id),))
+
+    def claim_run(self, thread_id: str) -> Optional[str]:
+        """
+        Marks a run as in progress. Returns a token for release_run(), or None if
+        another request holds the run. A lease left by a worker that died mid-run
+        expires `run_lease_ttl` after the run's last checkpoint.
+        """
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM checkpoint_run_leases WHERE thread_id = ? AND expires_at < ?", (thread_id, now))
+            cur.execute(
+                "INSERT OR IGNORE INTO checkpoint_run_leases (thread_id, token, expires_at) VALUES (?, ?, ?)",
+                (thread_id, token, now + self.run_lease_ttl),
+            )
+            claimed = cur.rowcount == 1
+        return token if claimed else None
+
+    def release_run(self, thread_id: str, token: str) -> None:
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM checkpoint_run_leases WHERE thread_id = ? AND token = ?", (thread_id, token))
+
+    def prune(self) -> int:
+        """
+        Deletes every run whose latest checkpoint is older than the retention period.
+        Returns the number of runs removed.
+        """
+        cutoff = time.time() - self.retention
+        with self.cursor() as cur:
+            threads = [row[0] for row in cur.execute("SELECT thread_id FROM checkpoint_runs WHERE updated_at < ?", (cutoff,))]
+        for thread_id in threads:
+            self.delete_thread(thread_id)
+        if threads:
+            print(f"Pruned checkpoints of {len(threads)} runs older than {self.retention:.0f}s")
+        return len(threads)
+
+    def _maybe_prune(self):
+        with self._prune_lock:
+            now = time.monotonic()
+            if self._last_prune and now - self._last_prune < self.prune_interval:
+                return
+            self._last_prune = now
+        self.prune()
+
+    def stats(self) -> dict:
+        with self.cursor(transaction=False) as cur:
+            runs, checkpoints = cur.execute("SELECT COUNT(DISTINCT thread_id), COUNT(*) FROM checkpoints").fetchone()
+            writes = cur.execute("SELECT COUNT(*) FROM writes").fetchone()[0]
+        return {"runs": runs, "checkpoints": checkpoints, "writes": writes, "retention": self.retention}
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint in tuples:
+            yield checkpoint
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+checkpointer = SQLiteCheckpointer()
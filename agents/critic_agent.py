@@ -1,5 +1,10 @@
-from langchain_mistralai import ChatMistralAI
-from langchain.prompts import ChatPromptTemplate
+import os
+from langchain_core.prompts import ChatPromptTemplate
+from .router import RoutedAgent, model_router
+from .models import CriticOutput, BatchCriticOutput
+from .parsing import structured
+
+CRITIC_SMALL_POST_WORDS = int(os.getenv("CRITIC_SMALL_POST_WORDS", 150))
 
 critic_prompt = ChatPromptTemplate.from_template("""
 You're a critical LinkedIn content reviewer.
@@ -29,6 +34,44 @@ Return your feedback in **this JSON format**:
 }}
 """)
 
-llm = ChatMistralAI(model="devstral-small-2505")
+# Scores every best-of-N candidate in one call
+batch_critic_prompt = ChatPromptTemplate.from_template("""
+You're a critical LinkedIn content reviewer.
+
+Evaluate each of the following candidate posts on a scale of 1–10 for:
+1. Clarity
+2. Tone alignment
+3. Engagement
+4. Relevance to the given intent
+
+{candidates}
+
+User Intent: {intent}  
+Tone: {tone}  
+Audience: {audience}
+
+For each candidate, also provide a 2-line improvement suggestion.
+
+Return your feedback in **this JSON format**, with one review per candidate:
+{{
+  "reviews": [
+    {{
+      "candidate": <candidate number>,
+      "clarity": <score>,
+      "tone": <score>,
+      "engagement": <score>,
+      "relevance": <score>,
+      "suggestion": "<tip>"
+    }}
+  ]
+}}
+""")
+
+def critic_tier(inputs) -> str:
+    """
+    Short posts are reviewed by the small critic tier.
+    """
+    return "small" if len(str(inputs.get("post") or "").split()) < CRITIC_SMALL_POST_WORDS else "default"
 
-critic_agent = critic_prompt | llm
+critic_agent = RoutedAgent("critic", lambda model: critic_prompt | structured(model, CriticOutput), model_router, tier=critic_tier, hedge=True)
+batch_critic_agent = RoutedAgent("batch_critic", lambda model: batch_critic_prompt | structured(model, BatchCriticOutput), model_router)
@@ -1,18 +1,45 @@
 # graph.py
 from langgraph.graph import StateGraph, END
 from pydantic import BaseModel, Field
-from typing import Optional, Literal
-from langchain_core.runnables import RunnableLambda
-from .models import CriticOutput, WriterOutput, ResearchOutput, ImageAnalysisOutput, URLAnalysisOutput, VideoAnalysisOutput
-from .critic_agent import critic_agent
-from .writer_agent import writer_agent
-from .researcher_agent import research_agent
-from .url_agent import url_agent
+from typing import Optional, Literal, Annotated
+from langchain_core.runnables import RunnableLambda, RunnableBinding
+from .models import CriticOutput, BatchCriticOutput, WriterOutput, ResearchOutput, ImageAnalysisOutput, URLAnalysisOutput, VideoAnalysisOutput
+from .critic_agent import critic_agent, batch_critic_agent
+from .writer_agent import writer_agent, rewrite_agent, writer_prompt, rewrite_prompt
+from .critic_agent import critic_prompt
+from .researcher_agent import research_agent, research_refresher, cached_research, acached_research, store_research, astore_research, normalize_topic
+from .url_agent import url_agent, is_failed_analysis
+from .metrics import metrics_callback
+from .cache import bypassing_cache
+from .checkpoint import checkpointer
+from .parsing import parse_output, OutputParseError
 from .image_agent import image_analyser_agent
 from .video_agent import video_analyser_agent
 import json # Import json module
+import math
+import os
+import time
+import uuid
+from difflib import SequenceMatcher
 
 MAX_REWRITES = 3
+# In delta rewrite mode, a revision that changes less than this fraction of the draft is not re-critiqued
+DELTA_RECRITIQUE_THRESHOLD = float(os.getenv("DELTA_RECRITIQUE_THRESHOLD", 0.1))
+# Best-of-N mode: candidate i uses the i-th temperature and hook (cycling when N is larger)
+CANDIDATE_TEMPERATURES = (0.3, 0.7, 1.0, 0.5, 0.9)
+CANDIDATE_HOOKS = (
+    "a surprising statistic",
+    "a bold, contrarian statement",
+    "a short personal anecdote",
+    "a thought-provoking question",
+    "a vivid real-world scenario",
+)
+
+def merge_timings(left: dict, right: dict) -> dict:
+    """
+    Reducer so parallel branches can each report their own timing.
+    """
+    return {**(left or {}), **(right or {})}
 
 class AgentState(BaseModel):
     topic: str
@@ -31,11 +58,22 @@ class AgentState(BaseModel):
     score: Optional[float] = None
     critique: Optional[str] = None
     iteration_count: int = 0
+    fan_out: bool = False # Run research concurrently with the url/image/video analysis
+    delta_rewrites: bool = False # Rewrite from the previous draft and critique instead of from scratch
+    previous_post: Optional[str] = None
+    tokens_saved: int = 0 # Estimated prompt tokens avoided by delta rewrites and skipped critiques
+    candidates: int = 1 # More than 1 writes that many drafts in parallel and keeps the best one
+    runner_up_scores: list[dict] = Field(default_factory=list)
+    critic_failed: bool = False # The last critic output could not be parsed
+    timings: Annotated[dict[str, float], merge_timings] = Field(default_factory=dict)
 
 def should_rewrite(state: AgentState) -> str:
     """
     Determines if the post needs to be rewritten based on score and iteration count.
     """
+    if state.critic_failed:
+        print("Critic output could not be parsed. Keeping the current draft instead of rewriting without feedback.")
+        return END
     if (state.score is None or state.score < 7) and state.iteration_count < MAX_REWRITES:
         print(f"Critique score ({state.score}) is below 7 or not set. Rewriting. Iteration: {state.iteration_count}/{MAX_REWRITES}")
         return "writer"
@@ -46,6 +84,35 @@ def should_rewrite(state: AgentState) -> str:
             print(f"Max rewrites ({MAX_REWRITES}) reached. Ending graph despite score ({state.score}).")
         return END
 
+def route_entry(state: AgentState):
+    """
+    Sends url/image/video requests straight to their analyzer; only text posts start with research.
+    In fan-out mode research and the analyzer start together instead.
+    """
+    if state.fan_out and state.type in ANALYSIS_WRAPPERS:
+        return ["research_branch", "analysis_branch"]
+    return {
+        "url": "url_analyzer",
+        "image": "image_analyzer",
+        "video": "video_analyzer",
+        "text": "research"
+    }.get(state.type, "research")
+
+def route_to_writer(state: AgentState) -> str:
+    """
+    First draft: a single writer call, or N parallel candidates in best-of-N mode.
+    """
+    return "best_of_n" if state.candidates > 1 else "writer"
+
+def route_after_analysis(state: AgentState) -> str:
+    """
+    Falls back to general research when the content analysis failed or came back empty.
+    """
+    if state.research_summary:
+        return route_to_writer(state)
+    print(f"No usable {state.type} analysis, falling back to general research.")
+    return "research"
+
 def url_analysis_wrapper(state: AgentState) -> AgentState:
     """
     Invokes the URL analysis agent and updates the state.
@@ -53,12 +120,28 @@ def url_analysis_wrapper(state: AgentState) -> AgentState:
     if state.url:
         print(f"Starting URL analysis for: {state.url}")
         analysis_output = url_agent.invoke(state.url)
-        # Assuming url_agent returns a direct Pydantic model or dict
-        state.url_analysis = analysis_output
-        state.research_summary = analysis_output.summary
-        print(f"URL analysis complete. Summary: {state.url_analysis.summary[:100]}...")
-    else:
-        print("No URL provided for URL analysis, skipping.")
+        return _apply_url_analysis(state, analysis_output)
+    print("No URL provided for URL analysis, skipping.")
+    return state
+
+async def aurl_analysis_wrapper(state: AgentState) -> AgentState:
+    """
+    Async variant of url_analysis_wrapper.
+    """
+    if state.url:
+        print(f"Starting URL analysis for: {state.url}")
+        analysis_output = await url_agent.ainvoke(state.url)
+        return _apply_url_analysis(state, analysis_output)
+    print("No URL provided for URL analysis, skipping.")
+    return state
+
+def _apply_url_analysis(state: AgentState, analysis_output: URLAnalysisOutput) -> AgentState:
+    if is_failed_analysis(analysis_output):
+        print(f"URL analysis failed for {state.url}: {analysis_output.summary[:100]}")
+        return state
+    state.url_analysis = analysis_output
+    state.research_summary = analysis_output.summary
+    print(f"URL analysis complete. Summary: {state.url_analysis.summary[:100]}...")
     return state
 
 def image_analysis_wrapper(state: AgentState) -> AgentState:
@@ -68,19 +151,33 @@ def image_analysis_wrapper(state: AgentState) -> AgentState:
     if state.url:
         print(f"Starting Image analysis for: {state.url}")
         response = image_analyser_agent.invoke({"image_url": state.url})
-        try:
-            # Clean the output string before parsing
-            cleaned_content = response.content.strip().replace("```json", "").replace("```", "").strip()
-            parsed = ImageAnalysisOutput.parse_raw(cleaned_content)
-            state.image_analysis = parsed
-            state.research_summary = parsed.description
-            print(f"Image analysis complete. Description: {state.image_analysis.description[:100]}...")
-        except Exception as e:
-            print(f"Error parsing image analysis output: {e}")
-            state.image_analysis = ImageAnalysisOutput(description=f"Failed to analyze image from {state.url}.", key_elements=[], sentiment="Unknown")
-            state.research_summary = state.image_analysis.description
-    else:
-        print("No URL provided for image analysis, skipping.")
+        return _apply_image_analysis(state, response)
+    print("No URL provided for image analysis, skipping.")
+    return state
+
+async def aimage_analysis_wrapper(state: AgentState) -> AgentState:
+    """
+    Async variant of image_analysis_wrapper.
+    """
+    if state.url:
+        print(f"Starting Image analysis for: {state.url}")
+        response = await image_analyser_agent.ainvoke({"image_url": state.url})
+        return _apply_image_analysis(state, response)
+    print("No URL provided for image analysis, skipping.")
+    return state
+
+def _apply_image_analysis(state: AgentState, response) -> AgentState:
+    try:
+        parsed = parse_output(response, ImageAnalysisOutput, "image_analysis")
+        if not parsed.description.strip():
+            print("Image analysis came back empty.")
+            return state
+        state.image_analysis = parsed
+        state.research_summary = parsed.description
+        print(f"Image analysis complete. Description: {state.image_analysis.description[:100]}...")
+    except OutputParseError as e:
+        # Leave the analysis unset so route_after_analysis falls back to research
+        print(f"Error parsing image analysis output: {e}")
     return state
 
 def video_analysis_wrapper(state: AgentState) -> AgentState:
@@ -90,104 +187,274 @@ def video_analysis_wrapper(state: AgentState) -> AgentState:
     if state.url:
         print(f"Starting Video analysis for: {state.url}")
         response = video_analyser_agent.invoke({"video_url": state.url})
-        try:
-            # Clean the output string before parsing
-            cleaned_content = response.content.strip().replace("```json", "").replace("```", "").strip()
-            parsed = VideoAnalysisOutput.parse_raw(cleaned_content)
-            state.video_analysis = parsed
-            state.research_summary = parsed.summary
-            print(f"Video analysis complete. Summary: {state.video_analysis.summary[:100]}...")
-        except Exception as e:
-            print(f"Error parsing video analysis output: {e}")
-            state.video_analysis = VideoAnalysisOutput(summary=f"Failed to analyze video from {state.url}.", key_moments=[], sentiment="Unknown")
-            state.research_summary = state.video_analysis.summary
-    else:
-        print("No URL provided for video analysis, skipping.")
+        return _apply_video_analysis(state, response)
+    print("No URL provided for video analysis, skipping.")
     return state
 
-
-def research_wrapper(state: AgentState) -> AgentState:
+async def avideo_analysis_wrapper(state: AgentState) -> AgentState:
     """
-    Performs general web research if no specific content analysis is present.
+    Async variant of video_analysis_wrapper.
     """
+    if state.url:
+        print(f"Starting Video analysis for: {state.url}")
+        response = await video_analyser_agent.ainvoke({"video_url": state.url})
+        return _apply_video_analysis(state, response)
+    print("No URL provided for video analysis, skipping.")
+    return state
+
+def _apply_video_analysis(state: AgentState, response) -> AgentState:
+    try:
+        parsed = parse_output(response, VideoAnalysisOutput, "video_analysis")
+        if not parsed.summary.strip():
+            print("Video analysis came back empty.")
+            return state
+        state.video_analysis = parsed
+        state.research_summary = parsed.summary
+        print(f"Video analysis complete. Summary: {state.video_analysis.summary[:100]}...")
+    except OutputParseError as e:
+        # Leave the analysis unset so route_after_analysis falls back to research
+        print(f"Error parsing video analysis output: {e}")
+    return state
+
+
+def _skip_research(state: AgentState) -> bool:
     if state.research_summary and (state.type == "url" or state.type == "image" or state.type == "video"):
         print("Skipping general research as specific content analysis (URL/Image/Video) is available.")
-        return state
+        return True
+    return False
 
-    print("Starting general research.")
-    query = f"""
-        {state.topic} — {state.description}
+def _research_query(topic: str, description: str, tone: str) -> str:
+    return f"""
+        {topic} — {description}
 
         Using web search tools, gather recent insights and examples related to the topic.
         Then summarize the findings in 2–3 sentences suitable for a LinkedIn post.
         Avoid links, focus on facts, stats, or tool names if possible.
-        Use a {state.tone} tone.
+        Use a {tone} tone.
 
         Respond in this JSON format:
         {{
           "summary": "<summary>"
         }}
     """
-    result = research_agent.invoke({"input": query})
+
+def research_wrapper(state: AgentState) -> AgentState:
+    """
+    Performs general web research if no specific content analysis is present.
+    Repeat topics are served from the research cache, refreshing stale entries in the background.
+    """
+    if _skip_research(state):
+        return state
+
+    cached = cached_research(state.topic)
+    if cached is not None:
+        state.research_summary, stale = cached
+        if stale:
+            research_refresher.start(normalize_topic(state.topic), run_research, state.topic, state.description, state.tone)
+        return state
+
+    print("Starting general research.")
+    state.research_summary = run_research(state.topic, state.description, state.tone)
+    return state
+
+async def aresearch_wrapper(state: AgentState) -> AgentState:
+    """
+    Async variant of research_wrapper.
+    """
+    if _skip_research(state):
+        return state
+
+    cached = await acached_research(state.topic)
+    if cached is not None:
+        state.research_summary, stale = cached
+        if stale:
+            research_refresher.astart(normalize_topic(state.topic), arun_research, state.topic, state.description, state.tone)
+        return state
+
+    print("Starting general research.")
+    state.research_summary = await arun_research(state.topic, state.description, state.tone)
+    return state
+
+def run_research(topic: str, description: str, tone: str) -> str:
+    """
+    Runs the research agent for a topic and caches the parsed summary.
+    """
+    result = research_agent.invoke({"input": _research_query(topic, description, tone)})
+    return _store_research_output(topic, result)
+
+async def arun_research(topic: str, description: str, tone: str) -> str:
+    """
+    Async variant of run_research, also used to pre-warm the research cache.
+    """
+    result = await research_agent.ainvoke({"input": _research_query(topic, description, tone)})
+    summary, ok = _research_summary(result)
+    if ok:
+        await astore_research(topic, summary)
+    return summary
+
+def _store_research_output(topic: str, result) -> str:
+    summary, ok = _research_summary(result)
+    if ok:
+        store_research(topic, summary)
+    return summary
+
+def _research_summary(result) -> tuple[str, bool]:
+    """
+    Returns (summary, ok); only parsed summaries are cached.
+    """
     try:
-        # Assuming research_agent might return a dict or a string depending on its setup
-        if isinstance(result, dict) and "summary" in result:
-             state.research_summary = result["summary"]
-        elif isinstance(result, str):
-            # Clean the output string if it's a string from the agent (e.g., with markdown)
-            cleaned_result = result.strip().replace("```json", "").replace("```", "").strip()
-            parsed = ResearchOutput.parse_raw(cleaned_result)
-            state.research_summary = parsed.summary
-        else:
-            state.research_summary = str(result)
-    except Exception as e:
+        return _parse_research_output(result), True
+    except OutputParseError as e:
         print(f"Error parsing research output: {e}")
-        state.research_summary = f"Could not generate a good research summary. Raw: {result}"
-    return state
+        return f"Could not generate a good research summary. Raw: {result}", False
+
+def _parse_research_output(result) -> str:
+    # AgentExecutor returns {"input": ..., "output": ...}
+    if isinstance(result, dict) and "output" in result:
+        result = result["output"]
+    # Assuming research_agent might return a dict or a string depending on its setup
+    if isinstance(result, dict) and "summary" in result:
+        return result["summary"]
+    elif isinstance(result, str):
+        return parse_output(result, ResearchOutput, "research").summary
+    return str(result)
 
 
 def writer_wrapper(state: AgentState) -> AgentState:
     """
     Invokes the writer agent, incorporating URL, image, or video analysis if available.
+    In delta rewrite mode, rewrites only revise the previous draft using the critique.
     """
+    if _is_delta_rewrite(state):
+        print("Starting writer agent (delta rewrite).")
+        with _rewriting(state):
+            response = rewrite_agent.invoke(_rewrite_input(state))
+        return _apply_rewrite_output(state, response)
     print("Starting writer agent.")
-    
-    writer_input_data = state.dict()
-    
+    with _rewriting(state):
+        response = writer_agent.invoke(_writer_input(state))
+    return _apply_writer_output(state, response)
+
+async def awriter_wrapper(state: AgentState) -> AgentState:
+    """
+    Async variant of writer_wrapper.
+    """
+    if _is_delta_rewrite(state):
+        print("Starting writer agent (delta rewrite).")
+        with _rewriting(state):
+            response = await rewrite_agent.ainvoke(_rewrite_input(state))
+        return _apply_rewrite_output(state, response)
+    print("Starting writer agent.")
+    with _rewriting(state):
+        response = await writer_agent.ainvoke(_writer_input(state))
+    return _apply_writer_output(state, response)
+
+def _rewriting(state: AgentState):
+    """
+    Skips the response cache for every writer and critic call after the first critique.
+    Without delta mode a rewrite sends the first writer prompt again word for word, so a
+    cached answer would hand back the same draft, and the critic the same score.
+    """
+    return bypassing_cache(state.iteration_count > 0)
+
+def estimate_tokens(text: str) -> int:
+    # Rough count (about four characters per token) without a provider round-trip
+    return math.ceil(len(text) / 4)
+
+def _is_delta_rewrite(state: AgentState) -> bool:
+    return state.delta_rewrites and bool(state.post) and bool(state.critique)
+
+def _rewrite_input(state: AgentState) -> dict:
+    return {"post": state.post, "critique": state.critique, "word_limit": state.word_limit}
+
+def _apply_rewrite_output(state: AgentState, response) -> AgentState:
+    full_prompt = writer_prompt.format(**_writer_input(state))
+    delta_prompt = rewrite_prompt.format(**_rewrite_input(state))
+    state.tokens_saved += max(estimate_tokens(full_prompt) - estimate_tokens(delta_prompt), 0)
+    state.previous_post = state.post
+    return _apply_writer_output(state, response)
+
+def draft_change(previous: str, current: str) -> float:
+    """
+    Fraction of the draft that changed between two revisions (0 = identical, 1 = rewritten).
+    """
+    return 1 - SequenceMatcher(None, previous, current, autojunk=False).ratio()
+
+def route_after_writer(state: AgentState) -> str:
+    """
+    Skips the critic when a delta rewrite barely changed the draft: the previous
+    critique still applies and another revision would converge to the same post,
+    so the run ends with the last score.
+    """
+    if state.previous_post is not None and state.post:
+        change = draft_change(state.previous_post, state.post)
+        if change < DELTA_RECRITIQUE_THRESHOLD:
+            print(f"Revision changed {change:.1%} of the draft, below {DELTA_RECRITIQUE_THRESHOLD:.0%}. Skipping critic.")
+            return "skip_critic"
+    return "critic"
+
+def skip_critic_wrapper(state: AgentState) -> AgentState:
+    """
+    Stands in for the critic on a skipped re-critique: keeps the last score and records the saving.
+    """
+    state.tokens_saved += estimate_tokens(critic_prompt.format(**_critic_input(state)))
+    state.iteration_count += 1
+    print(f"Kept critic score {state.score}. Estimated tokens saved so far: {state.tokens_saved}")
+    return state
+
+def _analysis_summary(state: AgentState) -> Optional[str]:
+    """
+    Renders the url/image/video analysis matching state.type for the writer prompt.
+    """
     if state.type == "url" and state.url_analysis:
-        writer_input_data["research_summary"] = (
+        return (
             f"Key insights from the linked article: {state.url_analysis.summary}. "
             f"Main points include: {', '.join(state.url_analysis.main_points)}. "
             f"The original source's tone is {state.url_analysis.tone_of_source}."
         )
-        writer_input_data["description"] = f"{state.description}. Based on the content from {state.url}."
     elif state.type == "image" and state.image_analysis:
-        writer_input_data["research_summary"] = (
+        return (
             f"Image analysis: {state.image_analysis.description}. "
             f"Key elements: {', '.join(state.image_analysis.key_elements)}. "
             f"Overall sentiment: {state.image_analysis.sentiment}."
         )
-        writer_input_data["description"] = f"{state.description}. Based on the image at {state.url}."
     elif state.type == "video" and state.video_analysis:
-        writer_input_data["research_summary"] = (
+        return (
             f"Video analysis summary: {state.video_analysis.summary}. "
             f"Key moments: {', '.join(state.video_analysis.key_moments)}. "
             f"Overall sentiment: {state.video_analysis.sentiment}."
         )
-        writer_input_data["description"] = f"{state.description}. Based on the video at {state.url}."
+    return None
+
+SOURCE_LABELS = {
+    "url": "content from",
+    "image": "image at",
+    "video": "video at",
+}
+
+def _writer_input(state: AgentState) -> dict:
+    writer_input_data = state.dict()
+    
+    analysis = _analysis_summary(state)
+    if analysis:
+        # In fan-out mode merge_wrapper already combined the analysis with the web research
+        if not state.fan_out:
+            writer_input_data["research_summary"] = analysis
+        writer_input_data["description"] = f"{state.description}. Based on the {SOURCE_LABELS[state.type]} {state.url}."
     elif not state.research_summary:
          writer_input_data["research_summary"] = "No external research or content analysis available."
+    return writer_input_data
+
+def _apply_writer_output(state: AgentState, response) -> AgentState:
+    state.post = _parse_writer_output(response)
+    return state
 
-    response = writer_agent.invoke(writer_input_data)
+def _parse_writer_output(response) -> str:
     try:
-        # Clean the output string before parsing
-        cleaned_content = response.content.strip().replace("```json", "").replace("```", "").strip()
-        parsed = WriterOutput.parse_raw(cleaned_content)
-        state.post = parsed.content
-    except Exception as e:
+        return parse_output(response, WriterOutput, "writer").content
+    except OutputParseError as e:
         print(f"Error parsing writer output: {e}")
-        state.post = response.content # Keep raw content in case of parsing failure for debugging
-    return state
+        return response.content # Keep raw content in case of parsing failure for debugging
 
 
 def critic_wrapper(state: AgentState) -> AgentState:
@@ -195,23 +462,38 @@ def critic_wrapper(state: AgentState) -> AgentState:
     Invokes the critic agent and updates the state with score and critique.
     """
     print("Starting critic agent.")
-    response = critic_agent.invoke({
+    with _rewriting(state):
+        response = critic_agent.invoke(_critic_input(state))
+    return _apply_critic_output(state, response)
+
+async def acritic_wrapper(state: AgentState) -> AgentState:
+    """
+    Async variant of critic_wrapper.
+    """
+    print("Starting critic agent.")
+    with _rewriting(state):
+        response = await critic_agent.ainvoke(_critic_input(state))
+    return _apply_critic_output(state, response)
+
+def _critic_input(state: AgentState) -> dict:
+    return {
         "post": state.post,
         "intent": state.intent,
         "tone": state.tone,
         "audience": state.audience
-    })
+    }
+
+def _apply_critic_output(state: AgentState, response) -> AgentState:
     try:
-        # Clean the output string before parsing
-        cleaned_content = response.content.strip().replace("```json", "").replace("```", "").strip()
-        parsed = CriticOutput.parse_raw(cleaned_content)
+        parsed = parse_output(response, CriticOutput, "critic")
         avg_score = (parsed.clarity + parsed.tone + parsed.engagement + parsed.relevance) / 4
         state.score = avg_score
         state.critique = parsed.suggestion
-    except Exception as e:
+        state.critic_failed = False
+    except OutputParseError as e:
+        # No usable feedback: should_rewrite keeps the draft rather than rewriting blind
         print(f"Error parsing critic output: {e}")
-        state.score = 5 # Assign a default score if parsing fails
-        state.critique = "Failed to parse critic output. Please refine model response."
+        state.critic_failed = True
     
     state.iteration_count += 1
     print(f"Critic Score: {state.score}, Iteration: {state.iteration_count}")
@@ -219,42 +501,211 @@ def critic_wrapper(state: AgentState) -> AgentState:
     return state
 
 
+def best_of_n_wrapper(state: AgentState) -> AgentState:
+    """
+    Best-of-N mode: writes state.candidates drafts concurrently, each with its own
+    temperature and opening hook, scores them all in one critic call and keeps the best.
+    """
+    print(f"Starting writer agent ({state.candidates} candidates).")
+    inputs, configs = _candidate_requests(state)
+    drafts = [_parse_writer_output(response) for response in writer_agent.batch(inputs, config=configs)]
+    print("Starting batch critic agent.")
+    response = batch_critic_agent.invoke(_batch_critic_input(state, drafts))
+    return _apply_best_of_n(state, drafts, response)
+
+async def abest_of_n_wrapper(state: AgentState) -> AgentState:
+    """
+    Async variant of best_of_n_wrapper.
+    """
+    print(f"Starting writer agent ({state.candidates} candidates).")
+    inputs, configs = _candidate_requests(state)
+    drafts = [_parse_writer_output(response) for response in await writer_agent.abatch(inputs, config=configs)]
+    print("Starting batch critic agent.")
+    response = await batch_critic_agent.ainvoke(_batch_critic_input(state, drafts))
+    return _apply_best_of_n(state, drafts, response)
+
+def _candidate_style(index: int) -> tuple[float, str]:
+    return CANDIDATE_TEMPERATURES[index % len(CANDIDATE_TEMPERATURES)], CANDIDATE_HOOKS[index % len(CANDIDATE_HOOKS)]
+
+def _candidate_requests(state: AgentState) -> tuple[list[dict], list[dict]]:
+    writer_input_data = _writer_input(state)
+    inputs, configs = [], []
+    for index in range(state.candidates):
+        temperature, hook = _candidate_style(index)
+        inputs.append({**writer_input_data, "description": f"{writer_input_data['description']}. Open the post with {hook}."})
+        configs.append({"configurable": {"writer_temperature": temperature}})
+    return inputs, configs
+
+def _batch_critic_input(state: AgentState, drafts: list[str]) -> dict:
+    candidates = "\n\n".join(f"Candidate {number}:\n{draft}" for number, draft in enumerate(drafts, start=1))
+    return {
+        "candidates": candidates,
+        "intent": state.intent,
+        "tone": state.tone,
+        "audience": state.audience
+    }
+
+def _apply_best_of_n(state: AgentState, drafts: list[str], response) -> AgentState:
+    reviews = {}
+    try:
+        for review in parse_output(response, BatchCriticOutput, "batch_critic").reviews:
+            if 1 <= review.candidate <= len(drafts):
+                score = (review.clarity + review.tone + review.engagement + review.relevance) / 4
+                reviews[review.candidate - 1] = (score, review.suggestion)
+    except OutputParseError as e:
+        print(f"Error parsing batch critic output: {e}")
+
+    if reviews:
+        # Unreviewed candidates rank last
+        ranked = sorted(range(len(drafts)), key=lambda index: reviews.get(index, (-1,))[0], reverse=True)
+        best = ranked[0]
+        state.score, state.critique = reviews[best]
+    else:
+        ranked = list(range(len(drafts)))
+        best = 0
+        state.critic_failed = True
+
+    state.post = drafts[best]
+    state.runner_up_scores = []
+    for index in ranked[1:]:
+        temperature, hook = _candidate_style(index)
+        score = reviews[index][0] if index in reviews else None
+        state.runner_up_scores.append({"candidate": index + 1, "score": score, "temperature": temperature, "hook": hook})
+    state.iteration_count += 1
+    print(f"Best candidate: {best + 1} with score {state.score}. Runner-ups: {state.runner_up_scores}")
+    return state
+
+
+ANALYSIS_WRAPPERS = {
+    "url": (url_analysis_wrapper, aurl_analysis_wrapper),
+    "image": (image_analysis_wrapper, aimage_analysis_wrapper),
+    "video": (video_analysis_wrapper, avideo_analysis_wrapper),
+}
+
+def research_branch(state: AgentState) -> dict:
+    """
+    Fan-out branch: runs general research and only reports the research summary,
+    so it never conflicts with the concurrent analysis branch.
+    """
+    start = time.perf_counter()
+    state = research_wrapper(state)
+    return {"research_summary": state.research_summary, "timings": {"research": time.perf_counter() - start}}
+
+async def aresearch_branch(state: AgentState) -> dict:
+    """
+    Async variant of research_branch.
+    """
+    start = time.perf_counter()
+    state = await aresearch_wrapper(state)
+    return {"research_summary": state.research_summary, "timings": {"research": time.perf_counter() - start}}
+
+def analysis_branch(state: AgentState) -> dict:
+    """
+    Fan-out branch: runs the analyzer for state.type and only reports the analysis fields.
+    """
+    start = time.perf_counter()
+    state = ANALYSIS_WRAPPERS[state.type][0](state)
+    return _analysis_update(state, time.perf_counter() - start)
+
+async def aanalysis_branch(state: AgentState) -> dict:
+    """
+    Async variant of analysis_branch.
+    """
+    start = time.perf_counter()
+    state = await ANALYSIS_WRAPPERS[state.type][1](state)
+    return _analysis_update(state, time.perf_counter() - start)
+
+def _analysis_update(state: AgentState, elapsed: float) -> dict:
+    return {
+        "url_analysis": state.url_analysis,
+        "image_analysis": state.image_analysis,
+        "video_analysis": state.video_analysis,
+        "timings": {f"{state.type}_analysis": elapsed}
+    }
+
+def merge_wrapper(state: AgentState) -> AgentState:
+    """
+    Joins the fan-out branches: combines the content analysis with the web research
+    into a single research summary for the writer.
+    """
+    analysis = _analysis_summary(state)
+    if analysis and state.research_summary:
+        state.research_summary = f"{analysis} Related web research: {state.research_summary}"
+    elif analysis:
+        state.research_summary = analysis
+    print(f"Merged branches. Timings: {state.timings}")
+    return state
+
+
 graph = StateGraph(AgentState)
 
-# Add all nodes
-graph.add_node("url_analyzer", RunnableLambda(url_analysis_wrapper))
-graph.add_node("image_analyzer", RunnableLambda(image_analysis_wrapper))
-graph.add_node("video_analyzer", RunnableLambda(video_analysis_wrapper))
-graph.add_node("research", RunnableLambda(research_wrapper))
-graph.add_node("writer", RunnableLambda(writer_wrapper))
-graph.add_node("critic", RunnableLambda(critic_wrapper))
+# Add all nodes. Each node has a sync and an async implementation so that
+# app.invoke keeps working for scripts while app.ainvoke never blocks the loop
+# (runs invoked without a run id get a fresh one, see _default_run_config).
+graph.add_node("url_analyzer", RunnableLambda(url_analysis_wrapper, afunc=aurl_analysis_wrapper))
+graph.add_node("image_analyzer", RunnableLambda(image_analysis_wrapper, afunc=aimage_analysis_wrapper))
+graph.add_node("video_analyzer", RunnableLambda(video_analysis_wrapper, afunc=avideo_analysis_wrapper))
+graph.add_node("research", RunnableLambda(research_wrapper, afunc=aresearch_wrapper))
+graph.add_node("writer", RunnableLambda(writer_wrapper, afunc=awriter_wrapper))
+graph.add_node("critic", RunnableLambda(critic_wrapper, afunc=acritic_wrapper))
+graph.add_node("research_branch", RunnableLambda(research_branch, afunc=aresearch_branch))
+graph.add_node("analysis_branch", RunnableLambda(analysis_branch, afunc=aanalysis_branch))
+graph.add_node("merge", RunnableLambda(merge_wrapper))
+graph.add_node("skip_critic", RunnableLambda(skip_critic_wrapper))
+graph.add_node("best_of_n", RunnableLambda(best_of_n_wrapper, afunc=abest_of_n_wrapper))
 
 # Set entry point with conditional routing based on 'type'
-graph.set_entry_point("research")
-
-graph.add_conditional_edges(
-    "research",
-    lambda state: {
-        "url": "url_analyzer",
-        "image": "image_analyzer",
-        "video": "video_analyzer",
-        "text": "writer"
-    }.get(state.type, "writer"),
+graph.set_conditional_entry_point(
+    route_entry,
     {
         "url_analyzer": "url_analyzer",
         "image_analyzer": "image_analyzer",
         "video_analyzer": "video_analyzer",
-        "writer": "writer"
+        "research": "research",
+        "research_branch": "research_branch",
+        "analysis_branch": "analysis_branch"
     }
 )
 
-# After analysis, go to writer
-graph.add_edge("url_analyzer", "writer")
-graph.add_edge("image_analyzer", "writer")
-graph.add_edge("video_analyzer", "writer")
+# After analysis, go to writer unless the analysis came back empty
+for analyzer in ("url_analyzer", "image_analyzer", "video_analyzer"):
+    graph.add_conditional_edges(
+        analyzer,
+        route_after_analysis,
+        {
+            "research": "research",
+            "writer": "writer",
+            "best_of_n": "best_of_n"
+        }
+    )
+
+# Fan-out mode: wait for both branches, then merge before writing
+graph.add_edge(["research_branch", "analysis_branch"], "merge")
+
+# The first draft comes from the writer, or from best-of-N candidates
+for source in ("research", "merge"):
+    graph.add_conditional_edges(
+        source,
+        route_to_writer,
+        {
+            "writer": "writer",
+            "best_of_n": "best_of_n"
+        }
+    )
 
-# Continue the flow
-graph.add_edge("writer", "critic")
+# Best-of-N already scored every candidate in one critic call
+graph.add_edge("best_of_n", END)
+
+# Continue the flow; delta rewrites that barely changed the draft skip the critic
+graph.add_conditional_edges(
+    "writer",
+    route_after_writer,
+    {
+        "critic": "critic",
+        "skip_critic": "skip_critic"
+    }
+)
+graph.add_edge("skip_critic", END)
 
 # Critic decides whether to loop back or end
 graph.add_conditional_edges(
@@ -266,8 +717,69 @@ graph.add_conditional_edges(
     }
 )
 
-app = graph.compile()
+def run_config(run_id: str, request_hash: Optional[str] = None) -> dict:
+    """
+    Config for one run of the app; the run id is the checkpoint thread. A request
+    hash is saved in the metadata of every checkpoint of the run.
+    """
+    config = {"configurable": {"thread_id": run_id}}
+    if request_hash:
+        config["metadata"] = {"request_hash": request_hash}
+    return config
+
+def _default_run_config(config: dict) -> dict:
+    # The checkpointer needs a thread id; a call without a run id starts a new run
+    if config.get("configurable", {}).get("thread_id"):
+        return {}
+    return run_config(uuid.uuid4().hex)
+
+# Node latency, model usage and iteration metrics are recorded by a callback inherited by every run.
+# Every superstep is checkpointed under the run id, so a failed run can resume where it stopped.
+app = RunnableBinding(
+    bound=graph.compile(checkpointer=checkpointer),
+    config={"callbacks": [metrics_callback]},
+    config_factories=[_default_run_config],
+)
+
+async def ainspect_run(run_id: str) -> Optional[dict]:
+    """
+    Summarizes a checkpointed run, or returns None if it is unknown (or already pruned).
+    Status is "completed" when nothing is left to run, "failed" when a pending node
+    raised, and "running" otherwise.
+    """
+    config = run_config(run_id)
+    snapshot = await app.aget_state(config)
+    if snapshot.metadata is None:
+        return None
+    errors = {task.name: str(task.error) for task in snapshot.tasks if task.error}
+    if not snapshot.next:
+        status = "completed"
+    elif errors:
+        status = "failed"
+    else:
+        status = "running"
+    checkpoints = [checkpoint async for checkpoint in checkpointer.alist(config)]
+    return {
+        "run_id": run_id,
+        "status": status,
+        "next": list(snapshot.next),
+        "errors": errors,
+        "step": snapshot.metadata.get("step"),
+        "checkpoints": len(checkpoints),
+        "updated_at": snapshot.created_at,
+        "values": snapshot.values,
+    }
+
+def draw_graph(format: str = "mermaid") -> str:
+    """
+    Renders the graph for debugging, as mermaid or ascii (ascii needs grandalf for the layout).
+    """
+    graph_view = app.get_graph()
+    if format == "ascii":
+        return graph_view.draw_ascii()
+    return graph_view.draw_mermaid()
 
-# For visualization (optional)
-print(app.get_graph().draw_mermaid())
-app.get_graph().print_ascii()
\ No newline at end of file
+if __name__ == "__main__":
+    # python -m agents.graph [mermaid|ascii]
+    import sys
+    print(draw_graph(sys.argv[1] if len(sys.argv) > 1 else "mermaid"))
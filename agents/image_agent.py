@@ -1,5 +1,8 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
+from .lazy import Lazy
+from .models import ImageAnalysisOutput
+from .parsing import structured
+from .router import PROVIDERS
 from langchain_core.runnables import RunnablePassthrough
 
 image_analysis_prompt = ChatPromptTemplate.from_template("""
@@ -19,6 +22,9 @@ Return your analysis in **this JSON format**:
 }}
 """)
 
-llm_image_analyser = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.2) # Example: assuming Gemini Pro Vision
+def _build_llm():
+    return PROVIDERS["google"]("gemini-2.0-flash", temperature=0.2) # Example: assuming Gemini Pro Vision
 
-image_analyser_agent = image_analysis_prompt | llm_image_analyser
\ No newline at end of file
+llm_image_analyser = Lazy(_build_llm)
+
+image_analyser_agent = Lazy(lambda: image_analysis_prompt | structured(llm_image_analyser.get(), ImageAnalysisOutput))
\ No newline at end of file
@@ -0,0 +1,45 @@
+# lazy.py
+import threading
+
+
+class Lazy:
+    """
+    Builds an object on first use and then forwards attribute access to it.
+
+    Model clients and agents are wrapped in Lazy so importing the graph (and the
+    server) doesn't import the provider SDKs or construct clients until a request
+    actually needs them. Call sites keep using `agent.invoke(...)` unchanged.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self._factory()
+        return self._value
+
+    @property
+    def built(self) -> bool:
+        return self._value is not None
+
+    # Explicit entry points: LangGraph inspects node functions' globals (e.g. `agent.invoke`)
+    # when compiling, and going through __getattr__ there would build everything at import.
+    def invoke(self, *args, **kwargs):
+        return self.get().invoke(*args, **kwargs)
+
+    async def ainvoke(self, *args, **kwargs):
+        return await self.get().ainvoke(*args, **kwargs)
+
+    def batch(self, *args, **kwargs):
+        return self.get().batch(*args, **kwargs)
+
+    async def abatch(self, *args, **kwargs):
+        return await self.get().abatch(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
@@ -0,0 +1,270 @@
+# metrics.py
+"""
+In-process metrics rendered in the Prometheus text format (served at /metrics).
+
+The metric types are deliberately small: thread-safe counters and histograms
+keyed by label values, cheap enough to update from LangChain callbacks that
+run inline on every node and model call.
+"""
+import asyncio
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+from uuid import UUID
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+
+load_dotenv()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(11)) # 1KB .. 1GB
+ITERATION_BUCKETS = (1, 2, 3, 4, 5)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+# USD per million input and output tokens, list prices of the default routed models.
+# LLM_PRICES (JSON, same shape) adds or replaces models; calls to unpriced models cost nothing here.
+DEFAULT_LLM_PRICES = {
+    "gemini-2.0-flash": {"input": 0.10, "output": 0.40},
+    "llama-3.3-70b-versatile": {"input": 0.59, "output": 0.79},
+    "llama-3.1-8b-instant": {"input": 0.05, "output": 0.08},
+    "devstral-small-2505": {"input": 0.10, "output": 0.30},
+    "ministral-8b-latest": {"input": 0.10, "output": 0.10},
+}
+LLM_PRICES = {**DEFAULT_LLM_PRICES, **json.loads(os.getenv("LLM_PRICES", "{}"))}
+
+REGISTRY = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labelvalues, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._function = None
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def set(self, value: float, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def set_function(self, function):
+        """
+        Computes the values at render time instead: `function()` returns {labelvalues: value},
+        for readings that change on their own, like a refilling token bucket.
+        """
+        self._function = function
+
+    def _current(self) -> dict:
+        if self._function is not None:
+            return self._function()
+        with self._lock:
+            return dict(self._values)
+
+    def value(self, *labelvalues) -> float:
+        return self._current().get(labelvalues, 0)
+
+    def render(self) -> list[str]:
+        values = self._current()
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labelvalues, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {} # labelvalues -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                series = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *labelvalues) -> int:
+        with self._lock:
+            series = self._values.get(labelvalues)
+            return series[-1] if series else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = {labelvalues: list(series) for labelvalues, series in self._values.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, series in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [le])} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [le])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {series[-1]}")
+        return lines
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+node_latency = Histogram("graph_node_latency_seconds", "Latency of each LangGraph node.", ["node"])
+node_errors = Counter("graph_node_errors_total", "Graph node runs that raised.", ["node"])
+llm_calls = Counter("llm_calls_total", "Chat model calls by outcome (ok, cached, error).", ["model", "status"])
+llm_latency = Histogram("llm_latency_seconds", "Chat model call latency, cache hits included.", ["model"])
+llm_tokens = Counter("llm_tokens_total", "Tokens reported by the provider, excluding cache hits.", ["model", "direction"])
+llm_cost = Counter("llm_cost_usd_total", "Estimated chat model spend from reported tokens and LLM_PRICES, excluding cache hits.", ["model"])
+rewrite_iterations = Histogram("rewrite_iterations", "Writer/critic iterations per completed generation.", buckets=ITERATION_BUCKETS)
+parse_attempts = Counter("parse_attempts_total", "Model outputs parsed, by stage.", ["stage"])
+parse_repairs = Counter("parse_repairs_total", "Model outputs that only parsed after repairs, by stage.", ["stage"])
+parse_failures = Counter("parse_failures_total", "Model outputs that could not be parsed, by stage.", ["stage"])
+cache_requests = Counter("cache_requests_total", "Cache lookups by cache and result (hit, stale, miss).", ["cache", "result"])
+router_decisions = Counter("router_decisions_total", "Model chosen for each routed call, and why.", ["route", "tier", "model", "reason"])
+router_latency_ewma = Gauge("router_latency_ewma_seconds", "Rolling latency estimate per route and model.", ["route", "model"])
+hedged_calls = Counter("llm_hedged_calls_total", "Hedge-enabled calls by outcome (unhedged, skipped_budget, primary_won, hedge_won, both_failed).", ["route", "outcome"])
+router_error_ewma = Gauge("router_error_rate_ewma", "Rolling error rate per route and model.", ["route", "model"])
+cassette_calls = Counter("cassette_calls_total", "Calls recorded to or replayed from a cassette, by kind (llm, tool, http) and result (recorded, replayed, missed).", ["kind", "result"])
+linkedin_request_latency = Histogram("linkedin_request_latency_seconds", "LinkedIn API and upload request latency.", ["endpoint"])
+event_loop_lag = Histogram("event_loop_lag_seconds", "How late the event loop woke a periodic timer.", buckets=LAG_BUCKETS)
+linkedin_rate_limit_tokens = Gauge("linkedin_rate_limit_tokens", "Tokens left in each LinkedIn rate limit bucket, negative while calls queue for it.", ["scope", "bucket"])
+linkedin_rate_limit_paused = Gauge("linkedin_rate_limit_paused_seconds", "Time left on a Retry-After pause of each LinkedIn rate limit bucket.", ["scope", "bucket"])
+linkedin_rate_limit_waits = Counter("linkedin_rate_limit_waits_total", "LinkedIn calls that had to wait for a rate limit bucket.", ["scope", "bucket"])
+linkedin_rate_limit_wait_seconds = Counter("linkedin_rate_limit_wait_seconds_total", "Time LinkedIn calls were held by a rate limit bucket.", ["scope", "bucket"])
+linkedin_retries = Counter("linkedin_retries_total", "LinkedIn calls retried, by response status.", ["status"])
+linkedin_throttled = Counter("linkedin_throttled_total", "LinkedIn 429 responses that were retried.")
+linkedin_upload_bytes = Histogram("linkedin_upload_bytes", "Request body size sent to LinkedIn.", ["endpoint"], buckets=BYTES_BUCKETS)
+
+
+async def monitor_event_loop_lag(interval: float):
+    """
+    Sleeps `interval` seconds at a time and records how much later than that the
+    loop woke up: how long other callbacks held the loop before the timer could run.
+    """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, time.perf_counter() - start - interval))
+
+
+def llm_call_cost(model: str, usage: dict) -> Optional[float]:
+    """
+    USD cost of one call from its token usage, or None when the model has no price.
+    """
+    # Gemini reports its models as "models/<name>"
+    prices = LLM_PRICES.get(model) or LLM_PRICES.get(model.rsplit("/", 1)[-1])
+    if prices is None:
+        return None
+    return (usage.get("input_tokens", 0) * prices["input"] + usage.get("output_tokens", 0) * prices["output"]) / 1_000_000
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records node latency, model calls, latency and token usage, and the iteration
+    count of every completed graph run. Attached once to the compiled graph, so it
+    is inherited by every node and model call inside it.
+    """
+
+    run_inline = True # Updating a few counters is cheaper than a thread hop
+
+    def __init__(self):
+        self._nodes = {}
+        self._llms = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None, tags: Optional[list[str]] = None, metadata: Optional[dict] = None, **kwargs: Any):
+        node = (metadata or {}).get("langgraph_node")
+        # Only the node run itself is tagged with its graph step; its children just inherit the metadata
+        if node and node != "__start__" and kwargs.get("name") == node and any(tag.startswith("graph:step:") for tag in tags or ()):
+            self._nodes[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any):
+        started = self._nodes.pop(run_id, None)
+        if started is not None:
+            node_latency.observe(time.perf_counter() - started[1], started[0])
+        elif parent_run_id is None and isinstance(outputs, dict) and "iteration_count" in outputs:
+            rewrite_iterations.observe(outputs["iteration_count"])
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        started = self._nodes.pop(run_id, None)
+        if started is not None:
+            node_errors.inc(started[0])
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("kwargs", {}).get("model", "unknown")
+        self._llms[run_id] = (model, time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        started = self._llms.pop(run_id, None)
+        if started is None:
+            return
+        model, start = started
+        llm_latency.observe(time.perf_counter() - start, model)
+        message = getattr(response.generations[0][0], "message", None) if response.generations and response.generations[0] else None
+        if message is not None and message.response_metadata.get("cached"):
+            llm_calls.inc(model, "cached")
+            return
+        llm_calls.inc(model, "ok")
+        usage = getattr(message, "usage_metadata", None) or {}
+        if usage:
+            llm_tokens.inc(model, "input", amount=usage.get("input_tokens", 0))
+            llm_tokens.inc(model, "output", amount=usage.get("output_tokens", 0))
+            cost = llm_call_cost(model, usage)
+            if cost is not None:
+                llm_cost.inc(model, amount=cost)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        started = self._llms.pop(run_id, None)
+        if started is not None:
+            llm_calls.inc(started[0], "error")
+
+
+metrics_callback = MetricsCallbackHandler()
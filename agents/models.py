@@ -10,6 +10,14 @@ class CriticOutput(BaseModel):
     suggestion: str
 
 
+class CandidateCriticOutput(CriticOutput):
+    candidate: int
+
+
+class BatchCriticOutput(BaseModel):
+    reviews: list[CandidateCriticOutput]
+
+
 class WriterOutput(BaseModel):
     content: str
 
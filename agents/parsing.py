@@ -0,0 +1,211 @@
+# parsing.py
+"""
+Tolerant parsing of model output into the pydantic models in models.py.
+
+Models wrap their JSON in code fences, add prose around it, leave trailing
+commas, put raw line breaks inside strings or stop before the closing brace.
+extract_json finds the first balanced object and repairs those defects before
+giving up, so a formatting slip no longer costs a whole rewrite iteration.
+"""
+import os
+import re
+from typing import Optional, Type, TypeVar
+import orjson
+from pydantic import BaseModel, ValidationError
+from .metrics import parse_attempts, parse_failures, parse_repairs
+
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "true").lower() == "true"
+
+Model = TypeVar("Model", bound=BaseModel)
+
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"'})
+PYTHON_LITERAL = re.compile(r"(True|False|None)\b")
+LITERAL_MAP = {"True": "true", "False": "false", "None": "null"}
+CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+class OutputParseError(ValueError):
+    pass
+
+
+def _first_object(text: str) -> tuple[Optional[str], bool]:
+    """
+    Returns (object, truncated) for the first balanced {...} in text, closing any
+    strings and brackets left open by a truncated response. (None, False) when
+    there is no object at all.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None, False
+    stack = []
+    in_string = escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack and stack[-1] == char:
+                stack.pop()
+            if not stack:
+                return text[start:index + 1], False
+    # Truncated output: close whatever is still open
+    return text[start:] + ('"' if in_string else "") + "".join(reversed(stack)), True
+
+
+def _repair(text: str) -> str:
+    """
+    Fixes common defects in one string-aware pass: curly quotes used as JSON quotes,
+    raw line breaks and tabs inside strings, trailing commas, and Python literals
+    (True/False/None) outside strings.
+    """
+    text = text.translate(SMART_QUOTES)
+    out = []
+    in_string = escaped = False
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            else:
+                char = CONTROL_ESCAPES.get(char, char)
+        elif char == '"':
+            in_string = True
+        elif char == ",":
+            if text[index + 1:].lstrip()[:1] in ("}", "]"):
+                char = ""
+        else:
+            literal = PYTHON_LITERAL.match(text, index)
+            if literal and (index == 0 or not text[index - 1].isalnum()):
+                out.append(LITERAL_MAP[literal.group(1)])
+                index = literal.end()
+                continue
+        out.append(char)
+        index += 1
+    return "".join(out)
+
+
+def extract_json(text: str) -> tuple[dict, bool]:
+    """
+    Parses the first JSON object in text. Returns (data, repaired), where repaired
+    says whether the raw object needed fixing. Raises OutputParseError otherwise.
+    """
+    candidate, truncated = _first_object(text)
+    if candidate is None:
+        raise OutputParseError("No JSON object found in model output")
+    try:
+        return orjson.loads(candidate), truncated
+    except orjson.JSONDecodeError:
+        pass
+    try:
+        return orjson.loads(_repair(candidate)), True
+    except orjson.JSONDecodeError as e:
+        raise OutputParseError(f"Could not repair model output: {e}") from e
+
+
+class JSONStringFieldStream:
+    """
+    Decodes one string field of a JSON object while the object is still streaming
+    in, so a model's {"content": "..."} answer can be shown as plain text token by
+    token. feed() returns the newly decoded text: nothing before the field's value
+    starts or after it ends, and an escape split across chunks waits for the rest.
+    """
+
+    def __init__(self, field: str):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._pending = ""
+        self._state = "key" # key, then value, then done
+        self.text = ""
+
+    def feed(self, chunk: str) -> str:
+        if self._state == "done":
+            return ""
+        pending = self._pending + chunk
+        if self._state == "key":
+            match = self._key.search(pending)
+            if not match:
+                self._pending = pending
+                return ""
+            pending = pending[match.end():]
+            self._state = "value"
+        out = []
+        index = 0
+        while index < len(pending):
+            char = pending[index]
+            if char == '"':
+                self._state = "done"
+                index = len(pending)
+                break
+            if char != "\\":
+                out.append(char)
+                index += 1
+                continue
+            # \uXXXX, twice for a surrogate pair; every other escape is two characters
+            length = 2
+            if pending[index + 1:index + 2] == "u":
+                length = 12 if pending[index + 2:index + 4].lower() in ("d8", "d9", "da", "db") else 6
+            if index + length > len(pending):
+                break
+            escape = pending[index:index + length]
+            try:
+                out.append(orjson.loads(f'"{escape}"'))
+            except orjson.JSONDecodeError:
+                out.append(escape)
+            index += length
+        self._pending = pending[index:]
+        text = "".join(out)
+        self.text += text
+        return text
+
+
+def parse_output(response, model: Type[Model], stage: str) -> Model:
+    """
+    Turns a node's model response into `model`, counting attempts, repairs and failures.
+
+    Accepts what the chains can return: an instance of `model` (structured output),
+    the {"raw", "parsed"} dict from with_structured_output(include_raw=True), an
+    AIMessage whose content holds the JSON, or a plain string.
+    """
+    parse_attempts.inc(stage)
+    try:
+        if isinstance(response, dict) and "raw" in response:
+            if isinstance(response.get("parsed"), model):
+                return response["parsed"]
+            # Structured output failed validation: fall back to whatever text came back
+            response = response["raw"]
+        if isinstance(response, model):
+            return response
+        data, repaired = extract_json(response.content if hasattr(response, "content") else str(response))
+        parsed = model.model_validate(data)
+        if repaired:
+            parse_repairs.inc(stage)
+        return parsed
+    except (OutputParseError, ValidationError) as e:
+        parse_failures.inc(stage)
+        raise OutputParseError(f"{stage}: {e}") from e
+
+
+def structured(llm, schema: Type[BaseModel]):
+    """
+    Binds provider-native structured output to `llm` when the model supports it,
+    otherwise returns the model unchanged and parse_output falls back to extraction.
+    """
+    if not STRUCTURED_OUTPUT:
+        return llm
+    try:
+        return llm.with_structured_output(schema, include_raw=True)
+    except NotImplementedError:
+        return llm
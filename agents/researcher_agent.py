@@ -1,11 +1,23 @@
-from langchain_groq import ChatGroq
-from langchain_community.tools import TavilySearchResults
-from langchain.agents import initialize_agent, tool
+from langchain_core.tools import tool
+import asyncio
 import datetime
+import os
+import re
+import time
 from dotenv import load_dotenv
+from .cache import SQLiteCache, BackgroundRefresher, cache_bypass
+from .cassette import cassette
+from .metrics import cache_requests
+from .router import RoutedAgent, model_router
 
 load_dotenv()
 
+RESEARCH_CACHE_TTL = float(os.getenv("RESEARCH_CACHE_TTL", 12 * 60 * 60))
+RESEARCH_CACHE_MAX_STALE = float(os.getenv("RESEARCH_CACHE_MAX_STALE", 7 * 24 * 60 * 60)) # How long past expiry a stale summary may still be served
+RESEARCH_CACHE_MAX_ENTRIES = int(os.getenv("RESEARCH_CACHE_MAX_ENTRIES", 1000))
+RESEARCH_AGENT_VERBOSE = os.getenv("RESEARCH_AGENT_VERBOSE", "false").lower() == "true"
+TAVILY_API_URL = os.getenv("TAVILY_API_URL") # Defaults to api.tavily.com
+
 @tool
 def get_current_time(format: str = "%Y-%m-%d %H:%M:%S") -> str:
     """
@@ -15,27 +27,93 @@ def get_current_time(format: str = "%Y-%m-%d %H:%M:%S") -> str:
     return datetime.datetime.now().strftime(format)
 
 
-tavily_search_results = TavilySearchResults(
-    search_depth="basic",
-    name="tavily_search_results", 
-    description="Use this to search for current information on the internet. Input should be a search query string."
-)
+def _build_research_agent(llm):
+    # The Tavily tool and ReAct executor are only needed once research runs
+    from langchain_community.tools import TavilySearchResults
+    from langchain.agents import initialize_agent
+
+    if TAVILY_API_URL:
+        # The search wrapper reads its base URL from this module constant on every request
+        from langchain_community.utilities import tavily_search
+        tavily_search.TAVILY_API_URL = TAVILY_API_URL
+
+    tavily_search_results = TavilySearchResults(
+        search_depth="basic",
+        name="tavily_search_results", 
+        description="Use this to search for current information on the internet. Input should be a search query string."
+    )
 
+    tools = [cassette.tool(tavily_search_results), cassette.tool(get_current_time)]
 
-tools = [tavily_search_results, get_current_time]
+    return initialize_agent(
+        tools=tools,
+        llm=llm,
+        agent="zero-shot-react-description",
+        verbose=RESEARCH_AGENT_VERBOSE,
+        handle_parsing_errors=True,
+        max_iterations=2,
+        return_direct=True,  
+    )
 
 
-llm = ChatGroq(
-    model="llama-3.1-8b-instant",
-)
+# One ReAct executor per research model, routed like the writer and critic
+research_agent = RoutedAgent("research", _build_research_agent, model_router)
 
 
-research_agent = initialize_agent(
-    tools=tools,
-    llm=llm,
-    agent="zero-shot-react-description",
-    verbose=True,
-    handle_parsing_errors=True,
-    max_iterations=2,
-    return_direct=True,  
-)
+research_cache = SQLiteCache("research_summaries", max_entries=RESEARCH_CACHE_MAX_ENTRIES)
+research_refresher = BackgroundRefresher()
+
+def normalize_topic(topic: str) -> str:
+    """
+    Cache key for a topic: lowercase, punctuation removed, whitespace collapsed.
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", topic.lower()).split())
+
+def cached_research(topic: str):
+    """
+    Returns (summary, stale) for a usable cached research summary, or None on a miss.
+    """
+    if cache_bypass.get():
+        return None
+    key = normalize_topic(topic)
+    entry = research_cache.get(key)
+    if entry is None:
+        cache_requests.inc("research", "miss")
+        return None
+    if entry.fresh:
+        print(f"Research cache hit for topic: {key}")
+        cache_requests.inc("research", "hit")
+        return entry.value["summary"], False
+    if time.time() < entry.expires_at + RESEARCH_CACHE_MAX_STALE:
+        print(f"Serving stale research for topic: {key}, refreshing in background")
+        cache_requests.inc("research", "stale")
+        return entry.value["summary"], True
+    cache_requests.inc("research", "miss")
+    return None
+
+async def acached_research(topic: str):
+    """
+    Async variant of cached_research; the SQLite read runs in a worker thread.
+    """
+    return await asyncio.to_thread(cached_research, topic)
+
+def store_research(topic: str, summary: str):
+    research_cache.set(normalize_topic(topic), {"topic": topic, "summary": summary}, RESEARCH_CACHE_TTL)
+
+async def astore_research(topic: str, summary: str):
+    await asyncio.to_thread(store_research, topic, summary)
+
+def invalidate_research(topics: list[str] = None) -> int:
+    """
+    Drops the cached research for the given topics, or for every topic when none are given.
+    Returns the number of entries removed.
+    """
+    if not topics:
+        count = len(research_cache)
+        research_cache.clear()
+        return count
+    keys = set(research_cache.keys())
+    removed = [key for key in {normalize_topic(topic) for topic in topics} if key in keys]
+    for key in removed:
+        research_cache.delete(key)
+    return len(removed)
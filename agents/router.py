@@ -0,0 +1,424 @@
+# router.py
+"""
+Latency-aware model routing.
+
+Each routed agent names a route (writer, critic, ...) whose tiers are ordered
+lists of "provider:model" keys. A call goes to the fastest healthy model of the
+tier picked for its input, judged by rolling (EWMA) latency and error rates kept
+per route and model, and falls over to the next model if that call fails.
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+from .cache import llm_cache
+from .metrics import router_decisions, router_latency_ewma, router_error_ewma, hedged_calls, metrics_callback
+
+load_dotenv()
+
+ROUTER_EWMA_ALPHA = float(os.getenv("ROUTER_EWMA_ALPHA", 0.2))
+ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", 0.3)) # Two failures in a row mark a model unhealthy
+ROUTER_PROBE_INTERVAL = float(os.getenv("ROUTER_PROBE_INTERVAL", 60)) # An unhealthy model is tried again after this long
+ROUTER_EXPLORE_RATE = float(os.getenv("ROUTER_EXPLORE_RATE", 0.05)) # Calls sent to a slower healthy model to keep its estimate fresh
+ROUTER_LATENCY_WINDOW = int(os.getenv("ROUTER_LATENCY_WINDOW", 200)) # Recent latencies kept per route/model for percentiles
+
+# Hedging: a routed async call still running at the model's observed percentile gets a
+# duplicate on the next ranked model (the same one if it is alone); the first valid answer wins.
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "true").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 0.95))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", 20)) # No hedging until the percentile means something
+HEDGE_MAX_PER_WINDOW = int(os.getenv("HEDGE_MAX_PER_WINDOW", 30))
+HEDGE_WINDOW = float(os.getenv("HEDGE_WINDOW", 60))
+
+# Overrides Gemini's gRPC endpoint (host:port), e.g. for the load-test stubs. The Mistral
+# and Groq clients read MISTRAL_BASE_URL and GROQ_API_BASE themselves.
+GOOGLE_API_ENDPOINT = os.getenv("GOOGLE_API_ENDPOINT")
+
+# First model of each tier is the preferred one until there are measurements.
+# ROUTER_ROUTES (JSON, same shape) replaces the tiers of the routes it names.
+DEFAULT_ROUTES = {
+    "writer": {"default": ["google:gemini-2.0-flash", "groq:llama-3.3-70b-versatile"]},
+    "critic": {
+        "default": ["mistral:devstral-small-2505", "google:gemini-2.0-flash"],
+        "small": ["mistral:ministral-8b-latest", "mistral:devstral-small-2505"],
+    },
+    "batch_critic": {"default": ["mistral:devstral-small-2505", "google:gemini-2.0-flash"]},
+    "research": {"default": ["groq:llama-3.1-8b-instant", "groq:llama-3.3-70b-versatile"]},
+}
+ROUTES = {**DEFAULT_ROUTES, **json.loads(os.getenv("ROUTER_ROUTES", "{}"))}
+
+
+def _google(model, **kwargs):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    if GOOGLE_API_ENDPOINT:
+        kwargs.setdefault("client_options", {"api_endpoint": GOOGLE_API_ENDPOINT})
+    return ChatGoogleGenerativeAI(model=model, cache=llm_cache, **kwargs)
+
+
+def _mistral(model, **kwargs):
+    from langchain_mistralai import ChatMistralAI
+    return ChatMistralAI(model=model, cache=llm_cache, **kwargs)
+
+
+def _groq(model, **kwargs):
+    from langchain_groq import ChatGroq
+    return ChatGroq(model=model, cache=llm_cache, **kwargs)
+
+
+# Provider prefix -> factory(model, **kwargs); tests register stub providers here
+PROVIDERS = {"google": _google, "mistral": _mistral, "groq": _groq}
+
+
+class ModelStats:
+    def __init__(self):
+        self.latency = None # EWMA of successful, uncached calls; None until measured
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.last_call = 0.0
+        self.samples = deque(maxlen=ROUTER_LATENCY_WINDOW)
+
+    def record(self, latency: float, ok: bool, alpha: float):
+        self.calls += 1
+        self.last_call = time.monotonic()
+        if ok:
+            self.latency = latency if self.latency is None else alpha * latency + (1 - alpha) * self.latency
+            self.samples.append(latency)
+        else:
+            self.errors += 1
+        self.error_rate = alpha * (0.0 if ok else 1.0) + (1 - alpha) * self.error_rate
+
+    def percentile(self, q: float):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class HedgeBudget:
+    """
+    Allows at most `limit` hedges in any `window` seconds, so duplicate calls
+    (and their cost) stay bounded however slow the providers get.
+    """
+
+    def __init__(self, limit=HEDGE_MAX_PER_WINDOW, window=HEDGE_WINDOW):
+        self.limit = limit
+        self.window = window
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            while self._times and now - self._times[0] >= self.window:
+                self._times.popleft()
+            if len(self._times) >= self.limit:
+                return False
+            self._times.append(now)
+            return True
+
+
+class ModelRouter:
+    """
+    Keeps per route/model statistics and ranks a tier's models for each call:
+    a due probe of an unhealthy model first, then any model not measured yet
+    (in tier order), then healthy models by latency, with an occasional
+    exploration pick. Unhealthy models come last so failover can still reach them.
+    """
+
+    def __init__(self, routes=ROUTES, providers=PROVIDERS, alpha=ROUTER_EWMA_ALPHA, max_error_rate=ROUTER_MAX_ERROR_RATE,
+                 probe_interval=ROUTER_PROBE_INTERVAL, explore_rate=ROUTER_EXPLORE_RATE, hedging=HEDGE_ENABLED):
+        self.routes = routes
+        self.providers = providers
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.probe_interval = probe_interval
+        self.explore_rate = explore_rate
+        self.hedging = hedging
+        self.hedge_budget = HedgeBudget()
+        self._stats = {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model(self, key: str, **kwargs):
+        """
+        Chat model for "provider:model", built on first use and shared by every agent.
+        """
+        cache_key = (key, tuple(sorted(kwargs.items())))
+        with self._lock:
+            if cache_key not in self._models:
+                provider, name = key.split(":", 1)
+                self._models[cache_key] = self.providers[provider](name, **kwargs)
+            return self._models[cache_key]
+
+    def tier(self, route: str, tier: str) -> list[str]:
+        tiers = self.routes[route]
+        return tiers.get(tier) or tiers["default"]
+
+    def rank(self, route: str, tier: str = "default") -> list[str]:
+        keys = self.tier(route, tier)
+        now = time.monotonic()
+        with self._lock:
+            stats = {key: self._stats.setdefault((route, key), ModelStats()) for key in keys}
+            healthy = [key for key in keys if stats[key].error_rate <= self.max_error_rate]
+            unhealthy = sorted((key for key in keys if key not in healthy), key=lambda key: stats[key].error_rate)
+            unmeasured = [key for key in healthy if stats[key].latency is None]
+            measured = sorted((key for key in healthy if key not in unmeasured), key=lambda key: stats[key].latency)
+            probes = [key for key in unhealthy if now - stats[key].last_call >= self.probe_interval]
+
+        if probes:
+            first, reason = probes[0], "probe"
+        elif unmeasured:
+            first, reason = unmeasured[0], "unmeasured"
+        elif len(measured) > 1 and random.random() < self.explore_rate:
+            first, reason = random.choice(measured[1:]), "explore"
+        elif measured:
+            first, reason = measured[0], "fastest"
+        else:
+            first, reason = unhealthy[0], "fallback"
+        router_decisions.inc(route, tier, first, reason)
+        return [first] + [key for key in measured + unmeasured + unhealthy if key != first]
+
+    def record(self, route: str, key: str, latency: float, ok: bool = True, cached: bool = False):
+        # Cache hits say nothing about the provider
+        if cached:
+            return
+        with self._lock:
+            stats = self._stats.setdefault((route, key), ModelStats())
+            stats.record(latency, ok, self.alpha)
+            latency_ewma, error_rate = stats.latency, stats.error_rate
+        if latency_ewma is not None:
+            router_latency_ewma.set(round(latency_ewma, 4), route, key)
+        router_error_ewma.set(round(error_rate, 4), route, key)
+
+    def healthy(self, route: str, key: str) -> bool:
+        with self._lock:
+            stats = self._stats.get((route, key))
+            return stats is None or stats.error_rate <= self.max_error_rate
+
+    def observe_cancelled(self, route: str, key: str, elapsed: float):
+        """
+        A hedge loser took at least `elapsed`; keeping that lower bound stops the
+        percentile from only ever seeing the calls that were fast enough to win.
+        """
+        with self._lock:
+            self._stats.setdefault((route, key), ModelStats()).samples.append(elapsed)
+
+    def hedge_delay(self, route: str, key: str):
+        """
+        How long to wait before hedging a call to `key`, or None when it shouldn't be hedged.
+        """
+        if not self.hedging:
+            return None
+        with self._lock:
+            stats = self._stats.get((route, key))
+            if stats is None or len(stats.samples) < HEDGE_MIN_SAMPLES:
+                return None
+            return stats.percentile(HEDGE_PERCENTILE)
+
+    def hedge_stats(self) -> dict:
+        routes = {}
+        for route in self.routes:
+            outcomes = {outcome: hedged_calls.value(route, outcome) for outcome in ("unhedged", "skipped_budget", "primary_won", "hedge_won", "both_failed")}
+            calls = sum(outcomes.values())
+            hedged = outcomes["primary_won"] + outcomes["hedge_won"] + outcomes["both_failed"]
+            if calls:
+                routes[route] = {
+                    **outcomes,
+                    "hedge_rate": round(hedged / calls, 4),
+                    "win_rate": round(outcomes["hedge_won"] / hedged, 4) if hedged else None,
+                }
+        return routes
+
+    def stats(self) -> dict:
+        with self._lock:
+            items = list(self._stats.items())
+        routes = {}
+        for (route, key), stats in items:
+            p95 = stats.percentile(HEDGE_PERCENTILE)
+            routes.setdefault(route, {})[key] = {
+                "latency_ewma": None if stats.latency is None else round(stats.latency, 4),
+                f"latency_p{HEDGE_PERCENTILE * 100:g}": None if p95 is None else round(p95, 4),
+                "error_rate_ewma": round(stats.error_rate, 4),
+                "healthy": stats.error_rate <= self.max_error_rate,
+                "calls": stats.calls,
+                "errors": stats.errors,
+            }
+        return {"tiers": self.routes, "models": routes, "hedging": {"enabled": self.hedging, **self.hedge_stats()}}
+
+
+def _is_valid(result) -> bool:
+    # Structured output that failed to parse, or an empty message, loses the race to a usable answer
+    if isinstance(result, dict) and "parsing_error" in result:
+        return result["parsing_error"] is None
+    return bool(getattr(result, "content", True))
+
+
+def _is_cached(result) -> bool:
+    message = result["raw"] if isinstance(result, dict) and "raw" in result else result
+    if isinstance(message, list):
+        return bool(message) and all(_is_cached(item) for item in message)
+    return bool(getattr(message, "response_metadata", {}).get("cached"))
+
+
+class RoutedAgent:
+    """
+    Stands in for a chain (invoke/ainvoke/batch/abatch): builds one chain per model
+    with `build(model)` and sends each call to the model the router ranks first for
+    the input's tier (`tier(input)`, "default" when not given). With `hedge`, async
+    single calls are hedged at the model's observed tail latency.
+    """
+
+    def __init__(self, route: str, build, router: ModelRouter, tier=None, hedge=False, **model_kwargs):
+        self.route = route
+        self.build = build
+        self.router = router
+        self.tier = tier
+        self.hedge = hedge
+        self.model_kwargs = model_kwargs
+        self._chains = {}
+        self._lock = threading.Lock()
+
+    def chain(self, key: str):
+        with self._lock:
+            if key not in self._chains:
+                self._chains[key] = self.build(self.router.model(key, **self.model_kwargs))
+            return self._chains[key]
+
+    def _tier(self, input) -> str:
+        return self.tier(input) if self.tier else "default"
+
+    def _attempts(self, tier: str):
+        keys = self.router.rank(self.route, tier)
+        for attempt, key in enumerate(keys):
+            if attempt:
+                router_decisions.inc(self.route, tier, key, "failover")
+            yield key, attempt == len(keys) - 1
+
+    def _failed(self, key: str, start: float, error: Exception, last: bool):
+        self.router.record(self.route, key, time.perf_counter() - start, ok=False)
+        if last:
+            raise error
+        print(f"{self.route} call to {key} failed ({error}), trying the next model")
+
+    def invoke(self, input, config=None, **kwargs):
+        for key, last in self._attempts(self._tier(input)):
+            start = time.perf_counter()
+            try:
+                # Building a model's client counts as a failed call if it raises, but not towards its latency
+                chain = self.chain(key)
+                start = time.perf_counter()
+                result = chain.invoke(input, config, **kwargs)
+            except Exception as e:
+                self._failed(key, start, e, last)
+                continue
+            self.router.record(self.route, key, time.perf_counter() - start, cached=_is_cached(result))
+            return result
+
+    async def _acall(self, key: str, input, config, kwargs):
+        start = time.perf_counter()
+        try:
+            chain = self.chain(key)
+            start = time.perf_counter()
+            result = await chain.ainvoke(input, config, **kwargs)
+        except asyncio.CancelledError:
+            self.router.observe_cancelled(self.route, key, time.perf_counter() - start)
+            raise
+        except Exception:
+            self.router.record(self.route, key, time.perf_counter() - start, ok=False)
+            raise
+        self.router.record(self.route, key, time.perf_counter() - start, cached=_is_cached(result))
+        return result
+
+    async def _ahedged(self, key: str, backup: str, input, config, kwargs):
+        """
+        Runs the call on `key` and, if it outlives the model's tail latency and the
+        budget allows, a duplicate on `backup`. The first valid result wins and the
+        other call is cancelled.
+        """
+        primary = asyncio.create_task(self._acall(key, input, config, kwargs))
+        tasks = {primary: "primary"}
+        try:
+            delay = self.router.hedge_delay(self.route, key)
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            if delay is None or primary.done():
+                hedged_calls.inc(self.route, "unhedged")
+                return await primary
+            if not self.router.hedge_budget.try_acquire():
+                hedged_calls.inc(self.route, "skipped_budget")
+                return await primary
+            print(f"{self.route} call to {key} still running after {delay:.2f}s, hedging on {backup}")
+            # The duplicate runs outside the node's callbacks, so streamed tokens come from one call only
+            tasks[asyncio.create_task(self._acall(backup, input, {"callbacks": [metrics_callback]}, kwargs))] = "hedge"
+            pending, fallback, error = set(tasks), None, None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif _is_valid(task.result()):
+                        hedged_calls.inc(self.route, f"{tasks[task]}_won")
+                        return task.result()
+                    else:
+                        fallback = task.result()
+            hedged_calls.inc(self.route, "both_failed")
+            if fallback is not None:
+                return fallback
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception() # A loser's error is expected; mark it retrieved
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        tier = self._tier(input)
+        keys = self.router.rank(self.route, tier)
+        for index, key in enumerate(keys):
+            if index:
+                router_decisions.inc(self.route, tier, key, "failover")
+            try:
+                if self.hedge and self.router.hedging and index == 0:
+                    backup = keys[1] if len(keys) > 1 and self.router.healthy(self.route, keys[1]) else key
+                    return await self._ahedged(key, backup, input, config, kwargs)
+                return await self._acall(key, input, config, kwargs)
+            except Exception as e:
+                if index == len(keys) - 1:
+                    raise
+                print(f"{self.route} call to {key} failed ({e}), trying the next model")
+
+    def batch(self, inputs, config=None, **kwargs):
+        # One model serves the whole batch, so the calls stay comparable (e.g. best-of-N drafts)
+        for key, last in self._attempts(self._tier(inputs[0])):
+            start = time.perf_counter()
+            try:
+                chain = self.chain(key)
+                start = time.perf_counter()
+                results = chain.batch(inputs, config, **kwargs)
+            except Exception as e:
+                self._failed(key, start, e, last)
+                continue
+            self.router.record(self.route, key, time.perf_counter() - start, cached=_is_cached(results))
+            return results
+
+    async def abatch(self, inputs, config=None, **kwargs):
+        for key, last in self._attempts(self._tier(inputs[0])):
+            start = time.perf_counter()
+            try:
+                chain = self.chain(key)
+                start = time.perf_counter()
+                results = await chain.abatch(inputs, config, **kwargs)
+            except Exception as e:
+                self._failed(key, start, e, last)
+                continue
+            self.router.record(self.route, key, time.perf_counter() - start, cached=_is_cached(results))
+            return results
+
+
+model_router = ModelRouter()
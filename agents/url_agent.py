@@ -1,15 +1,64 @@
 # url_agent.py
+import asyncio
 import requests
+import httpx
 import json
 import os
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from dotenv import load_dotenv
 from langchain_core.runnables import RunnableLambda
 from .models import URLAnalysisOutput 
+from .cache import SQLiteCache, BackgroundRefresher, cache_bypass
+from .cassette import cassette, http_session
+from .metrics import cache_requests, parse_failures
 
 load_dotenv()
 
 RENDER_API_BASE_URL = os.getenv("RENDER_API_BASE_URL", "https://linkedin-url-summary-extractor.onrender.com")
 
+URL_CACHE_TTL = float(os.getenv("URL_CACHE_TTL", 7 * 24 * 60 * 60))
+URL_CACHE_NEGATIVE_TTL = float(os.getenv("URL_CACHE_NEGATIVE_TTL", 5 * 60))
+URL_CACHE_MAX_STALE = float(os.getenv("URL_CACHE_MAX_STALE", 7 * 24 * 60 * 60)) # How long past expiry a stale analysis may still be served
+URL_CACHE_MAX_ENTRIES = int(os.getenv("URL_CACHE_MAX_ENTRIES", 2000))
+
+# Only parameters that never change the page: click ids and campaign tags. Generic names such
+# as ref or si are left in, since some sites use them to pick the content.
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "gbraid", "wbraid", "dclid", "msclkid", "twclid", "ttclid", "li_fat_id",
+    "yclid", "igshid", "mc_cid", "mc_eid", "_hsenc", "_hsmi",
+}
+
+url_cache = SQLiteCache("url_analyses", max_entries=URL_CACHE_MAX_ENTRIES)
+url_refresher = BackgroundRefresher()
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL used as the cache key: lowercase scheme and host,
+    no default port, fragment or tracking params, and sorted query params.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        # Malformed or out-of-range port: keep the netloc as written
+        host, port = parts.netloc.lower(), None
+    if port and (scheme, port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+def is_failed_analysis(analysis: URLAnalysisOutput) -> bool:
+    """
+    url_agent reports API and parsing failures through tone_of_source instead of raising.
+    """
+    return analysis.tone_of_source in ("Error", "Unknown") or not analysis.summary.strip()
+
 def call_render_url_summarizer_api(url: str) -> dict:
     """
     Calls your deployed Render API's /url_content_summarizer endpoint.
@@ -26,30 +75,132 @@ def call_render_url_summarizer_api(url: str) -> dict:
     }
 
     try:
-        response = requests.post(full_api_url, headers=headers, data=json.dumps(payload), timeout=10)
+        response = http_session.post(full_api_url, headers=headers, data=json.dumps(payload), timeout=10)
         response.raise_for_status()  
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error calling Render URL summarizer API for {url}: {e}")
-        return {
-            "status": "error",
-            "message": str(e),
-            "url": url,
-            "analysis": {
-                "main_topic": "Error",
-                "key_points": [],
-                "summary": f"Failed to retrieve content from {url}."
-            }
+        return _error_response(url, e)
+
+async def acall_render_url_summarizer_api(url: str) -> dict:
+    """
+    Async variant of call_render_url_summarizer_api built on httpx,
+    so the URL analysis node does not block the event loop.
+    """
+    endpoint = "/url_content_summarizer"
+    full_api_url = f"{RENDER_API_BASE_URL}{endpoint}"
+
+    headers = {
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "url": url
+    }
+
+    try:
+        async with httpx.AsyncClient(timeout=10, transport=cassette.transport()) as client:
+            response = await client.post(full_api_url, headers=headers, content=json.dumps(payload))
+            response.raise_for_status()
+            return response.json()
+    except httpx.HTTPError as e:
+        print(f"Error calling Render URL summarizer API for {url}: {e}")
+        return _error_response(url, e)
+
+def _error_response(url: str, error: Exception) -> dict:
+    return {
+        "status": "error",
+        "message": str(error),
+        "url": url,
+        "analysis": {
+            "main_topic": "Error",
+            "key_points": [],
+            "summary": f"Failed to retrieve content from {url}."
         }
+    }
 
 def url_analysis_runnable(url: str) -> URLAnalysisOutput:
     """
     This function will be wrapped by RunnableLambda.
     It takes a URL, calls the Render API, and maps the response
     to the URLAnalysisOutput Pydantic model.
+    Results are cached per normalized URL; a stale analysis is returned
+    immediately while a background thread refreshes it.
+    """
+    key = normalize_url(url)
+    cached = _cached_analysis(key)
+    if cached is not None:
+        analysis, stale = cached
+        if stale:
+            url_refresher.start(key, _refresh, url, key)
+        return analysis
+    return _fetch_and_store(url, key)
+
+async def aurl_analysis_runnable(url: str) -> URLAnalysisOutput:
+    """
+    Async variant of url_analysis_runnable, used by url_agent.ainvoke.
+    Cache reads and writes run in a worker thread, off the event loop.
     """
+    key = normalize_url(url)
+    cached = await asyncio.to_thread(_cached_analysis, key)
+    if cached is not None:
+        analysis, stale = cached
+        if stale:
+            url_refresher.astart(key, _arefresh, url, key)
+        return analysis
+    return await _afetch_and_store(url, key)
+
+def _cached_analysis(key: str):
+    """
+    Returns (analysis, stale) for a usable cache entry, or None when the URL must be fetched.
+    Failures are negatively cached but never served stale.
+    """
+    if cache_bypass.get():
+        return None
+    entry = url_cache.get(key)
+    if entry is None:
+        cache_requests.inc("url_analysis", "miss")
+        return None
+    analysis = URLAnalysisOutput(**entry.value["analysis"])
+    if entry.fresh:
+        print(f"URL analysis cache hit for {key}")
+        cache_requests.inc("url_analysis", "hit")
+        return analysis, False
+    if entry.value["ok"] and time.time() < entry.expires_at + URL_CACHE_MAX_STALE:
+        print(f"Serving stale URL analysis for {key}, refreshing in background")
+        cache_requests.inc("url_analysis", "stale")
+        return analysis, True
+    cache_requests.inc("url_analysis", "miss")
+    return None
+
+def _store(key: str, analysis: URLAnalysisOutput) -> URLAnalysisOutput:
+    ok = not is_failed_analysis(analysis)
+    url_cache.set(
+        key,
+        {"analysis": analysis.model_dump(), "ok": ok},
+        URL_CACHE_TTL if ok else URL_CACHE_NEGATIVE_TTL,
+    )
+    return analysis
+
+def _fetch_and_store(url: str, key: str) -> URLAnalysisOutput:
     api_response = call_render_url_summarizer_api(url)
-    
+    return _store(key, _to_url_analysis(url, api_response))
+
+async def _afetch_and_store(url: str, key: str) -> URLAnalysisOutput:
+    api_response = await acall_render_url_summarizer_api(url)
+    return await asyncio.to_thread(_store, key, _to_url_analysis(url, api_response))
+
+def _refresh(url: str, key: str):
+    analysis = _to_url_analysis(url, call_render_url_summarizer_api(url))
+    # Keep serving the stale analysis rather than replacing it with a failure
+    if not is_failed_analysis(analysis):
+        _store(key, analysis)
+
+async def _arefresh(url: str, key: str):
+    analysis = _to_url_analysis(url, await acall_render_url_summarizer_api(url))
+    if not is_failed_analysis(analysis):
+        await asyncio.to_thread(_store, key, analysis)
+
+def _to_url_analysis(url: str, api_response: dict) -> URLAnalysisOutput:
     if api_response.get("status") == "success":
         analysis_data = api_response.get("analysis", {})
         try:
@@ -60,6 +211,7 @@ def url_analysis_runnable(url: str) -> URLAnalysisOutput:
             )
         except Exception as e:
             print(f"Error parsing URL analysis output from API response for {url}: {e}")
+            parse_failures.inc("url_analysis")
             return URLAnalysisOutput(
                 summary=f"Failed to parse detailed analysis from {url}. Error: {e}",
                 main_points=["Parsing error encountered."],
@@ -74,4 +226,4 @@ def url_analysis_runnable(url: str) -> URLAnalysisOutput:
             tone_of_source="Error"
         )
 
-url_agent = RunnableLambda(url_analysis_runnable)
\ No newline at end of file
+url_agent = RunnableLambda(url_analysis_runnable, afunc=aurl_analysis_runnable)
\ No newline at end of file
@@ -1,5 +1,8 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
+from .lazy import Lazy
+from .models import VideoAnalysisOutput
+from .parsing import structured
+from .router import PROVIDERS
 from langchain_core.runnables import RunnablePassthrough
 
 video_analysis_prompt = ChatPromptTemplate.from_template("""
@@ -19,6 +22,9 @@ Return your analysis in **this JSON format**:
 }}
 """)
 
-llm_video_analyser = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.2)
+def _build_llm():
+    return PROVIDERS["google"]("gemini-2.0-flash", temperature=0.2)
 
-video_analyser_agent = video_analysis_prompt | llm_video_analyser
\ No newline at end of file
+llm_video_analyser = Lazy(_build_llm)
+
+video_analyser_agent = Lazy(lambda: video_analysis_prompt | structured(llm_video_analyser.get(), VideoAnalysisOutput))
\ No newline at end of file
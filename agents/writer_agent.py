@@ -1,5 +1,6 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import ConfigurableField
+from .router import RoutedAgent, model_router
 
 writer_prompt = ChatPromptTemplate.from_template("""
 You are a professional LinkedIn ghostwriter.
@@ -33,6 +34,31 @@ Return the output in **this JSON format**:
 }}
 """)
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.3)
+# Delta rewrite mode: only the previous draft and the critic's suggestion are sent,
+# so extra iterations don't pay for the topic, research and analysis again.
+rewrite_prompt = ChatPromptTemplate.from_template("""
+You are a professional LinkedIn ghostwriter revising your own draft.
 
-writer_agent = writer_prompt | llm
+Previous draft:
+{post}
+
+Reviewer feedback:
+{critique}
+
+Make a targeted revision that addresses the feedback. Keep everything that already works,
+stay within about {word_limit} words and follow the same formatting rules (no markdown,
+hashtags only at the end, `\\n` for line breaks).
+
+Return the output in **this JSON format**:
+{{
+  "content": "<revised LinkedIn post>"
+}}
+""")
+
+def _with_temperature(model):
+    # Temperature can be overridden per call (configurable={"writer_temperature": ...}) for best-of-N drafts
+    return model.configurable_fields(temperature=ConfigurableField(id="writer_temperature"))
+
+# Routed to the fastest healthy writer model and hedged at its tail latency; clients are built on first use
+writer_agent = RoutedAgent("writer", lambda model: writer_prompt | _with_temperature(model), model_router, hedge=True, temperature=0.3)
+rewrite_agent = RoutedAgent("writer", lambda model: rewrite_prompt | _with_temperature(model), model_router, hedge=True, temperature=0.3)
@@ -0,0 +1,77 @@
+# concurrency.py
+"""
+Concurrency benchmark for /generate_linkedin_content against stub LLMs.
+
+Compares the old handler, which called the blocking app.invoke inside the
+event loop, with the current one that awaits app.ainvoke.
+
+Usage:
+    python -m benchmarks.concurrency --requests 50 --concurrency 25 --latency 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+import uuid
+from .stubs import install_stub_llms
+from agents.cache import cache_bypass
+
+PAYLOAD = {
+    "topic": "The impact of AI on modern hiring processes",
+    "description": "AI tools like resume parsers and chatbots are now core to talent acquisition workflows.",
+    "tone": "Professional and slightly conversational",
+    "audience": "Tech recruiters, HR professionals, and startup founders",
+    "intent": "Inform and engage",
+    "word_limit": 250,
+    "type": "text",
+}
+
+
+async def run(handler, total: int, concurrency: int) -> float:
+    """
+    Fires `total` requests through `handler` with at most `concurrency` in flight.
+    Returns requests per second.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await handler()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per stub LLM call")
+    args = parser.parse_args()
+
+    graph = install_stub_llms(args.latency)
+    # Every request should pay for research, not just the first one
+    cache_bypass.set(True)
+
+    async def blocking_handler():
+        # What the endpoint did before: a sync invoke inside an async handler.
+        return graph.app.invoke(graph.AgentState(**PAYLOAD), graph.run_config(uuid.uuid4().hex))
+
+    async def async_handler():
+        return await graph.app.ainvoke(graph.AgentState(**PAYLOAD), graph.run_config(uuid.uuid4().hex))
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["blocking invoke"] = asyncio.run(run(blocking_handler, args.requests, args.concurrency))
+        results["async ainvoke"] = asyncio.run(run(async_handler, args.requests, args.concurrency))
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, stub latency {args.latency}s")
+    for name, rps in results.items():
+        print(f"  {name:<16} {rps:8.2f} req/s")
+    print(f"  speedup          {results['async ainvoke'] / results['blocking invoke']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# hedging.py
+"""
+Tail latency of routed critic calls with and without hedging.
+
+Two stub critic providers share a heavy-tailed latency profile: most calls
+take --latency seconds, --tail-probability of them take --tail-latency. The
+same load runs with hedging off, then on, and reports p50/p95/p99 plus the
+hedge and win rates.
+
+Usage:
+    python -m benchmarks.hedging --calls 400 --concurrency 8
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+from .stubs import install_stub_router
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def run(agent, calls: int, concurrency: int) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await agent.ainvoke({"post": f"Draft {i} " * 200, "intent": "i", "tone": "t", "audience": "a"})
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tail-latency", type=float, default=1.0)
+    parser.add_argument("--tail-probability", type=float, default=0.03)
+    parser.add_argument("--hedge-budget", type=int, default=100, help="Hedges allowed per minute")
+    args = parser.parse_args()
+
+    profile = {"latency": args.latency, "tail_latency": args.tail_latency, "tail_probability": args.tail_probability}
+    install_stub_router({"critic": {"primary": profile, "secondary": profile}})
+    from agents.cache import cache_bypass
+    from agents.critic_agent import critic_agent
+    from agents.router import model_router, HedgeBudget
+    cache_bypass.set(True)
+    model_router.hedge_budget = HedgeBudget(limit=args.hedge_budget, window=60)
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        # The unhedged pass also warms up the latency percentiles the hedges are timed from
+        model_router.hedging = False
+        results["unhedged"] = asyncio.run(run(critic_agent, args.calls, args.concurrency))
+        model_router.hedging = True
+        results["hedged"] = asyncio.run(run(critic_agent, args.calls, args.concurrency))
+
+    print(f"{args.calls} critic calls, concurrency {args.concurrency}, "
+          f"{args.latency}s with a {args.tail_probability:.0%} tail of {args.tail_latency}s")
+    for name, latencies in results.items():
+        print(f"  {name:<9} p50 {statistics.median(latencies):.3f}s  p95 {percentile(latencies, 0.95):.3f}s  p99 {percentile(latencies, 0.99):.3f}s")
+    hedging = model_router.hedge_stats()["critic"]
+    print(f"  hedge rate {hedging['hedge_rate']:.1%}, hedge win rate {hedging['win_rate'] or 0:.1%}, skipped for budget {hedging['skipped_budget']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# linkedin_stub.py
+"""
+Local stand-in for api.linkedin.com, covering the endpoints the tools use:
+ugcPosts, userinfo, assets registerUpload (single and multipart),
+completeMultiPartUpload and the binary upload URLs.
+
+Usage:
+    uvicorn benchmarks.linkedin_stub:app --port 8890
+    LINKEDIN_API_BASE_URL=http://127.0.0.1:8890 python server.py
+
+STUB_PART_SIZE sets the multipart part size and STUB_PART_ERROR_RATE the
+fraction of part uploads that fail with a 503, to exercise retries.
+Multipart registrations for files up to STUB_SINGLE_UPLOAD_MAX bytes get a
+single upload URL instead, to exercise the single-upload fallback.
+"""
+import hashlib
+import itertools
+import os
+import random
+import time
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+STUB_PART_SIZE = int(os.getenv("STUB_PART_SIZE", 4 * 1024 * 1024))
+STUB_PART_ERROR_RATE = float(os.getenv("STUB_PART_ERROR_RATE", 0))
+STUB_SINGLE_UPLOAD_MAX = int(os.getenv("STUB_SINGLE_UPLOAD_MAX", 0))
+
+app = FastAPI()
+ids = itertools.count(1)
+
+# Uploaded bytes per asset (and per part for multipart uploads), for inspection in tests
+uploads = {}
+parts = {}
+posts = []
+
+
+@app.get("/v2/userinfo")
+async def userinfo():
+    return {"sub": "stub-user", "name": "Stub User"}
+
+
+@app.post("/v2/assets")
+async def assets(request: Request, action: str):
+    body = await request.json()
+    if action == "registerUpload":
+        return register_upload(request, body["registerUploadRequest"])
+    if action == "completeMultiPartUpload":
+        complete = body["completeMultipartUploadRequest"]
+        asset_id = complete["mediaArtifact"].rsplit(":", 1)[-1]
+        expected = parts.get(asset_id, {})
+        etags = [response["headers"]["ETag"] for response in complete["partUploadResponses"]]
+        if etags != [expected.get(idx, {}).get("etag") for idx in range(len(etags))]:
+            return JSONResponse({"message": "Part ETags do not match"}, status_code=400)
+        uploads[asset_id] = sum(expected[idx]["size"] for idx in expected)
+        return Response(status_code=200)
+    return JSONResponse({"message": f"Unknown action {action}"}, status_code=400)
+
+
+def register_upload(request: Request, register: dict) -> dict:
+    asset_id = str(next(ids))
+    base = str(request.base_url).rstrip("/")
+    value = {
+        "asset": f"urn:li:digitalmediaAsset:{asset_id}",
+        "mediaArtifact": f"urn:li:digitalmediaMediaArtifact:{asset_id}",
+    }
+    if "MULTIPART_UPLOAD" in register.get("supportedUploadMechanism", []) and register["fileSize"] > STUB_SINGLE_UPLOAD_MAX:
+        file_size = register["fileSize"]
+        value["uploadMechanism"] = {
+            "com.linkedin.digitalmedia.uploading.MultipartUpload": {
+                "metadata": f"stub-metadata-{asset_id}",
+                "partUploadRequests": [
+                    {
+                        "url": f"{base}/upload/{asset_id}/{idx}",
+                        "byteRange": {"firstByte": first, "lastByte": min(first + STUB_PART_SIZE, file_size) - 1},
+                        "urlExpiresAt": int((time.time() + 3600) * 1000),
+                        "headers": {"Content-Type": "application/octet-stream"},
+                    }
+                    for idx, first in enumerate(range(0, file_size, STUB_PART_SIZE))
+                ],
+            }
+        }
+    else:
+        value["uploadMechanism"] = {
+            "com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest": {"uploadUrl": f"{base}/upload/{asset_id}"}
+        }
+    return {"value": value}
+
+
+@app.post("/upload/{asset_id}")
+async def upload_binary(asset_id: str, request: Request):
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+    uploads[asset_id] = size
+    return Response(status_code=201)
+
+
+@app.put("/upload/{asset_id}/{idx}")
+async def upload_part(asset_id: str, idx: int, request: Request):
+    # Part URLs are presigned; like most presigned stores, a second credential is rejected
+    if "authorization" in request.headers:
+        return JSONResponse({"message": "Presigned part URLs take no Authorization header"}, status_code=400)
+    if random.random() < STUB_PART_ERROR_RATE:
+        return Response(status_code=503)
+    digest = hashlib.md5()
+    size = 0
+    async for chunk in request.stream():
+        digest.update(chunk)
+        size += len(chunk)
+    etag = digest.hexdigest()
+    parts.setdefault(asset_id, {})[idx] = {"etag": etag, "size": size}
+    return Response(status_code=200, headers={"ETag": etag})
+
+
+@app.post("/v2/ugcPosts")
+async def ugc_posts(request: Request):
+    body = await request.json()
+    post_id = f"urn:li:share:{next(ids)}"
+    posts.append(body)
+    return JSONResponse({"id": post_id}, status_code=201, headers={"X-RestLi-Id": post_id})
@@ -0,0 +1,404 @@
+# loadtest.py
+"""
+End-to-end load test of `server:app` against local stubs of every remote
+service (Gemini, Mistral, Groq, Tavily, the Render summarizer, LinkedIn; see
+stub_servers.py).
+
+The server runs under uvicorn in its own process, exactly as deployed, with
+its provider and LinkedIn base URLs pointed at the stubs. --concurrency
+closed-loop clients send a weighted mix of /generate_linkedin_content and
+/post_linkedin_* requests for --duration seconds after a --warmup. The report
+gives throughput and p50/p95/p99 latency per scenario, plus the server's
+event-loop lag from its event_loop_lag_seconds histogram.
+
+Runs can be saved as a baseline and later runs compared against it; a
+regression beyond --tolerance exits non-zero.
+
+Usage:
+    python -m benchmarks.loadtest --concurrency 16 --duration 30
+    python -m benchmarks.loadtest --mix generate_text=1 --profiles slow_gemini.json
+    python -m benchmarks.loadtest --save benchmarks/loadtest_baseline.json
+    python -m benchmarks.loadtest --baseline benchmarks/loadtest_baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from .stub_servers import make_certificate, server_env
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = "generate_text=4,generate_url=2,generate_image=1,post_text=2,post_url=1,post_image=1,post_video=1"
+
+# LinkedIn's real rate limits would make the limiter, not the server, the bottleneck
+APP_ENV = {
+    "LINKEDIN_OAUTH_TOKEN": "stub",
+    "LINKEDIN_USER_ID": "stub-user",
+    "LINKEDIN_UGC_POSTS_RATE": "1000",
+    "LINKEDIN_UGC_POSTS_BURST": "1000",
+    "LINKEDIN_ASSETS_RATE": "1000",
+    "LINKEDIN_ASSETS_BURST": "1000",
+    "LINKEDIN_UPLOAD_RATE": "1000",
+    "LINKEDIN_UPLOAD_BURST": "1000",
+    "LINKEDIN_MEMBER_RATE": "1000",
+    "LINKEDIN_MEMBER_BURST": "1000",
+}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+class Media:
+    """
+    Image URLs and video files to post. With a pool of 0 every post uses new bytes,
+    so no upload is served from the media registry; a pool of N cycles through N.
+    """
+
+    def __init__(self, stub_url: str, pool: int, video_size: int, directory: str):
+        self.stub_url = stub_url
+        self.pool = pool
+        self.video_size = video_size
+        self.directory = directory
+        self.count = 0
+
+    def _name(self) -> str:
+        self.count += 1
+        return str(self.count % self.pool if self.pool else self.count)
+
+    def image(self) -> str:
+        return f"{self.stub_url}/media/image-{self._name()}.png"
+
+    def video(self) -> str:
+        path = os.path.join(self.directory, f"video-{self._name()}.mp4")
+        if not os.path.exists(path):
+            with open(path, "wb") as file:
+                file.write(path.encode().ljust(64, b"\0") + os.urandom(self.video_size))
+        return path
+
+
+def _generate(kind):
+    def request(i, media, args):
+        body = {
+            "topic": f"Renewable energy trends {i}", "description": "What changed this quarter",
+            "tone": "Professional", "audience": "Engineers", "intent": "Inform",
+            "word_limit": 120, "type": kind, "bypass_cache": not args.cached,
+        }
+        if kind == "url":
+            body["url"] = f"https://example.com/articles/{i}"
+        elif kind == "image":
+            body["url"] = media.image()
+        return "/generate_linkedin_content", body
+    return request
+
+
+def _post(kind):
+    def request(i, media, args):
+        body = {"post_content": f"Load test post {i}", "post_visibility": "PUBLIC"}
+        if kind == "url":
+            body.update(post_title=f"Article {i}", post_url=f"https://example.com/articles/{i}")
+        elif kind == "image":
+            body["post_image"] = [media.image()]
+        elif kind == "video":
+            body.update(post_title=f"Video {i}", post_video=media.video())
+        return f"/post_linkedin_{kind}_content", body
+    return request
+
+
+# Scenario -> builder(i, media, args) returning (path, json body)
+SCENARIOS = {
+    "generate_text": _generate("text"),
+    "generate_url": _generate("url"),
+    "generate_image": _generate("image"),
+    "post_text": _post("text"),
+    "post_url": _post("url"),
+    "post_image": _post("image"),
+    "post_video": _post("video"),
+}
+
+
+def start(command, env, log_path):
+    log = open(log_path, "w")
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT), log
+
+
+def wait_ready(url: str, process: subprocess.Popen, log_path: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{url} exited with {process.returncode}; see {log_path}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit(f"{url} did not come up within {timeout}s; see {log_path}")
+
+
+def lag_histogram(metrics_text: str) -> dict:
+    """
+    Cumulative event_loop_lag_seconds buckets, plus sum and count, from /metrics.
+    """
+    values = {}
+    for line in metrics_text.splitlines():
+        match = re.match(r'event_loop_lag_seconds_(bucket\{le="([^"]+)"\}|sum|count) (\S+)', line)
+        if match:
+            values[match.group(2) or match.group(1)] = float(match.group(3))
+    return values
+
+
+def lag_summary(before: dict, after: dict) -> dict:
+    """
+    Lag percentiles over the measured window, as the upper bound of the bucket each falls in.
+    """
+    count = after.get("count", 0) - before.get("count", 0)
+    if not count:
+        return {"samples": 0}
+    buckets = [(float(le), after[le] - before.get(le, 0)) for le in after if le not in ("sum", "count")]
+    buckets.sort()
+
+    def quantile(q):
+        for bound, cumulative in buckets:
+            if cumulative >= q * count:
+                return bound
+        return float("inf")
+
+    return {
+        "samples": int(count),
+        "mean": (after["sum"] - before.get("sum", 0)) / count,
+        "p50": quantile(0.5),
+        "p99": quantile(0.99),
+    }
+
+
+async def drive(base_url: str, weights: dict, media: Media, args) -> dict:
+    """
+    Closed-loop clients: each sends its next request as soon as the previous one
+    returns. Requests sent during the warmup are not recorded.
+    """
+    results = {name: {"latencies": [], "errors": 0, "statuses": {}} for name in weights}
+    names, scenario_weights = list(weights), list(weights.values())
+    rng = random.Random(args.seed)
+    counter = iter(range(10 ** 9))
+    start = time.perf_counter()
+    measure_from = start + args.warmup
+    stop_at = measure_from + args.duration
+    snapshot = {}
+
+    # One connection more than there are clients, so the /metrics snapshots never queue behind them
+    limits = httpx.Limits(max_connections=args.concurrency + 1, max_keepalive_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+
+        async def take_snapshot():
+            await asyncio.sleep(args.warmup)
+            snapshot["before"] = lag_histogram((await client.get("/metrics")).text)
+
+        async def worker():
+            while time.perf_counter() < stop_at:
+                name = rng.choices(names, scenario_weights)[0]
+                path, body = SCENARIOS[name](next(counter), media, args)
+                sent = time.perf_counter()
+                try:
+                    response = await client.post(path, json=body)
+                    status = str(response.status_code)
+                    ok = response.is_success
+                except httpx.HTTPError as e:
+                    status, ok = type(e).__name__, False
+                done = time.perf_counter()
+                if sent < measure_from:
+                    continue
+                result = results[name]
+                result["statuses"][status] = result["statuses"].get(status, 0) + 1
+                if ok:
+                    result["latencies"].append(done - sent)
+                else:
+                    result["errors"] += 1
+
+        await asyncio.gather(take_snapshot(), *(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - measure_from
+        lag = lag_summary(snapshot["before"], lag_histogram((await client.get("/metrics")).text))
+    return {"elapsed": elapsed, "scenarios": results, "event_loop_lag": lag}
+
+
+def summarize(run: dict, args, weights: dict) -> dict:
+    scenarios = {}
+    all_latencies, total_errors = [], 0
+    for name, result in run["scenarios"].items():
+        latencies = result["latencies"]
+        all_latencies += latencies
+        total_errors += result["errors"]
+        scenarios[name] = {
+            "requests": len(latencies) + result["errors"],
+            "errors": result["errors"],
+            "throughput": len(latencies) / run["elapsed"],
+            **({
+                "p50": statistics.median(latencies),
+                "p95": percentile(latencies, 0.95),
+                "p99": percentile(latencies, 0.99),
+            } if latencies else {}),
+            "statuses": result["statuses"],
+        }
+    overall = {
+        "requests": len(all_latencies) + total_errors,
+        "errors": total_errors,
+        "throughput": len(all_latencies) / run["elapsed"],
+        **({
+            "p50": statistics.median(all_latencies),
+            "p95": percentile(all_latencies, 0.95),
+            "p99": percentile(all_latencies, 0.99),
+        } if all_latencies else {}),
+    }
+    return {
+        "config": {"concurrency": args.concurrency, "duration": args.duration, "mix": weights, "seed": args.seed},
+        "overall": overall,
+        "scenarios": scenarios,
+        "event_loop_lag": run["event_loop_lag"],
+    }
+
+
+def report(summary: dict):
+    config = summary["config"]
+    print(f"concurrency {config['concurrency']}, {config['duration']}s measured")
+    print(f"  {'scenario':<16}{'reqs':>6}{'errors':>8}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, stats in [*summary["scenarios"].items(), ("overall", summary["overall"])]:
+        latencies = "".join(f"{stats[q]:>8.3f}s" if q in stats else f"{'-':>9}" for q in ("p50", "p95", "p99"))
+        print(f"  {name:<16}{stats['requests']:>6}{stats['errors']:>8}{stats['throughput']:>8.2f}{latencies}")
+    lag = summary["event_loop_lag"]
+    if lag["samples"]:
+        print(f"  event loop lag: mean {lag['mean'] * 1000:.1f}ms, p50 <= {lag['p50'] * 1000:g}ms, p99 <= {lag['p99'] * 1000:g}ms ({lag['samples']} samples)")
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Prints each scenario's change against the baseline; returns the regressions:
+    a throughput drop, or a p95/p99 or event-loop lag rise, beyond `tolerance`.
+    """
+    if baseline.get("config") != summary["config"]:
+        print(f"warning: baseline was recorded with {baseline.get('config')}")
+    regressions = []
+
+    def check(label, old, new, higher_is_better=False):
+        if old is None or new is None:
+            return
+        change = (new - old) / old if old else 0.0
+        regressed = -change > tolerance if higher_is_better else change > tolerance
+        print(f"  {label:<28}{old:>9.3f} -> {new:>9.3f} ({change:+.1%}){'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(label)
+
+    print("against baseline:")
+    for name, stats in [*summary["scenarios"].items(), ("overall", summary["overall"])]:
+        old = baseline["overall"] if name == "overall" else baseline.get("scenarios", {}).get(name)
+        if old is None:
+            continue
+        check(f"{name} req/s", old.get("throughput"), stats.get("throughput"), higher_is_better=True)
+        for q in ("p95", "p99"):
+            check(f"{name} {q}", old.get(q), stats.get(q))
+    check("event loop lag p99", baseline.get("event_loop_lag", {}).get("p99"), summary["event_loop_lag"].get("p99"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds, after the warmup")
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Comma-separated scenario=weight pairs")
+    parser.add_argument("--profiles", help="JSON file (or inline JSON) of stub latency profiles; see stub_servers.py")
+    parser.add_argument("--media-pool", type=int, default=0, help="Distinct images/videos to cycle through; 0 posts new media every time")
+    parser.add_argument("--video-size", type=int, default=2 * 1024 * 1024)
+    parser.add_argument("--cached", action="store_true", help="Let generations use the server's LLM, URL and research caches")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE", help="Extra environment for the server, e.g. HEDGE_ENABLED=false")
+    parser.add_argument("--save", help="Write the summary to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a summary saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative change counted as a regression")
+    parser.add_argument("--keep-logs", action="store_true", help="Keep the server and stub logs")
+    args = parser.parse_args()
+    weights = parse_mix(args.mix)
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    stub_port, grpc_port, app_port = free_port(), free_port(), free_port()
+    cert, key = make_certificate(workdir)
+    base_env = {key_: value for key_, value in os.environ.items() if not key_.startswith(("LINKEDIN_", "STUB_"))}
+    for provider_key in ("GOOGLE_API_KEY", "MISTRAL_API_KEY", "GROQ_API_KEY", "TAVILY_API_KEY"):
+        base_env[provider_key] = "stub"
+
+    stub_env = {**base_env, "STUB_GRPC_PORT": str(grpc_port), "STUB_TLS_CERT": cert, "STUB_TLS_KEY": key}
+    if args.profiles:
+        stub_env["STUB_PROFILES"] = args.profiles
+    app_env = {
+        **base_env, **APP_ENV, **server_env(stub_port, grpc_port, cert),
+        "CACHE_DIR": os.path.join(workdir, "cache"),
+        "CHECKPOINT_PATH": os.path.join(workdir, "checkpoints.sqlite"),
+        "MEDIA_REGISTRY_PATH": os.path.join(workdir, "media_registry.sqlite"),
+    }
+    app_env.update(item.split("=", 1) for item in args.app_env)
+
+    uvicorn = [sys.executable, "-m", "uvicorn", "--host", "127.0.0.1", "--log-level", "warning"]
+    processes = []
+    try:
+        stub_log = os.path.join(workdir, "stubs.log")
+        processes.append(start([*uvicorn, "--port", str(stub_port), "benchmarks.stub_servers:app"], stub_env, stub_log))
+        wait_ready(f"http://127.0.0.1:{stub_port}/stub/stats", processes[-1][0], stub_log)
+        app_log = os.path.join(workdir, "server.log")
+        processes.append(start([*uvicorn, "--port", str(app_port), "server:app"], app_env, app_log))
+        wait_ready(f"http://127.0.0.1:{app_port}/", processes[-1][0], app_log)
+
+        media = Media(f"http://127.0.0.1:{stub_port}", args.media_pool, args.video_size, workdir)
+        run = asyncio.run(drive(f"http://127.0.0.1:{app_port}", weights, media, args))
+        summary = summarize(run, args, weights)
+        summary["stub_counts"] = httpx.get(f"http://127.0.0.1:{stub_port}/stub/stats").json()["counts"]
+    finally:
+        for process, log in processes:
+            process.terminate()
+            process.wait(timeout=10)
+            log.close()
+        if args.keep_logs:
+            print(f"logs in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report(summary)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(summary, json.load(file), args.tolerance)
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(summary, file, indent=2)
+        print(f"saved to {args.save}")
+    if regressions:
+        sys.exit(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# rewrites.py
+"""
+Checks that every rewrite reaches the writer and critic models with the
+response cache on.
+
+A stub critic always scores below 7, so each run writes MAX_REWRITES drafts
+before it stops. Without delta mode every rewrite sends the first writer prompt again,
+so a rewrite served from the response cache would repeat the first draft and
+score. The check counts the calls that reach the stub models and exits
+non-zero if any rewrite or re-critique was answered from the cache.
+
+Usage:
+    python -m benchmarks.rewrites --runs 3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import uuid
+from collections import Counter
+from .stubs import StubChatModel, WRITER_RESPONSE, install_stub_router, stub_research_agent
+
+LOW_CRITIC_RESPONSE = '{"clarity": 5, "tone": 5, "engagement": 4, "relevance": 5, "suggestion": "Open with a sharper hook."}'
+
+# Calls that reached a stub model, per route
+model_calls = Counter()
+
+
+class CountingStubChatModel(StubChatModel):
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        model_calls[self.model_name.split("/", 1)[0]] += 1
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        model_calls[self.model_name.split("/", 1)[0]] += 1
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+
+def install(latency: float):
+    from agents.cache import llm_cache
+    from agents.router import model_router
+
+    responses = {"writer": WRITER_RESPONSE, "critic": LOW_CRITIC_RESPONSE}
+    graph = install_stub_router({route: {"stub": {}} for route in responses})
+
+    def stub(name, **kwargs):
+        return CountingStubChatModel(response=responses[name.split("/", 1)[0]], model_name=name, latency=latency, cache=llm_cache, **kwargs)
+
+    model_router.providers["stub"] = stub
+    graph.research_agent = stub_research_agent(latency)
+    return graph
+
+
+def state(i: int) -> dict:
+    return {
+        "topic": "AI in hiring", "description": "Resume parsers and chatbots", "tone": "Professional",
+        "audience": "Recruiters", "intent": "Inform", "word_limit": 120 + i, "type": "text",
+    }
+
+
+async def run(graph, runs: int, use_async: bool):
+    for i in range(runs):
+        # The same input twice: the second run's first draft and critique come from the cache
+        for _ in range(2):
+            config = graph.run_config(str(uuid.uuid4()))
+            if use_async:
+                await graph.app.ainvoke(state(i), config)
+            else:
+                graph.app.invoke(state(i), config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Distinct inputs, each run twice")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--sync", action="store_true", help="Drive app.invoke instead of app.ainvoke")
+    args = parser.parse_args()
+
+    graph = install(args.latency)
+    from agents.cache import llm_cache
+    if llm_cache is None:
+        raise SystemExit("The response cache is off (LLM_CACHE_ENABLED=false); nothing to check")
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(run(graph, args.runs, not args.sync))
+
+    # Each run writes MAX_REWRITES drafts: the first draft and critique may come from the
+    # cache, every rewrite and its critique must reach a model. The stub writer's post never
+    # changes, so every run's first critique has the same prompt and only the first one is paid.
+    rewrites = 2 * args.runs * (graph.MAX_REWRITES - 1)
+    expected = {"writer": args.runs + rewrites, "critic": 1 + rewrites}
+    print(f"{2 * args.runs} runs of {graph.MAX_REWRITES} drafts each, {rewrites} rewrites, cache {llm_cache.stats()}")
+    failed = False
+    for route, count in expected.items():
+        ok = model_calls[route] == count
+        failed |= not ok
+        print(f"  {route:<6} {model_calls[route]} model calls, expected {count}{'' if ok else '  FAILED'}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# startup.py
+"""
+Cold-start benchmark: import time and peak RSS of `server:app`.
+
+Each run imports the server in a fresh interpreter, the way an autoscaled
+uvicorn worker starts. Results can be saved as a baseline and later runs
+compared against it.
+
+Usage:
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --save benchmarks/startup_baseline.json
+    python -m benchmarks.startup --baseline benchmarks/startup_baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Runs in the child interpreter; prints one JSON line with the measurements
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import server
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "import_seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def measure_once() -> dict:
+    env = dict(os.environ)
+    # The provider clients check their keys when they are constructed
+    for key in ("GOOGLE_API_KEY", "MISTRAL_API_KEY", "GROQ_API_KEY", "TAVILY_API_KEY"):
+        env.setdefault(key, "stub")
+    env.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="startup-cache-"))
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        capture_output=True, text=True, env=env, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs: list[dict]) -> dict:
+    return {
+        "runs": len(runs),
+        "import_seconds_median": statistics.median(run["import_seconds"] for run in runs),
+        "import_seconds_max": max(run["import_seconds"] for run in runs),
+        "max_rss_mb_median": statistics.median(run["max_rss_mb"] for run in runs),
+        "modules": runs[-1]["modules"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save", help="Write the summary to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a summary saved with --save")
+    args = parser.parse_args()
+
+    summary = summarize([measure_once() for _ in range(args.runs)])
+    print(f"import server: median {summary['import_seconds_median']:.2f}s, max {summary['import_seconds_max']:.2f}s")
+    print(f"peak RSS:      median {summary['max_rss_mb_median']:.0f} MB")
+    print(f"modules:       {summary['modules']}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        for metric in ("import_seconds_median", "max_rss_mb_median", "modules"):
+            change = (summary[metric] - baseline[metric]) / baseline[metric] * 100
+            print(f"{metric}: {baseline[metric]:.2f} -> {summary[metric]:.2f} ({change:+.1f}%)")
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(summary, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+# stub_servers.py
+"""
+Local stand-ins for every remote service the server calls, in one process:
+
+    /mistral/v1/chat/completions          Mistral (OpenAI-compatible chat)
+    /groq/openai/v1/chat/completions      Groq (OpenAI-compatible chat)
+    /tavily/search                        Tavily search
+    /render/url_content_summarizer        the Render URL summarizer
+    /media/{name}                         images to post by URL
+    /v2/..., /upload/...                  api.linkedin.com (see linkedin_stub.py)
+    gRPC GenerativeService on --grpc-port Gemini
+
+Gemini's async client only speaks gRPC over TLS, so the stub serves a
+self-signed certificate that the server trusts through
+GRPC_DEFAULT_SSL_ROOTS_FILE_PATH.
+
+Chat stubs pick their canned answer (benchmarks/stubs.py) from the prompt or
+the structured-output schema, and walk the ReAct research agent through one
+Tavily search before its final answer.
+
+Each service has a latency profile: a lognormal latency around `latency`
+seconds with spread `jitter`, a `tail_probability` of taking `tail_latency`
+instead, and an `error_rate` of failing with `error_status`. STUB_PROFILES
+(a JSON object or a path to one) overrides DEFAULT_PROFILES per service.
+
+Usage:
+    python -m benchmarks.stub_servers --port 8890 --grpc-port 8893
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.requests import ClientDisconnect
+from . import linkedin_stub
+from .stubs import (
+    WRITER_RESPONSE, CRITIC_RESPONSE, BATCH_CRITIC_RESPONSE, IMAGE_RESPONSE, VIDEO_RESPONSE, RESEARCH_RESPONSE,
+)
+
+DEFAULT_PROFILES = {
+    "gemini": {"latency": 0.4, "jitter": 0.3, "tail_latency": 2.0, "tail_probability": 0.02, "error_rate": 0.01},
+    "mistral": {"latency": 0.3, "jitter": 0.3, "tail_latency": 1.5, "tail_probability": 0.02, "error_rate": 0.01},
+    "groq": {"latency": 0.15, "jitter": 0.3, "tail_latency": 1.0, "tail_probability": 0.02, "error_rate": 0.01},
+    "tavily": {"latency": 0.3, "jitter": 0.4},
+    "render": {"latency": 0.5, "jitter": 0.4},
+    "linkedin": {"latency": 0.05, "jitter": 0.3},
+    "media": {"latency": 0.01},
+}
+
+STUB_GRPC_PORT = int(os.getenv("STUB_GRPC_PORT", 0)) # 0 leaves the Gemini stub off
+STUB_TLS_CERT = os.getenv("STUB_TLS_CERT")
+STUB_TLS_KEY = os.getenv("STUB_TLS_KEY")
+STUB_MEDIA_SIZE = int(os.getenv("STUB_MEDIA_SIZE", 256 * 1024))
+
+# Structured-output schema name -> canned arguments
+SCHEMA_RESPONSES = {
+    "CriticOutput": CRITIC_RESPONSE,
+    "BatchCriticOutput": BATCH_CRITIC_RESPONSE,
+    "ImageAnalysisOutput": IMAGE_RESPONSE,
+    "VideoAnalysisOutput": VIDEO_RESPONSE,
+}
+# Prompt phrase -> canned answer, for calls without a schema
+PROMPT_RESPONSES = [
+    ("candidate posts", BATCH_CRITIC_RESPONSE),
+    ("content reviewer", CRITIC_RESPONSE),
+    ("analyzing images", IMAGE_RESPONSE),
+    ("analyzing video", VIDEO_RESPONSE),
+]
+
+
+def load_profiles() -> dict:
+    raw = os.getenv("STUB_PROFILES", "")
+    if raw and not raw.lstrip().startswith("{"):
+        with open(raw) as file:
+            raw = file.read()
+    overrides = json.loads(raw) if raw else {}
+    return {service: {**DEFAULT_PROFILES.get(service, {}), **overrides.get(service, {})} for service in {*DEFAULT_PROFILES, *overrides}}
+
+
+profiles = load_profiles()
+# Requests and failures injected per service, reported at /stub/stats
+counts = {service: {"requests": 0, "errors": 0} for service in profiles}
+
+
+def sample_latency(profile: dict) -> float:
+    if profile.get("tail_probability") and random.random() < profile["tail_probability"]:
+        return profile.get("tail_latency", 0.0)
+    latency = profile.get("latency", 0.0)
+    return latency * random.lognormvariate(0, profile["jitter"]) if profile.get("jitter") else latency
+
+
+async def delay_or_fail(service: str) -> bool:
+    """
+    Waits out one sampled latency for `service`; True when the call should fail.
+    """
+    profile = profiles.get(service, {})
+    counts.setdefault(service, {"requests": 0, "errors": 0})["requests"] += 1
+    await asyncio.sleep(sample_latency(profile))
+    if profile.get("error_rate") and random.random() < profile["error_rate"]:
+        counts[service]["errors"] += 1
+        return True
+    return False
+
+
+def service_for(path: str) -> str:
+    prefix = path.strip("/").split("/", 1)[0]
+    return prefix if prefix in ("mistral", "groq", "tavily", "render", "media", "stub") else "linkedin"
+
+
+def chat_answer(prompt: str, schema: str = None) -> str:
+    if schema in SCHEMA_RESPONSES:
+        return SCHEMA_RESPONSES[schema]
+    if "Action Input" in prompt:
+        # ReAct research: search once, then answer once the scratchpad after "Begin!" holds the observation
+        if "Observation:" in prompt.rsplit("Begin!", 1)[-1]:
+            return f"Thought: I now know the final answer\nFinal Answer: {RESEARCH_RESPONSE}"
+        return "Thought: I should look this up.\nAction: tavily_search_results\nAction Input: latest news on the topic"
+    for phrase, response in PROMPT_RESPONSES:
+        if phrase in prompt:
+            return response
+    return WRITER_RESPONSE
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    grpc_server = await start_gemini_stub(STUB_GRPC_PORT, STUB_TLS_CERT, STUB_TLS_KEY) if STUB_GRPC_PORT else None
+    yield
+    if grpc_server:
+        await grpc_server.stop(grace=None)
+
+
+app = FastAPI(lifespan=lifespan)
+app.include_router(linkedin_stub.app.router)
+
+
+@app.middleware("http")
+async def inject_latency(request: Request, call_next):
+    service = service_for(request.url.path)
+    if service != "stub" and await delay_or_fail(service):
+        status = profiles[service].get("error_status", 500)
+        return JSONResponse({"message": f"Injected {service} failure"}, status_code=status)
+    return await call_next(request)
+
+
+@app.get("/stub/stats")
+async def stub_stats():
+    return {"profiles": profiles, "counts": counts}
+
+
+def _usage(prompt: str, answer: str) -> dict:
+    prompt_tokens, completion_tokens = len(prompt) // 4, len(answer) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _completion_message(answer: str, schema: str = None) -> dict:
+    if schema:
+        call = {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": {"name": schema, "arguments": answer}}
+        return {"role": "assistant", "content": "", "tool_calls": [call]}
+    return {"role": "assistant", "content": answer}
+
+
+@app.post("/mistral/v1/chat/completions")
+@app.post("/groq/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    try:
+        body = await request.json()
+    except ClientDisconnect:
+        # The server cancelled the call, e.g. the losing side of a hedge
+        return Response(status_code=499)
+    prompt = "\n".join(str(message.get("content") or "") for message in body.get("messages", []))
+    tools = body.get("tools") or []
+    schema = tools[0]["function"]["name"] if tools else None
+    answer = chat_answer(prompt, schema)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    if body.get("stream"):
+        return StreamingResponse(_chat_stream(completion_id, created, body.get("model"), answer, schema), media_type="text/event-stream")
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": body.get("model"),
+        "choices": [{"index": 0, "message": _completion_message(answer, schema), "finish_reason": "tool_calls" if schema else "stop"}],
+        "usage": _usage(prompt, answer),
+    }
+
+
+async def _chat_stream(completion_id, created, model, answer, schema):
+    def event(delta, finish_reason=None):
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                 "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    if schema:
+        yield event(_completion_message(answer, schema))
+    else:
+        for token in answer.split(" "):
+            yield event({"role": "assistant", "content": token + " "})
+    yield event({}, "tool_calls" if schema else "stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/tavily/search")
+async def tavily_search(request: Request):
+    body = await request.json()
+    query = body.get("query", "")
+    return {
+        "query": query,
+        "results": [
+            {"title": f"Result {i} for {query}", "url": f"https://example.com/{i}", "content": RESEARCH_RESPONSE, "score": 1 - i / 10}
+            for i in range(body.get("max_results", 5))
+        ],
+        "response_time": 0.1,
+    }
+
+
+@app.post("/render/url_content_summarizer")
+async def render_summarizer(request: Request):
+    body = await request.json()
+    return {
+        "status": "success",
+        "url": body.get("url"),
+        "analysis": {
+            "main_topic": "Renewable energy",
+            "key_points": ["Solar capacity doubled", "Storage costs fell"],
+            "summary": f"Summary of {body.get('url')}: solar and storage keep getting cheaper.",
+        },
+    }
+
+
+@app.api_route("/media/{name}", methods=["GET", "HEAD"])
+async def media(name: str, request: Request):
+    # Deterministic bytes per name, so the same URL always hashes the same
+    body = (name.encode() * (STUB_MEDIA_SIZE // max(len(name), 1) + 1))[:STUB_MEDIA_SIZE]
+    headers = {"ETag": f'"{name}"', "Content-Length": str(len(body))}
+    return Response(content=b"" if request.method == "HEAD" else body, media_type="image/png", headers=headers)
+
+
+async def start_gemini_stub(port: int, cert: str, key: str):
+    """
+    Serves GenerateContent and StreamGenerateContent of Gemini's GenerativeService over TLS.
+    """
+    import grpc
+    from google.ai import generativelanguage_v1beta as glm
+    from google.protobuf import json_format, struct_pb2
+
+    def answer_for(request):
+        prompt = "\n".join(part.text for content in request.contents for part in content.parts)
+        declarations = [declaration for tool in request.tools for declaration in tool.function_declarations]
+        schema = declarations[0].name if declarations else None
+        answer = chat_answer(prompt, schema)
+        if schema:
+            args = struct_pb2.Struct()
+            json_format.ParseDict(json.loads(answer), args)
+            part = glm.Part(function_call=glm.FunctionCall(name=schema, args=args))
+        else:
+            part = glm.Part(text=answer)
+        usage = _usage(prompt, answer)
+        return glm.GenerateContentResponse(
+            candidates=[glm.Candidate(content=glm.Content(role="model", parts=[part]), finish_reason=glm.Candidate.FinishReason.STOP)],
+            usage_metadata=glm.GenerateContentResponse.UsageMetadata(
+                prompt_token_count=usage["prompt_tokens"],
+                candidates_token_count=usage["completion_tokens"],
+                total_token_count=usage["total_tokens"],
+            ),
+        )
+
+    async def generate(request, context):
+        if await delay_or_fail("gemini"):
+            await context.abort(grpc.StatusCode.INTERNAL, "Injected gemini failure")
+        return answer_for(request)
+
+    async def stream_generate(request, context):
+        yield await generate(request, context)
+
+    def handler(method, name):
+        return method(name, request_deserializer=glm.GenerateContentRequest.deserialize, response_serializer=glm.GenerateContentResponse.serialize)
+
+    server = grpc.aio.server()
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(
+        "google.ai.generativelanguage.v1beta.GenerativeService",
+        {
+            "GenerateContent": handler(grpc.unary_unary_rpc_method_handler, generate),
+            "StreamGenerateContent": handler(grpc.unary_stream_rpc_method_handler, stream_generate),
+        },
+    ),))
+    with open(key, "rb") as key_file, open(cert, "rb") as cert_file:
+        credentials = grpc.ssl_server_credentials([(key_file.read(), cert_file.read())])
+    server.add_secure_port(f"localhost:{port}", credentials)
+    await server.start()
+    return server
+
+
+def make_certificate(directory: str) -> tuple[str, str]:
+    """
+    Writes a self-signed certificate for localhost into `directory`; returns (cert, key) paths.
+    """
+    cert, key = os.path.join(directory, "stub-cert.pem"), os.path.join(directory, "stub-key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "2", "-keyout", key, "-out", cert,
+         "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def server_env(port: int, grpc_port: int = 0, cert: str = None) -> dict:
+    """
+    Environment that points server.py at stubs listening on `port` (and `grpc_port` for Gemini).
+    """
+    base = f"http://127.0.0.1:{port}"
+    env = {
+        "LINKEDIN_API_BASE_URL": base,
+        "RENDER_API_BASE_URL": f"{base}/render",
+        "TAVILY_API_URL": f"{base}/tavily",
+        "MISTRAL_BASE_URL": f"{base}/mistral/v1",
+        "GROQ_API_BASE": f"{base}/groq",
+    }
+    if grpc_port:
+        env.update({"GOOGLE_API_ENDPOINT": f"localhost:{grpc_port}", "GRPC_DEFAULT_SSL_ROOTS_FILE_PATH": cert})
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8890)
+    parser.add_argument("--grpc-port", type=int, default=8893)
+    args = parser.parse_args()
+
+    import uvicorn
+    cert, key = make_certificate(tempfile.mkdtemp(prefix="stub-tls-"))
+    os.environ.update({"STUB_GRPC_PORT": str(args.grpc_port), "STUB_TLS_CERT": cert, "STUB_TLS_KEY": key})
+    print("Point the server at the stubs with:")
+    for name, value in server_env(args.port, args.grpc_port, cert).items():
+        print(f"  export {name}={value}")
+    uvicorn.run("benchmarks.stub_servers:app", host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
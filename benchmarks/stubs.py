@@ -0,0 +1,164 @@
+# stubs.py
+"""
+Stub LLMs for offline benchmarks.
+
+The stubs answer with fixed, valid JSON after a configurable latency, so the
+graph can be driven end to end without touching Gemini, Mistral, Groq or Tavily.
+Latency profiles can add a heavy tail and random failures.
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+# The real clients validate their API keys at import time.
+for key in ("GOOGLE_API_KEY", "MISTRAL_API_KEY", "GROQ_API_KEY", "TAVILY_API_KEY"):
+    os.environ.setdefault(key, "stub")
+# Keep benchmark runs out of the real response caches.
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="bench-cache-"))
+
+WRITER_RESPONSE = '{"content": "AI is reshaping how we hire.\\nWhat has changed in your team?"}'
+CRITIC_RESPONSE = '{"clarity": 8, "tone": 8, "engagement": 7, "relevance": 8, "suggestion": "Add one concrete stat."}'
+BATCH_CRITIC_RESPONSE = (
+    '{"reviews": ['
+    '{"candidate": 1, "clarity": 7, "tone": 7, "engagement": 6, "relevance": 7, "suggestion": "Tighten the hook."}, '
+    '{"candidate": 2, "clarity": 8, "tone": 8, "engagement": 8, "relevance": 8, "suggestion": "Add one concrete stat."}, '
+    '{"candidate": 3, "clarity": 6, "tone": 7, "engagement": 7, "relevance": 6, "suggestion": "Cut the second paragraph."}'
+    ']}'
+)
+IMAGE_RESPONSE = '{"description": "A city skyline with solar panels.", "key_elements": ["skyline", "solar"], "sentiment": "optimistic"}'
+VIDEO_RESPONSE = '{"summary": "A walkthrough of a wind farm.", "key_moments": ["turbines", "grid"], "sentiment": "factual"}'
+RESEARCH_RESPONSE = '{"summary": "Most recruiters now use AI screening tools."}'
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Chat model that returns a canned response after `latency` seconds, or after
+    `tail_latency` seconds with probability `tail_probability`, and fails with
+    probability `error_rate`. The sync path sleeps the thread, the async path
+    yields to the loop.
+    """
+    response: str
+    latency: float = 0.5
+    tail_latency: float = 0.0
+    tail_probability: float = 0.0
+    error_rate: float = 0.0
+    temperature: float = 0.0 # Only so the writer's configurable temperature has a field to bind
+    model_name: str = "stub"
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _result(self, messages) -> ChatResult:
+        # Rough token counts so usage metrics have something to report
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        output_tokens = len(self.response) // 4
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response, usage_metadata=usage))])
+
+    def _delay(self) -> float:
+        if self.tail_probability and random.random() < self.tail_probability:
+            return self.tail_latency
+        return self.latency
+
+    def _fail(self):
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError(f"Stub provider {self.model_name} failed")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._delay())
+        self._fail()
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        self._fail()
+        return self._result(messages)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        # Spread the latency over the tokens, like a real streaming provider
+        tokens = self.response.split(" ")
+        delay = self._delay()
+        self._fail()
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(delay / len(tokens))
+            text = token if i == len(tokens) - 1 else token + " "
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+
+def stub_research_agent(latency: float = 0.5) -> RunnableLambda:
+    """
+    Stand-in for the ReAct research AgentExecutor, which returns a dict with an "output" key.
+    """
+    def research(_input):
+        time.sleep(latency)
+        return {"output": RESEARCH_RESPONSE}
+
+    async def aresearch(_input):
+        await asyncio.sleep(latency)
+        return {"output": RESEARCH_RESPONSE}
+
+    return RunnableLambda(research, afunc=aresearch)
+
+
+def install_stub_llms(latency: float = 0.5):
+    """
+    Replaces every remote chain used by agents.graph with a stub of the given latency.
+    """
+    from agents import graph
+    from agents.critic_agent import critic_prompt, batch_critic_prompt
+    from agents.writer_agent import writer_prompt, rewrite_prompt
+    from agents.image_agent import image_analysis_prompt
+    from agents.video_agent import video_analysis_prompt
+
+    graph.writer_agent = writer_prompt | StubChatModel(response=WRITER_RESPONSE, latency=latency)
+    graph.rewrite_agent = rewrite_prompt | StubChatModel(response=WRITER_RESPONSE, latency=latency)
+    graph.critic_agent = critic_prompt | StubChatModel(response=CRITIC_RESPONSE, latency=latency)
+    graph.batch_critic_agent = batch_critic_prompt | StubChatModel(response=BATCH_CRITIC_RESPONSE, latency=latency)
+    graph.image_analyser_agent = image_analysis_prompt | StubChatModel(response=IMAGE_RESPONSE, latency=latency)
+    graph.video_analyser_agent = video_analysis_prompt | StubChatModel(response=VIDEO_RESPONSE, latency=latency)
+    graph.research_agent = stub_research_agent(latency)
+    return graph
+
+
+# Canned response for each routed route; research goes through the real ReAct executor
+ROUTE_RESPONSES = {
+    "writer": WRITER_RESPONSE,
+    "critic": CRITIC_RESPONSE,
+    "batch_critic": BATCH_CRITIC_RESPONSE,
+    "research": f"Final Answer: {RESEARCH_RESPONSE}",
+}
+
+
+def install_stub_router(profiles: dict, tiers: dict = None):
+    """
+    Points the model router at stub providers with injected latency profiles.
+
+    profiles maps route -> stub model name -> StubChatModel settings, e.g.
+    {"critic": {"fast": {"latency": 0.05}, "flaky": {"latency": 0.01, "error_rate": 0.5}}}.
+    Each route's default tier lists its stubs in the given order; `tiers` can add
+    others, e.g. {"critic": {"small": ["fast"]}}. Models are addressed as
+    "stub:<route>/<name>" in the router's stats and metrics.
+    """
+    from agents import graph
+    from agents.router import model_router
+
+    def stub(name, **kwargs):
+        route, model = name.split("/", 1)
+        return StubChatModel(response=ROUTE_RESPONSES[route], model_name=name, **profiles[route][model])
+
+    model_router.providers["stub"] = stub
+    for route, models in profiles.items():
+        model_router.routes[route] = {"default": [f"stub:{route}/{name}" for name in models]}
+        for tier, names in (tiers or {}).get(route, {}).items():
+            model_router.routes[route][tier] = [f"stub:{route}/{name}" for name in names]
+    return graph
@@ -1,12 +1,61 @@
 from fastapi import FastAPI,HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
-from agents.graph import app as langgraph_app, AgentState
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from agents.graph import app as langgraph_app, AgentState, arun_research, draw_graph, run_config, ainspect_run
+from agents.checkpoint import checkpointer
+from agents.cache import llm_cache, cache_bypass
+from agents.metrics import render_metrics, monitor_event_loop_lag
+from agents.router import model_router
+from agents.researcher_agent import invalidate_research
+from agents.parsing import JSONStringFieldStream
 from tools.upload_content import ContentUploader
+from tools.publish_queue import PublishQueue
+from tools.rate_limit import linkedin_rate_limiter
+from tools.media_registry import media_registry
+from contextlib import asynccontextmanager
 import uvicorn
-
-app = FastAPI()
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await publish_queue.start()
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag(EVENT_LOOP_LAG_INTERVAL)) if EVENT_LOOP_LAG_INTERVAL > 0 else None
+    yield
+    if lag_monitor:
+        lag_monitor.cancel()
+    await publish_queue.stop()
+    # Close the pooled LinkedIn connections on shutdown
+    await uploader.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+BATCH_CONCURRENCY_MAX = int(os.getenv("BATCH_CONCURRENCY_MAX", 32)) # Upper bound for a request's own concurrency
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", 100))
+MAX_CANDIDATES = int(os.getenv("MAX_CANDIDATES", 8))
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", 0.1)) # 0 turns the lag probe off
+
+# Fields each graph node reports in its streamed "node" event
+STREAM_NODE_FIELDS = {
+    "research": ["research_summary"],
+    "research_branch": ["research_summary"],
+    "url_analyzer": ["url_analysis", "research_summary"],
+    "image_analyzer": ["image_analysis", "research_summary"],
+    "video_analyzer": ["video_analysis", "research_summary"],
+    "analysis_branch": ["url_analysis", "image_analysis", "video_analysis"],
+    "merge": ["research_summary", "timings"],
+    "writer": ["post", "iteration_count", "tokens_saved"],
+    "skip_critic": ["score", "iteration_count", "tokens_saved"],
+    "best_of_n": ["post", "score", "critique", "runner_up_scores", "iteration_count"],
+    "critic": ["score", "critique", "critic_failed", "iteration_count"],
+}
 
 origins = ["*"]
 
@@ -29,27 +78,57 @@ class ContentRequest(BaseModel):
     word_limit: int = 250
     type: str
     url: str = None
+    fan_out: bool = False
+    bypass_cache: bool = False
+    delta_rewrites: bool = False
+    candidates: int = Field(default=1, ge=1, le=MAX_CANDIDATES) # Best-of-N drafts, scored in one critic call
+    run_id: Optional[str] = Field(default=None, max_length=128) # Retrying with the same id resumes a failed run
     
-class TextResponse(BaseModel):
+class BatchContentRequest(BaseModel):
+    requests: List[ContentRequest] = Field(max_length=BATCH_MAX_REQUESTS)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=BATCH_CONCURRENCY_MAX) # Defaults to BATCH_CONCURRENCY
+
+class ResearchTopic(BaseModel):
+    topic: str
+    description: str = ""
+    tone: str = "Professional"
+
+class ResearchInvalidateRequest(BaseModel):
+    topics: List[str] = [] # Empty clears every cached topic
+
+class ResearchPrewarmRequest(BaseModel):
+    topics: List[ResearchTopic]
+
+class PublishOptions(BaseModel):
+
+    background : bool = False # Enqueue the post and return a job id right away
+    webhook_url : Optional[str] = None # Called with the job status once a background post finishes
+
+class PublishJobAccepted(BaseModel):
+
+    job_id : str
+    status : str
+
+class TextResponse(PublishOptions):
     
     post_content : str
     post_visibility : str
 
 # for both URL and Article
-class URLResponse(BaseModel):
+class URLResponse(PublishOptions):
     
     post_title : str
     post_content : str
     post_url : str
     post_visibility : str
 
-class ImageResponse(BaseModel):
+class ImageResponse(PublishOptions):
     
     post_content : str
-    post_image : List[str]
+    post_image : List[str] # Local paths or http(s) URLs
     post_visibility : str
 
-class VideoResponse(BaseModel):
+class VideoResponse(PublishOptions):
     
     post_title : str
     post_content : str
@@ -60,10 +139,8 @@ class VideoResponse(BaseModel):
 async def root():
     return {"message": "Welcome To Linkedin Server!!!"}
     
-@app.post("/generate_linkedin_content")
-async def generate_linkedin_content(request_data: ContentRequest):
-
-    state = AgentState(
+def build_state(request_data: ContentRequest) -> AgentState:
+    return AgentState(
         topic=request_data.topic,
         tone=request_data.tone,
         description=request_data.description,
@@ -79,13 +156,284 @@ async def generate_linkedin_content(request_data: ContentRequest):
         post=None,
         score=None,
         critique=None,
-        iteration_count=0
+        iteration_count=0,
+        fan_out=request_data.fan_out,
+        delta_rewrites=request_data.delta_rewrites,
+        candidates=request_data.candidates
     )
 
-    result = langgraph_app.invoke(state)
+def request_hash(request_data: ContentRequest) -> str:
+    """
+    Digest of what a run generates from: everything but the run id and the cache option.
+    """
+    payload = request_data.model_dump(exclude={"run_id", "bypass_cache"})
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+def generation_config(request_data: ContentRequest) -> tuple[str, dict]:
+    run_id = request_data.run_id or uuid.uuid4().hex
+    return run_id, run_config(run_id, request_hash(request_data))
+
+async def run_input(request_data: ContentRequest, config: dict):
+    """
+    Returns (input, result) for a run: the fresh state for a new run id, None to resume
+    a run that stopped part way, or the stored result of a run that already completed.
+    Reusing a run id with a different request is a 409.
+    """
+    snapshot = await langgraph_app.aget_state(config)
+    if snapshot.metadata is None:
+        return build_state(request_data), None
+    run_id = config["configurable"]["thread_id"]
+    # Runs checkpointed before request hashes were stored have none to compare
+    stored_hash = snapshot.metadata.get("request_hash")
+    if stored_hash and stored_hash != config["metadata"]["request_hash"]:
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "run_id was already used for a different request", "run_id": run_id},
+        )
+    if snapshot.next:
+        print(f"Resuming run {run_id} at {list(snapshot.next)}")
+        return None, None
+    return None, snapshot.values
+
+async def claim_run(run_id: str) -> str:
+    """
+    Takes the run's lease for this request; a run id another request is still running is a 409.
+    """
+    token = await asyncio.to_thread(checkpointer.claim_run, run_id)
+    if token is None:
+        raise HTTPException(status_code=409, detail={"error": "run_id is already in progress", "run_id": run_id})
+    return token
+
+async def release_run(run_id: str, token: str):
+    await asyncio.to_thread(checkpointer.release_run, run_id, token)
+
+async def run_generation(request_data: ContentRequest) -> dict:
+    run_id, config = generation_config(request_data)
+    cache_bypass.set(request_data.bypass_cache)
+    token = await claim_run(run_id)
+    try:
+        graph_input, result = await run_input(request_data, config)
+        if result is None:
+            result = await langgraph_app.ainvoke(graph_input, config)
+    except HTTPException:
+        raise
+    except Exception as e:
+        # The run id lets the client retry from the last completed node
+        raise HTTPException(status_code=500, detail={"error": str(e), "run_id": run_id}) from e
+    finally:
+        await release_run(run_id, token)
+    return {**result, "run_id": run_id}
+
+@app.post("/generate_linkedin_content")
+async def generate_linkedin_content(request_data: ContentRequest):
+
+    result = await run_generation(request_data)
 
     return result
 
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    run = await ainspect_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
+
+@app.get("/runs")
+async def run_stats():
+    return await asyncio.to_thread(checkpointer.stats)
+
+@app.post("/generate_linkedin_content/batch")
+async def generate_linkedin_content_batch(request_data: BatchContentRequest):
+    """
+    Runs every request through the graph with at most `concurrency` in flight.
+    Results come back in input order; a failing item only fails its own entry.
+    """
+    semaphore = asyncio.Semaphore(request_data.concurrency or BATCH_CONCURRENCY)
+
+    async def run_one(index: int, item: ContentRequest) -> dict:
+        async with semaphore:
+            try:
+                # Each gather task runs in its own context, so bypass_cache stays per item
+                result = await run_generation(item)
+                return {"index": index, "status": "success", "result": result}
+            except HTTPException as e:
+                print(f"Batch item {index} failed: {e.detail['error']}")
+                return {"index": index, "status": "error", **e.detail}
+
+    results = await asyncio.gather(*(run_one(i, item) for i, item in enumerate(request_data.requests)))
+    return {
+        "succeeded": sum(1 for r in results if r["status"] == "success"),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "results": results
+    }
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+@app.post("/generate_linkedin_content/stream")
+async def generate_linkedin_content_stream(request_data: ContentRequest):
+    """
+    Server-sent events for one generation:
+    - "node" when a graph node finishes, with the fields it produced
+    - "token" for each piece of the writer's post as it arrives (decoded from the
+      model's {"content": ...} JSON), numbered by draft
+    - "replace" when a draft's text should be swapped for the one given: with
+      reason "retry" (empty text) when the writer's model call is retried after
+      tokens went out, and reason "final" when the draft the writer kept differs
+      from what was streamed, e.g. because a hedged call won
+    - "result" with the final state, or "error" if the run fails
+    The first event, "run", carries the run id to retry with.
+    """
+    run_id, config = generation_config(request_data)
+    # Before the stream starts, so a reused or running run id can still be answered with a 409
+    token = await claim_run(run_id)
+    try:
+        graph_input, result = await run_input(request_data, config)
+    except BaseException:
+        await release_run(run_id, token)
+        raise
+
+    async def events():
+        cache_bypass.set(request_data.bypass_cache)
+        draft = 0
+        streamed = JSONStringFieldStream("content")
+        try:
+            yield sse_event("run", {"run_id": run_id})
+            if result is not None:
+                yield sse_event("result", result)
+                return
+            async for event in langgraph_app.astream_events(graph_input, config, version="v2"):
+                kind = event["event"]
+                node = event.get("metadata", {}).get("langgraph_node")
+                if kind == "on_chain_start" and event["name"] == "writer" and len(event["parent_ids"]) == 1:
+                    draft += 1
+                    streamed = JSONStringFieldStream("content")
+                elif kind == "on_chat_model_start" and node == "writer":
+                    if streamed.text:
+                        yield sse_event("replace", {"draft": draft, "text": "", "reason": "retry"})
+                    streamed = JSONStringFieldStream("content")
+                elif kind == "on_chat_model_stream" and node == "writer":
+                    chunk = event["data"]["chunk"].content
+                    if isinstance(chunk, str) and (text := streamed.feed(chunk)):
+                        yield sse_event("token", {"draft": draft, "text": text})
+                elif kind == "on_chain_end" and event["name"] == node and len(event["parent_ids"]) == 1 and node in STREAM_NODE_FIELDS:
+                    output = event["data"]["output"]
+                    output = output if isinstance(output, dict) else output.model_dump()
+                    if node == "writer" and output.get("post") is not None and output["post"] != streamed.text:
+                        yield sse_event("replace", {"draft": draft, "text": output["post"], "reason": "final"})
+                    fields = {field: output.get(field) for field in STREAM_NODE_FIELDS[node] if field in output}
+                    yield sse_event("node", {"node": node, **fields})
+                elif kind == "on_chain_end" and not event["parent_ids"]:
+                    yield sse_event("result", event["data"]["output"])
+        except Exception as e:
+            print(f"Streaming generation failed: {e}")
+            yield sse_event("error", {"detail": str(e), "run_id": run_id})
+        finally:
+            await release_run(run_id, token)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/router")
+async def router_stats():
+    return model_router.stats()
+
+@app.get("/debug/graph")
+async def debug_graph(format: Literal["mermaid", "ascii"] = "mermaid"):
+    return PlainTextResponse(draw_graph(format))
+
+@app.get("/llm_cache/stats")
+async def llm_cache_stats():
+    if llm_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_cache.stats()}
+
+@app.get("/linkedin/rate_limits")
+async def linkedin_rate_limits():
+    return linkedin_rate_limiter.stats()
+
+@app.get("/media_registry/stats")
+async def media_registry_stats():
+    return await asyncio.to_thread(media_registry.stats)
+
+@app.post("/admin/research_cache/invalidate")
+async def invalidate_research_cache(request_data: ResearchInvalidateRequest):
+    removed = await asyncio.to_thread(invalidate_research, request_data.topics)
+    return {"removed": removed}
+
+@app.post("/admin/research_cache/prewarm")
+async def prewarm_research_cache(request_data: ResearchPrewarmRequest):
+    summaries = await asyncio.gather(
+        *(arun_research(item.topic, item.description, item.tone) for item in request_data.topics),
+        return_exceptions=True
+    )
+    return {
+        item.topic: (f"Error: {summary}" if isinstance(summary, Exception) else summary)
+        for item, summary in zip(request_data.topics, summaries)
+    }
+
+async def publish(kind: str, payload: dict):
+    """
+    Runs one LinkedIn post; used inline by the /post_linkedin_* endpoints
+    and by the publish queue workers for background posts.
+    """
+    if kind == "text":
+        request_data = TextResponse(**payload)
+        return await uploader.aupload_text_content(
+            request_data.post_content,
+            request_data.post_visibility
+        )
+    if kind == "url":
+        request_data = URLResponse(**payload)
+        return await uploader.aupload_url_content(
+            request_data.post_content,
+            request_data.post_url,
+            request_data.post_title,
+            request_data.post_visibility
+        )
+    if kind == "image":
+        request_data = ImageResponse(**payload)
+        return await uploader.aupload_image_content(
+            request_data.post_image,
+            request_data.post_content,
+            request_data.post_visibility
+        )
+    if kind == "video":
+        request_data = VideoResponse(**payload)
+        return await uploader.aupload_video_content(
+            request_data.post_video,
+            request_data.post_content,
+            request_data.post_title,
+            request_data.post_visibility
+        )
+    raise ValueError(f"Unknown publish job kind: {kind}")
+
+publish_queue = PublishQueue(publish)
+
+async def submit(kind: str, request_data: PublishOptions):
+    if request_data.background:
+        job_id = await publish_queue.enqueue(kind, request_data.model_dump(), request_data.webhook_url)
+        return JSONResponse(
+            PublishJobAccepted(job_id=job_id, status="queued").model_dump(),
+            status_code=202,
+            headers={"Location": f"/publish_jobs/{job_id}"}
+        )
+    return await publish(kind, request_data.model_dump())
+
+@app.get("/publish_jobs/{job_id}")
+async def get_publish_job(job_id: str):
+    job = await asyncio.to_thread(publish_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Publish job not found")
+    return job
+
+@app.get("/publish_jobs")
+async def publish_job_counts():
+    return await asyncio.to_thread(publish_queue.counts)
+
 @app.post("/post_linkedin_text_content")
 async def post_linkedin_text_content(request_data: TextResponse):
     try:
@@ -94,12 +442,7 @@ async def post_linkedin_text_content(request_data: TextResponse):
         if not request_data.post_content or not request_data.post_visibility:
             raise HTTPException(status_code=400, detail="Missing required fields")
 
-        response = uploader.upload_text_content(
-            request_data.post_content,
-            request_data.post_visibility
-        )
-
-        return response
+        return await submit("text", request_data)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -113,14 +456,7 @@ async def post_linkedin_url_content(request_data: URLResponse):
         if not request_data.post_title or not request_data.post_content or not request_data.post_url or not request_data.post_visibility:
             raise HTTPException(status_code=400, detail="Missing required fields")
 
-        response = uploader.upload_url_content(
-            request_data.post_content,
-            request_data.post_url,
-            request_data.post_title,
-            request_data.post_visibility        
-        )
-
-        return response
+        return await submit("url", request_data)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -133,13 +469,7 @@ async def post_linkedin_image_content(request_data: ImageResponse):
         if not request_data.post_content or not request_data.post_image or not request_data.post_visibility:
             raise HTTPException(status_code=400, detail="Missing required fields")
 
-        response = uploader.upload_image_content(
-            request_data.post_image,
-            request_data.post_content,
-            request_data.post_visibility
-        )
-
-        return response
+        return await submit("image", request_data)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -152,14 +482,7 @@ async def post_linkedin_video_content(request_data: VideoResponse):
         if not request_data.post_title or not request_data.post_content or not request_data.post_video or not request_data.post_visibility:
             raise HTTPException(status_code=400, detail="Missing required fields")
 
-        response = uploader.upload_video_content(
-            request_data.post_video,
-            request_data.post_content,
-            request_data.post_title,
-            request_data.post_visibility
-        )
-
-        return response
+        return await submit("video", request_data)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
@@ -0,0 +1,140 @@
+import asyncio
+import operator
+import time
+from typing import Annotated, TypedDict
+import pytest
+from langgraph.graph import END, START, StateGraph
+from agents.checkpoint import SQLiteCheckpointer
+
+
+class State(TypedDict):
+    steps: Annotated[list, operator.add]
+
+
+def build(checkpointer, fail):
+    def research(state):
+        return {"steps": ["research"]}
+
+    def writer(state):
+        if fail["writer"]:
+            raise RuntimeError("writer failed")
+        return {"steps": ["writer"]}
+
+    graph = StateGraph(State)
+    graph.add_node("research", research)
+    graph.add_node("writer", writer)
+    graph.add_edge(START, "research")
+    graph.add_edge("research", "writer")
+    graph.add_edge("writer", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+@pytest.fixture
+def checkpointer(tmp_path):
+    return SQLiteCheckpointer(path=str(tmp_path / "checkpoints.sqlite"), retention=60, prune_interval=3600)
+
+
+def config(run_id, **metadata):
+    return {"configurable": {"thread_id": run_id}, "metadata": metadata}
+
+
+def test_put_and_get(checkpointer):
+    app = build(checkpointer, {"writer": False})
+    assert app.invoke({"steps": []}, config("run-1")) == {"steps": ["research", "writer"]}
+
+    saved = checkpointer.get_tuple(config("run-1"))
+    assert saved.checkpoint["channel_values"]["steps"] == ["research", "writer"]
+    assert saved.parent_config["configurable"]["checkpoint_id"]
+    assert checkpointer.get_tuple(config("unknown")) is None
+
+
+def test_list_is_latest_first_and_filters_metadata(checkpointer):
+    app = build(checkpointer, {"writer": False})
+    app.invoke({"steps": []}, config("run-1", request_hash="a"))
+    app.invoke({"steps": []}, config("run-2", request_hash="b"))
+
+    checkpoints = list(checkpointer.list(config("run-1")))
+    assert [c.metadata["step"] for c in checkpoints] == sorted((c.metadata["step"] for c in checkpoints), reverse=True)
+    assert all(c.config["configurable"]["thread_id"] == "run-1" for c in checkpoints)
+    assert len(list(checkpointer.list(config("run-1"), limit=2))) == 2
+    assert {c.config["configurable"]["thread_id"] for c in checkpointer.list(None, filter={"request_hash": "b"})} == {"run-2"}
+
+
+def test_resume_after_failure_keeps_finished_nodes(checkpointer):
+    fail = {"writer": True}
+    app = build(checkpointer, fail)
+    with pytest.raises(RuntimeError):
+        app.invoke({"steps": []}, config("run-1"))
+    snapshot = app.get_state(config("run-1"))
+    assert snapshot.next == ("writer",)
+    assert [task.error is not None for task in snapshot.tasks] == [True]
+
+    fail["writer"] = False
+    # Resuming with no input runs only the failed node
+    assert app.invoke(None, config("run-1")) == {"steps": ["research", "writer"]}
+    assert app.get_state(config("run-1")).next == ()
+
+
+def test_async_resume(checkpointer):
+    fail = {"writer": True}
+    app = build(checkpointer, fail)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await app.ainvoke({"steps": []}, config("run-1"))
+        fail["writer"] = False
+        result = await app.ainvoke(None, config("run-1"))
+        checkpoints = [c async for c in checkpointer.alist(config("run-1"))]
+        return result, checkpoints
+
+    result, checkpoints = asyncio.run(run())
+    assert result == {"steps": ["research", "writer"]}
+    assert checkpoints[0].checkpoint["channel_values"]["steps"] == ["research", "writer"]
+
+
+def test_prune_removes_stale_runs(checkpointer):
+    app = build(checkpointer, {"writer": False})
+    app.invoke({"steps": []}, config("old"))
+    app.invoke({"steps": []}, config("new"))
+    with checkpointer.cursor() as cur:
+        cur.execute("UPDATE checkpoint_runs SET updated_at = ? WHERE thread_id = 'old'", (time.time() - 120,))
+
+    assert checkpointer.prune() == 1
+    assert checkpointer.get_tuple(config("old")) is None
+    assert checkpointer.get_tuple(config("new")) is not None
+    assert checkpointer.stats()["runs"] == 1
+
+
+def test_delete_thread(checkpointer):
+    app = build(checkpointer, {"writer": True})
+    with pytest.raises(RuntimeError):
+        app.invoke({"steps": []}, config("run-1"))
+    assert checkpointer.stats()["writes"] > 0
+
+    checkpointer.delete_thread("run-1")
+    assert checkpointer.stats() == {"runs": 0, "checkpoints": 0, "writes": 0, "retention": 60}
+
+
+def test_run_lease(checkpointer):
+    token = checkpointer.claim_run("run-1")
+    assert token
+    assert checkpointer.claim_run("run-1") is None
+    assert checkpointer.claim_run("run-2")
+
+    # Another request's token does not release the run
+    checkpointer.release_run("run-1", "not-the-token")
+    assert checkpointer.claim_run("run-1") is None
+    checkpointer.release_run("run-1", token)
+    assert checkpointer.claim_run("run-1")
+
+
+def test_run_lease_expires_unless_the_run_checkpoints(checkpointer):
+    checkpointer.run_lease_ttl = 0.5
+    assert checkpointer.claim_run("stalled")
+    assert checkpointer.claim_run("running")
+    time.sleep(0.3)
+    build(checkpointer, {"writer": False}).invoke({"steps": []}, config("running"))
+    time.sleep(0.3)
+
+    assert checkpointer.claim_run("stalled")
+    assert checkpointer.claim_run("running") is None
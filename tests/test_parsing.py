@@ -0,0 +1,132 @@
+import pytest
+from langchain_core.messages import AIMessage
+from agents.metrics import parse_attempts, parse_failures, parse_repairs
+from agents.models import BatchCriticOutput, WriterOutput
+from agents.parsing import JSONStringFieldStream, OutputParseError, _first_object, _repair, extract_json, parse_output
+
+
+def test_first_object_skips_prose_and_code_fences():
+    text = 'Here is the post:\n```json\n{"content": "Hello"}\n```\nLet me know!'
+    assert _first_object(text) == ('{"content": "Hello"}', False)
+
+
+def test_first_object_ignores_brackets_and_escaped_quotes_in_strings():
+    text = '{"content": "a } b { c ] \\" d"} {"second": 1}'
+    assert _first_object(text) == ('{"content": "a } b { c ] \\" d"}', False)
+
+
+def test_first_object_closes_truncated_output():
+    assert _first_object('{"content": "Hello wor') == ('{"content": "Hello wor"}', True)
+    assert _first_object('{"reviews": [{"candidate": 1') == ('{"reviews": [{"candidate": 1}]}', True)
+
+
+def test_first_object_without_object():
+    assert _first_object("no json here") == (None, False)
+
+
+def test_repair_smart_quotes():
+    assert _repair("{“content”: “Hi”}") == '{"content": "Hi"}'
+
+
+def test_repair_escapes_control_characters_in_strings_only():
+    assert _repair('{"content": "one\ntwo\tthree\r"}\n') == '{"content": "one\\ntwo\\tthree\\r"}\n'
+
+
+def test_repair_trailing_commas():
+    assert _repair('{"a": [1, 2, ], "b": 3,\n}') == '{"a": [1, 2 ], "b": 3\n}'
+
+
+def test_repair_keeps_commas_inside_strings():
+    assert _repair('{"content": "a,}", "b": 1}') == '{"content": "a,}", "b": 1}'
+
+
+def test_repair_python_literals_outside_strings():
+    assert _repair('{"a": True, "b": False, "c": None, "d": "True story"}') == '{"a": true, "b": false, "c": null, "d": "True story"}'
+    # Only whole words are literals
+    assert _repair('{"a": Nonesuch, "b": xTrue}') == '{"a": Nonesuch, "b": xTrue}'
+
+
+@pytest.mark.parametrize("text", [
+    '{"content": "Hello"}',
+    '```json\n{"content": "Hello"}\n```',
+    'Sure! {"content": "Hello"} Hope this helps.',
+])
+def test_extract_json_clean_object_is_not_repaired(text):
+    assert extract_json(text) == ({"content": "Hello"}, False)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"content": "Hello wor', {"content": "Hello wor"}),
+    ("{“content”: “Hello”}", {"content": "Hello"}),
+    ('{"content": "line one\nline two"}', {"content": "line one\nline two"}),
+    ('{"main_points": ["a", "b",],}', {"main_points": ["a", "b"]}),
+    ('{"ok": True, "skip": None}', {"ok": True, "skip": None}),
+    ('```\n{"content": "Hello",\n', {"content": "Hello"}),
+])
+def test_extract_json_repairs(text, expected):
+    data, repaired = extract_json(text)
+    assert data == expected
+    assert repaired
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "The model refused to answer.",
+    "{'content': 'single quotes'}",
+    '{"content": "Hello" "world"}',
+    '{"content": "Hello", "score":',
+    '{content: "unquoted key"}',
+])
+def test_extract_json_still_fails(text):
+    with pytest.raises(OutputParseError):
+        extract_json(text)
+
+
+def test_parse_output_counts_repairs():
+    attempts, repairs = parse_attempts.value("test_repair"), parse_repairs.value("test_repair")
+    parsed = parse_output(AIMessage(content='{"content": "Hi",}'), WriterOutput, "test_repair")
+    assert parsed == WriterOutput(content="Hi")
+    assert parse_attempts.value("test_repair") == attempts + 1
+    assert parse_repairs.value("test_repair") == repairs + 1
+
+
+def test_parse_output_accepts_structured_output():
+    parsed = WriterOutput(content="Hi")
+    assert parse_output(parsed, WriterOutput, "test_structured") is parsed
+    assert parse_output({"raw": AIMessage(content=""), "parsed": parsed}, WriterOutput, "test_structured") is parsed
+    # Structured output that failed validation falls back to the raw text
+    raw = {"raw": AIMessage(content='{"content": "From raw"}'), "parsed": None}
+    assert parse_output(raw, WriterOutput, "test_structured") == WriterOutput(content="From raw")
+
+
+def test_parse_output_validation_failure():
+    failures = parse_failures.value("test_invalid")
+    with pytest.raises(OutputParseError, match="^test_invalid: "):
+        parse_output('{"reviews": [{"candidate": 1, "clarity": 11}]}', BatchCriticOutput, "test_invalid")
+    assert parse_failures.value("test_invalid") == failures + 1
+
+
+def feed_all(chunks):
+    stream = JSONStringFieldStream("content")
+    return [stream.feed(chunk) for chunk in chunks], stream.text
+
+
+def test_field_stream_decodes_only_the_field_value():
+    pieces, text = feed_all(['```json\n{"con', 'tent": "Hello', ' world', '!", "x": "ignored"}\n```'])
+    assert pieces == ["", "Hello", " world", "!"]
+    assert text == "Hello world!"
+
+
+def test_field_stream_decodes_escapes_split_across_chunks():
+    chunks = ['{"content": "Line\\', 'nnext \\"quoted\\" \\u00', 'e9 \\ud83d', '\\ude00"}']
+    pieces, text = feed_all(chunks)
+    assert text == 'Line\nnext "quoted" \u00e9 \U0001F600'
+    assert pieces[0] == "Line"
+
+
+def test_field_stream_keeps_invalid_escapes_and_raw_line_breaks():
+    assert feed_all(['{"content": "a\\q b\nc"}'])[1] == "a\\q b\nc"
+
+
+def test_field_stream_without_the_field():
+    assert feed_all(['{"summary": "no content here"}']) == ([""], "")
@@ -0,0 +1,25 @@
+import pytest
+from agents.url_agent import normalize_url
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://Example.COM:443/post?b=2&a=1#section", "https://example.com/post?a=1&b=2"),
+    ("http://example.com:8080", "http://example.com:8080/"),
+    ("https://example.com/post?utm_source=x&utm_campaign=y&gclid=1&fbclid=2&msclkid=3&id=7", "https://example.com/post?id=7"),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+def test_normalize_url_keeps_ambiguous_params():
+    # ref and si select content on some sites, so URLs that differ in them stay distinct
+    assert normalize_url("https://example.com/?ref=main") != normalize_url("https://example.com/?ref=dev")
+    assert normalize_url("https://example.com/?si=a") == "https://example.com/?si=a"
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://Example.com:abc/post", "https://example.com:abc/post"),
+    ("https://example.com:99999/post", "https://example.com:99999/post"),
+])
+def test_normalize_url_malformed_port(url, expected):
+    assert normalize_url(url) == expected
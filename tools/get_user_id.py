@@ -1,21 +1,36 @@
-import requests
+from agents.cassette import http_session
 import os
 from dotenv import load_dotenv
 
 
 load_dotenv(override=True)
 
-def get_linkedin_user_info():
+def _user_info_request():
 
     access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
     
-    url = "https://api.linkedin.com/v2/userinfo"
+    url = f"{os.getenv('LINKEDIN_API_BASE_URL', 'https://api.linkedin.com')}/v2/userinfo"
     headers = {
         "Authorization": f"Bearer {access_token}"
     }
+    return url, headers
+
+def get_linkedin_user_info():
+
+    url, headers = _user_info_request()
     
-    response = requests.get(url, headers=headers)
-    
+    response = http_session.get(url, headers=headers)
+    return _handle_user_info_response(response)
+
+async def aget_linkedin_user_info(client):
+    """
+    Async variant of get_linkedin_user_info using the pooled httpx.AsyncClient.
+    """
+    url, headers = _user_info_request()
+    response = await client.get(url, headers=headers)
+    return _handle_user_info_response(response)
+
+def _handle_user_info_response(response):
     if response.status_code == 200:
         return response.json()
     else:
@@ -0,0 +1,97 @@
+import asyncio
+import importlib.util
+import os
+import httpx
+import requests
+from dotenv import load_dotenv
+from agents.cassette import cassette
+from .rate_limit import RateLimitedTransport, RateLimitedAdapter, linkedin_rate_limiter
+from .publish_queue import mark_posting
+
+load_dotenv()
+
+LINKEDIN_API_BASE_URL = os.getenv("LINKEDIN_API_BASE_URL", "https://api.linkedin.com")
+LINKEDIN_MAX_CONNECTIONS = int(os.getenv("LINKEDIN_MAX_CONNECTIONS", 20))
+LINKEDIN_MAX_KEEPALIVE = int(os.getenv("LINKEDIN_MAX_KEEPALIVE", 10))
+LINKEDIN_TIMEOUT = float(os.getenv("LINKEDIN_TIMEOUT", 30))
+LINKEDIN_UPLOAD_TIMEOUT = float(os.getenv("LINKEDIN_UPLOAD_TIMEOUT", 300))
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")
+LINKEDIN_HTTP2 = os.getenv("LINKEDIN_HTTP2", "true").lower() == "true" and importlib.util.find_spec("h2") is not None
+
+FILE_CHUNK_SIZE = 64 * 1024
+STREAM_BUFFER_CHUNKS = int(os.getenv("STREAM_BUFFER_CHUNKS", 8))
+
+
+def create_linkedin_client(max_connections=LINKEDIN_MAX_CONNECTIONS, max_keepalive=LINKEDIN_MAX_KEEPALIVE, timeout=LINKEDIN_TIMEOUT):
+    """
+    Build the pooled, keep-alive async client shared by every LinkedIn call.
+
+    Parameters:
+    - max_connections: Maximum number of open connections in the pool
+    - max_keepalive: Maximum number of idle connections kept alive
+    - timeout: Default timeout in seconds for API calls (binary uploads use LINKEDIN_UPLOAD_TIMEOUT)
+
+    Returns:
+    - httpx.AsyncClient, rate limited and retrying through linkedin_rate_limiter (recorded or replayed in cassette mode),
+      that flags a running publish job before its ugcPosts call
+    """
+    transport = httpx.AsyncHTTPTransport(
+        http2=LINKEDIN_HTTP2,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+    )
+    return httpx.AsyncClient(
+        transport=cassette.transport(RateLimitedTransport(transport, linkedin_rate_limiter)),
+        timeout=httpx.Timeout(timeout),
+        event_hooks={"request": [mark_posting]},
+    )
+
+
+def create_linkedin_session():
+    """
+    requests session for the synchronous tools, sharing the async client's rate limits.
+    """
+    session = requests.Session()
+    adapter = RateLimitedAdapter(linkedin_rate_limiter)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return cassette.session(session)
+
+
+linkedin_session = create_linkedin_session()
+
+
+async def aiter_file(path, chunk_size=FILE_CHUNK_SIZE):
+    """
+    Yield a file in fixed-size chunks without blocking the event loop,
+    so uploads never hold the whole file in memory.
+    """
+    with open(path, 'rb') as file:
+        while chunk := await asyncio.to_thread(file.read, chunk_size):
+            yield chunk
+
+
+async def abounded_stream(chunks, max_buffered=STREAM_BUFFER_CHUNKS):
+    """
+    Relay an async byte stream through a bounded queue, so the producer
+    (e.g. a download) can run ahead of the consumer (e.g. an upload) by at
+    most max_buffered chunks. Memory stays bounded whatever the stream size.
+    """
+    queue = asyncio.Queue(maxsize=max_buffered)
+    done = object()
+
+    async def produce():
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+            await queue.put(done)
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (item := await queue.get()) is not done:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
@@ -0,0 +1,226 @@
+# media_registry.py
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+import requests
+from dotenv import load_dotenv
+from agents.cassette import http_session
+from agents.metrics import cache_requests
+
+load_dotenv()
+
+MEDIA_REGISTRY_ENABLED = os.getenv("MEDIA_REGISTRY_ENABLED", "true").lower() == "true"
+MEDIA_REGISTRY_PATH = os.getenv("MEDIA_REGISTRY_PATH", os.path.join(os.getenv("CACHE_DIR", ".cache"), "media_registry.sqlite"))
+MEDIA_ASSET_TTL = float(os.getenv("MEDIA_ASSET_TTL", 7 * 24 * 60 * 60)) # How long an uploaded asset URN is reused
+MEDIA_SOURCE_TIMEOUT = float(os.getenv("MEDIA_SOURCE_TIMEOUT", 10))
+
+
+def _is_remote(source):
+    return source.startswith(("http://", "https://"))
+
+
+def source_validator(headers):
+    """
+    What identifies the bytes behind a URL without downloading them: the ETag, or
+    Last-Modified plus Content-Length. None when the server sends neither.
+    """
+    if headers.get("ETag"):
+        return f"etag:{headers['ETag']}"
+    if headers.get("Last-Modified") and headers.get("Content-Length"):
+        return f"modified:{headers['Last-Modified']}:{headers['Content-Length']}"
+    return None
+
+
+class StreamDigest:
+    """
+    SHA-256 of a body computed as it is relayed, so a remote image is hashed on
+    its way to LinkedIn instead of being downloaded twice.
+    """
+
+    def __init__(self):
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.validator = None
+
+    def update(self, chunk):
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+
+    def wrap(self, chunks):
+        for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+
+    async def awrap(self, chunks):
+        async for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+
+class MediaRegistry:
+    """
+    Persistent map from the SHA-256 of media bytes to the LinkedIn asset URN they
+    were uploaded as, per owner and media kind, with expiry. A repeat upload of the
+    same bytes reuses the URN and skips registerUpload and the binary upload.
+
+    Local files are hashed before registering (memoized by path, size and mtime).
+    URLs are hashed while they are relayed, and the hash is remembered under the
+    URL's ETag/Last-Modified, so a repeat only costs a HEAD request.
+    """
+
+    def __init__(self, path=MEDIA_REGISTRY_PATH, ttl=MEDIA_ASSET_TTL, enabled=MEDIA_REGISTRY_ENABLED):
+        self.path = path
+        self.ttl = ttl
+        self.enabled = enabled
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS media_assets ("
+                "sha256 TEXT NOT NULL, kind TEXT NOT NULL, owner TEXT NOT NULL, asset TEXT NOT NULL, "
+                "size INTEGER NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL, "
+                "hits INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (sha256, kind, owner))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS media_sources ("
+                "source TEXT PRIMARY KEY, sha256 TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def lookup(self, sha256, kind, owner):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT asset FROM media_assets WHERE sha256 = ? AND kind = ? AND owner = ? AND expires_at > ?",
+                (sha256, kind, owner, now),
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE media_assets SET hits = hits + 1 WHERE sha256 = ? AND kind = ? AND owner = ?",
+                    (sha256, kind, owner),
+                )
+        cache_requests.inc("media", "hit" if row else "miss")
+        return row[0] if row else None
+
+    def record(self, sha256, kind, owner, asset, size):
+        if not self.enabled or not sha256:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO media_assets (sha256, kind, owner, asset, size, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sha256, kind, owner, asset, size, now, now + self.ttl),
+            )
+            conn.execute("DELETE FROM media_assets WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM media_sources WHERE created_at <= ?", (now - self.ttl,))
+
+    def forget(self, asset):
+        """
+        Drops an asset that LinkedIn no longer accepts, so the next post uploads it again.
+        """
+        with self._connect() as conn:
+            conn.execute("DELETE FROM media_assets WHERE asset = ?", (asset,))
+
+    def _source_hash(self, source):
+        with self._connect() as conn:
+            row = conn.execute("SELECT sha256 FROM media_sources WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+
+    def remember_source(self, source, sha256):
+        if not self.enabled or not source:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO media_sources (source, sha256, created_at) VALUES (?, ?, ?)",
+                (source, sha256, time.time()),
+            )
+
+    def file_digest(self, path):
+        """
+        Returns (sha256, size) of a local file, reusing the hash while the file is unchanged.
+        """
+        stat = os.stat(path)
+        source = f"file:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        sha256 = self._source_hash(source)
+        if sha256 is None:
+            with open(path, "rb") as file:
+                sha256 = hashlib.file_digest(file, "sha256").hexdigest()
+            self.remember_source(source, sha256)
+        return sha256, stat.st_size
+
+    def find(self, kind, owner, source):
+        """
+        Looks up an earlier upload of `source` (a local path or URL).
+
+        Returns (asset, sha256): the asset URN to reuse or None, and the local file's
+        hash to record after uploading (None for URLs, which are hashed in flight).
+        """
+        if not self.enabled:
+            return None, None
+        if _is_remote(source):
+            try:
+                response = http_session.head(source, allow_redirects=True, timeout=MEDIA_SOURCE_TIMEOUT)
+            except requests.exceptions.RequestException:
+                return None, None
+            return self._find_url(kind, owner, source, response.headers), None
+        if not os.path.exists(source):
+            return None, None
+        sha256, _ = self.file_digest(source)
+        return self.lookup(sha256, kind, owner), sha256
+
+    async def afind(self, client, kind, owner, source):
+        """
+        Async variant of find; URLs are checked with a HEAD through `client`.
+        """
+        if not self.enabled:
+            return None, None
+        if _is_remote(source):
+            try:
+                response = await client.head(source, follow_redirects=True, timeout=MEDIA_SOURCE_TIMEOUT)
+            except Exception as e:
+                print(f"Could not check {source} for reuse: {e}")
+                return None, None
+            return await asyncio.to_thread(self._find_url, kind, owner, source, response.headers), None
+        if not os.path.exists(source):
+            return None, None
+        return await asyncio.to_thread(self.find, kind, owner, source)
+
+    def _find_url(self, kind, owner, url, headers):
+        validator = source_validator(headers)
+        sha256 = self._source_hash(f"url:{url}:{validator}") if validator else None
+        if sha256 is None:
+            cache_requests.inc("media", "miss")
+            return None
+        return self.lookup(sha256, kind, owner)
+
+    def record_upload(self, kind, owner, source, asset, sha256=None, digest=None):
+        """
+        Records a finished upload, from a local file's hash or the StreamDigest of a relayed URL.
+        """
+        if digest is not None:
+            sha256 = digest.hexdigest()
+            if digest.validator:
+                self.remember_source(f"url:{source}:{digest.validator}", sha256)
+            size = digest.size
+        else:
+            size = os.path.getsize(source) if sha256 else 0
+        self.record(sha256, kind, owner, asset, size)
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            assets, hits, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(size), 0) FROM media_assets WHERE expires_at > ?",
+                (time.time(),),
+            ).fetchone()
+        return {"enabled": self.enabled, "assets": assets, "reuses": hits, "bytes": size, "ttl": self.ttl}
+
+
+media_registry = MediaRegistry()
@@ -0,0 +1,282 @@
+# publish_queue.py
+import asyncio
+import contextvars
+import json
+import os
+import sqlite3
+import time
+import uuid
+import httpx
+from dotenv import load_dotenv
+from agents.cassette import cassette
+
+load_dotenv()
+
+PUBLISH_QUEUE_PATH = os.getenv("PUBLISH_QUEUE_PATH", os.path.join(os.getenv("CACHE_DIR", ".cache"), "publish_queue.sqlite"))
+PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", 4))
+PUBLISH_MAX_ATTEMPTS = int(os.getenv("PUBLISH_MAX_ATTEMPTS", 3)) # Across restarts: a job interrupted this often is failed instead of requeued
+PUBLISH_POLL_INTERVAL = float(os.getenv("PUBLISH_POLL_INTERVAL", 5))
+PUBLISH_JOB_RETENTION = float(os.getenv("PUBLISH_JOB_RETENTION", 7 * 24 * 60 * 60))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", 10))
+PUBLISH_LEASE_TTL = float(os.getenv("PUBLISH_LEASE_TTL", 60)) # A running job whose lease is not renewed within this is taken back
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# (queue, job id) of the publish job the current task is running
+current_job = contextvars.ContextVar("current_job", default=None)
+
+
+async def mark_posting(request: httpx.Request):
+    """
+    httpx request hook for the LinkedIn client: flags the running publish job
+    before its ugcPosts call goes out. The post may exist from then on, so an
+    interrupted job with the flag is failed instead of posted again.
+    """
+    job = current_job.get()
+    if job is not None and request.method == "POST" and request.url.path.startswith("/v2/ugcPosts"):
+        queue, job_id = job
+        await asyncio.to_thread(queue._mark_posting, job_id)
+
+
+class PublishQueue:
+    """
+    Durable publish job queue stored in SQLite, drained by a pool of asyncio workers.
+
+    Jobs are (kind, payload) pairs handed to the `handler` coroutine; its return value
+    is stored as the job result, and a None result (how the upload tools report
+    failure) or an exception fails the job.
+
+    A running job is leased to the process running it and the lease is renewed
+    while it runs, so several uvicorn workers or replicas can share one queue file.
+    A job whose lease expired (its process crashed or hung) is taken back: requeued
+    if it never reached its ugcPosts call, failed if it did, since the post may
+    already be live and posting again would publish it twice.
+    """
+
+    def __init__(self, handler, path=PUBLISH_QUEUE_PATH, workers=PUBLISH_WORKERS, max_attempts=PUBLISH_MAX_ATTEMPTS, poll_interval=PUBLISH_POLL_INTERVAL, lease_ttl=PUBLISH_LEASE_TTL):
+        self.handler = handler
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease_ttl = lease_ttl
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._webhook_client = None
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS publish_jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+                "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "result TEXT, error TEXT, webhook_url TEXT, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+                "owner TEXT, lease_expires_at REAL, posting_at REAL)"
+            )
+            # Queue files created before leases existed
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(publish_jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_expires_at", "REAL"), ("posting_at", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE publish_jobs ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS publish_jobs_status ON publish_jobs (status, created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    # Storage: plain blocking calls, run off the event loop via asyncio.to_thread
+
+    def _insert(self, kind, payload, webhook_url):
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO publish_jobs (id, kind, payload, status, webhook_url, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), QUEUED, webhook_url, time.time()),
+            )
+        return job_id
+
+    def _claim(self):
+        """
+        Atomically take back expired leases, then move the oldest queued job to
+        running under a lease owned by this process. Returns None when the queue is empty.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._reclaim_expired(conn)
+            row = conn.execute(
+                "SELECT id, kind, payload, webhook_url FROM publish_jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (QUEUED,),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE publish_jobs SET status = ?, attempts = attempts + 1, started_at = ?, "
+                    "owner = ?, lease_expires_at = ?, posting_at = NULL WHERE id = ?",
+                    (RUNNING, time.time(), self.owner, time.time() + self.lease_ttl, row[0]),
+                )
+            conn.commit()
+            return row
+        finally:
+            conn.close()
+
+    def _renew(self, job_id):
+        """
+        Extends this process's lease on a running job; False if the lease was lost.
+        """
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE publish_jobs SET lease_expires_at = ? WHERE id = ? AND owner = ? AND status = ?",
+                (time.time() + self.lease_ttl, job_id, self.owner, RUNNING),
+            ).rowcount == 1
+
+    def _mark_posting(self, job_id):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE publish_jobs SET posting_at = ? WHERE id = ? AND owner = ? AND status = ?",
+                (time.time(), job_id, self.owner, RUNNING),
+            )
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE publish_jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_expires_at = NULL "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id, self.owner, RUNNING),
+            )
+
+    def _take_back(self, conn, condition, params):
+        """
+        Ends the running jobs matching `condition`: fails the ones that reached their
+        ugcPosts call or keep getting interrupted, requeues the rest. Returns the number requeued.
+        """
+        now = time.time()
+        conn.execute(
+            f"UPDATE publish_jobs SET status = ?, error = ?, finished_at = ?, lease_expires_at = NULL "
+            f"WHERE status = ? AND posting_at IS NOT NULL AND {condition}",
+            (FAILED, "Interrupted after its ugcPosts call was sent; check LinkedIn before posting it again", now, RUNNING, *params),
+        )
+        conn.execute(
+            f"UPDATE publish_jobs SET status = ?, error = ?, finished_at = ?, lease_expires_at = NULL "
+            f"WHERE status = ? AND attempts >= ? AND {condition}",
+            (FAILED, "Interrupted too many times", now, RUNNING, self.max_attempts, *params),
+        )
+        return conn.execute(
+            f"UPDATE publish_jobs SET status = ?, owner = NULL, lease_expires_at = NULL WHERE status = ? AND {condition}",
+            (QUEUED, RUNNING, *params),
+        ).rowcount
+
+    def _reclaim_expired(self, conn):
+        # Jobs from before leases existed have none and count as expired
+        requeued = self._take_back(conn, "(lease_expires_at IS NULL OR lease_expires_at < ?)", (time.time(),))
+        if requeued:
+            print(f"Requeued {requeued} publish jobs whose lease expired")
+
+    def _release(self):
+        """
+        Gives up this process's running jobs on shutdown instead of waiting for their leases to expire.
+        """
+        with self._connect() as conn:
+            return self._take_back(conn, "owner = ?", (self.owner,))
+
+    def _recover(self):
+        """
+        Takes back expired leases and drops finished jobs past the retention window.
+        Live jobs of other processes keep running.
+        """
+        with self._connect() as conn:
+            self._reclaim_expired(conn)
+            conn.execute(
+                "DELETE FROM publish_jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, time.time() - PUBLISH_JOB_RETENTION),
+            )
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM publish_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job.pop("payload")
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM publish_jobs GROUP BY status").fetchall()
+        return {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0, **dict(rows)}
+
+    # Async API
+
+    async def enqueue(self, kind, payload, webhook_url=None):
+        job_id = await asyncio.to_thread(self._insert, kind, payload, webhook_url)
+        self._wakeup.set()
+        return job_id
+
+    async def start(self):
+        await asyncio.to_thread(self._recover)
+        self._webhook_client = httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT, transport=cassette.transport())
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """
+        Cancel the workers and give up the jobs they were running, as if their leases had expired.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        requeued = await asyncio.to_thread(self._release)
+        if requeued:
+            print(f"Requeued {requeued} interrupted publish jobs")
+        if self._webhook_client is not None:
+            await self._webhook_client.aclose()
+
+    async def _worker(self):
+        while True:
+            # Clear before claiming so an enqueue racing with an empty claim is not missed
+            self._wakeup.clear()
+            row = await asyncio.to_thread(self._claim)
+            if row is None:
+                try:
+                    # Enqueues wake the workers; the poll picks up jobs added by other processes
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(*row)
+
+    async def _run(self, job_id, kind, payload, webhook_url):
+        token = current_job.set((self, job_id))
+        renewer = asyncio.create_task(self._keep_lease(job_id))
+        try:
+            result = await self.handler(kind, json.loads(payload))
+        except Exception as e:
+            print(f"Publish job {job_id} failed: {e}")
+            status, result, error = FAILED, None, str(e)
+        else:
+            status, error = (SUCCEEDED, None) if result is not None else (FAILED, "LinkedIn upload failed")
+        finally:
+            renewer.cancel()
+            current_job.reset(token)
+        await asyncio.to_thread(self._finish, job_id, status, result, error)
+        if webhook_url:
+            await self._notify(webhook_url, await asyncio.to_thread(self.get, job_id))
+
+    async def _keep_lease(self, job_id):
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            if not await asyncio.to_thread(self._renew, job_id):
+                print(f"Lost the lease on publish job {job_id}; another process may have taken it back")
+                return
+
+    async def _notify(self, webhook_url, job):
+        try:
+            response = await self._webhook_client.post(webhook_url, json=job)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"Webhook {webhook_url} failed for publish job {job['id']}: {e}")
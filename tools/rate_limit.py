@@ -0,0 +1,292 @@
+# rate_limit.py
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import httpx
+import requests
+from dotenv import load_dotenv
+from agents.metrics import (
+    linkedin_request_latency, linkedin_upload_bytes, linkedin_rate_limit_tokens, linkedin_rate_limit_paused,
+    linkedin_rate_limit_waits, linkedin_rate_limit_wait_seconds, linkedin_retries, linkedin_throttled,
+)
+
+load_dotenv()
+
+# Sustained requests per second and burst size for each endpoint class, and for each member (OAuth token)
+LINKEDIN_UGC_POSTS_RATE = float(os.getenv("LINKEDIN_UGC_POSTS_RATE", 1))
+LINKEDIN_UGC_POSTS_BURST = int(os.getenv("LINKEDIN_UGC_POSTS_BURST", 5))
+LINKEDIN_ASSETS_RATE = float(os.getenv("LINKEDIN_ASSETS_RATE", 5))
+LINKEDIN_ASSETS_BURST = int(os.getenv("LINKEDIN_ASSETS_BURST", 10))
+LINKEDIN_UPLOAD_RATE = float(os.getenv("LINKEDIN_UPLOAD_RATE", 10))
+LINKEDIN_UPLOAD_BURST = int(os.getenv("LINKEDIN_UPLOAD_BURST", 20))
+LINKEDIN_API_RATE = float(os.getenv("LINKEDIN_API_RATE", 5)) # Any other LinkedIn API call (e.g. userinfo)
+LINKEDIN_API_BURST = int(os.getenv("LINKEDIN_API_BURST", 10))
+LINKEDIN_MEMBER_RATE = float(os.getenv("LINKEDIN_MEMBER_RATE", 10))
+LINKEDIN_MEMBER_BURST = int(os.getenv("LINKEDIN_MEMBER_BURST", 30))
+
+LINKEDIN_MAX_RETRIES = int(os.getenv("LINKEDIN_MAX_RETRIES", 4))
+LINKEDIN_BACKOFF_BASE = float(os.getenv("LINKEDIN_BACKOFF_BASE", 0.5))
+LINKEDIN_BACKOFF_MAX = float(os.getenv("LINKEDIN_BACKOFF_MAX", 30))
+
+# 500 is left out: the request may have been applied. Gateway errors can also come back after
+# the request was applied, so a ugcPosts call, which could publish twice, only retries statuses
+# that say the post was not made: 429, and 503 with a Retry-After.
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Callers reserve a token and get back how long to
+    wait before using it, so the lock is never held while sleeping and the same
+    bucket serves both the sync and the async clients. `labels` (scope, name)
+    identify the bucket in the metrics.
+    """
+
+    def __init__(self, rate: float, burst: int, labels=("endpoint", "default")):
+        self.labels = tuple(labels)
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Tokens may go negative: each caller queues behind the ones already waiting
+            self.tokens -= 1
+            delay = max(-self.tokens / self.rate, self.paused_until - now, 0.0)
+            if delay:
+                self.waits += 1
+                self.wait_seconds += delay
+        if delay:
+            linkedin_rate_limit_waits.inc(*self.labels)
+            linkedin_rate_limit_wait_seconds.inc(*self.labels, amount=delay)
+        return delay
+
+    def pause(self, seconds: float):
+        """
+        Hold every caller for `seconds`, e.g. after a 429 with Retry-After.
+        """
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "available": round(self.tokens, 3),
+                "paused_for": round(max(self.paused_until - now, 0.0), 3),
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 3),
+            }
+
+
+class LinkedInRateLimiter:
+    """
+    Rate limits shared by every LinkedIn call: one token bucket per endpoint class
+    (ugcPosts, assets, binary upload, other API calls) and one per member, keyed by
+    the OAuth token. Requests without an Authorization header (image downloads,
+    webhooks) are not LinkedIn calls and pass through untouched.
+    """
+
+    def __init__(self):
+        self.buckets = {
+            "ugcPosts": TokenBucket(LINKEDIN_UGC_POSTS_RATE, LINKEDIN_UGC_POSTS_BURST, ("endpoint", "ugcPosts")),
+            "assets": TokenBucket(LINKEDIN_ASSETS_RATE, LINKEDIN_ASSETS_BURST, ("endpoint", "assets")),
+            "upload": TokenBucket(LINKEDIN_UPLOAD_RATE, LINKEDIN_UPLOAD_BURST, ("endpoint", "upload")),
+            "api": TokenBucket(LINKEDIN_API_RATE, LINKEDIN_API_BURST, ("endpoint", "api")),
+        }
+        self.members = {}
+        self.throttled = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def classify(url: str) -> str:
+        path = urlsplit(str(url)).path
+        if path.startswith("/v2/ugcPosts"):
+            return "ugcPosts"
+        if path.startswith("/v2/assets"):
+            return "assets"
+        if path.startswith("/v2/") or path.startswith("/rest/"):
+            return "api"
+        # Upload URLs handed out by registerUpload live outside the versioned API
+        return "upload"
+
+    def _member(self, authorization: str) -> TokenBucket:
+        member = hashlib.sha256(authorization.encode("utf-8")).hexdigest()[:12]
+        with self._lock:
+            if member not in self.members:
+                self.members[member] = TokenBucket(LINKEDIN_MEMBER_RATE, LINKEDIN_MEMBER_BURST, ("member", member))
+            return self.members[member]
+
+    def buckets_for(self, url, headers) -> list:
+        authorization = headers.get("Authorization")
+        if not authorization:
+            return []
+        return [self.buckets[self.classify(url)], self._member(authorization)]
+
+    def observe(self, url, headers, elapsed: float):
+        """
+        Records latency and body size for LinkedIn calls. Streamed bodies without a
+        Content-Length (e.g. chunked image relays) only contribute latency.
+        """
+        if "Authorization" not in headers:
+            return
+        endpoint = self.classify(url)
+        linkedin_request_latency.observe(elapsed, endpoint)
+        if headers.get("Content-Length"):
+            linkedin_upload_bytes.observe(int(headers["Content-Length"]), endpoint)
+
+    def should_retry(self, url, status_code, headers) -> bool:
+        if status_code not in RETRY_STATUSES:
+            return False
+        if self.classify(url) != "ugcPosts":
+            return True
+        return status_code == 429 or (status_code == 503 and headers.get("Retry-After") is not None)
+
+    @staticmethod
+    def reserve(buckets) -> float:
+        return max((bucket.reserve() for bucket in buckets), default=0.0)
+
+    def retry_delay(self, status_code, headers, attempt, buckets=()) -> float:
+        """
+        Delay before retrying a throttled or failed request: Retry-After when the
+        API sends one (also pausing the request's buckets), otherwise jittered
+        exponential backoff.
+        """
+        with self._lock:
+            self.retries += 1
+            if status_code == 429:
+                self.throttled += 1
+        linkedin_retries.inc(str(status_code))
+        if status_code == 429:
+            linkedin_throttled.inc()
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            for bucket in buckets:
+                bucket.pause(retry_after)
+            return retry_after
+        return random.uniform(0, min(LINKEDIN_BACKOFF_MAX, LINKEDIN_BACKOFF_BASE * 2 ** attempt))
+
+    def levels(self, field: str) -> dict:
+        """
+        One stats() field of every bucket, keyed by the bucket's metric labels.
+        """
+        with self._lock:
+            buckets = [*self.buckets.values(), *self.members.values()]
+        return {bucket.labels: bucket.stats()[field] for bucket in buckets}
+
+    def stats(self) -> dict:
+        with self._lock:
+            members = dict(self.members)
+        return {
+            "endpoints": {name: bucket.stats() for name, bucket in self.buckets.items()},
+            "members": {member: bucket.stats() for member, bucket in members.items()},
+            "throttled": self.throttled,
+            "retries": self.retries,
+        }
+
+
+def parse_retry_after(value):
+    """
+    Retry-After is either a number of seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that waits for the request's buckets before sending and retries
+    429 and gateway errors. Streamed bodies (file and part uploads) cannot be replayed,
+    so they are rate limited but returned as-is for the caller to retry.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter, max_retries=LINKEDIN_MAX_RETRIES):
+        self.transport = transport
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        buckets = self.limiter.buckets_for(request.url, request.headers)
+        replayable = isinstance(request.stream, httpx.ByteStream)
+        attempt = 0
+        while True:
+            delay = self.limiter.reserve(buckets)
+            if delay:
+                await asyncio.sleep(delay)
+            start = time.perf_counter()
+            response = await self.transport.handle_async_request(request)
+            self.limiter.observe(request.url, request.headers, time.perf_counter() - start)
+            if not buckets or not replayable or attempt >= self.max_retries or not self.limiter.should_retry(request.url, response.status_code, response.headers):
+                return response
+            delay = self.limiter.retry_delay(response.status_code, response.headers, attempt, buckets)
+            await response.aclose()
+            print(f"LinkedIn returned {response.status_code} for {request.url.path}, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class RateLimitedAdapter(requests.adapters.HTTPAdapter):
+    """
+    requests counterpart of RateLimitedTransport for the synchronous tools.
+    """
+
+    def __init__(self, limiter, max_retries=LINKEDIN_MAX_RETRIES):
+        super().__init__()
+        self.limiter = limiter
+        self.retries = max_retries
+
+    def send(self, request, **kwargs):
+        buckets = self.limiter.buckets_for(request.url, request.headers)
+        replayable = request.body is None or isinstance(request.body, (bytes, str))
+        attempt = 0
+        while True:
+            delay = self.limiter.reserve(buckets)
+            if delay:
+                time.sleep(delay)
+            start = time.perf_counter()
+            response = super().send(request, **kwargs)
+            self.limiter.observe(request.url, request.headers, time.perf_counter() - start)
+            if not buckets or not replayable or attempt >= self.retries or not self.limiter.should_retry(request.url, response.status_code, response.headers):
+                return response
+            delay = self.limiter.retry_delay(response.status_code, response.headers, attempt, buckets)
+            response.close()
+            print(f"LinkedIn returned {response.status_code} for {urlsplit(request.url).path}, retrying in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+
+linkedin_rate_limiter = LinkedInRateLimiter()
+# The current budget is read at scrape time, since buckets refill between calls
+linkedin_rate_limit_tokens.set_function(lambda: linkedin_rate_limiter.levels("available"))
+linkedin_rate_limit_paused.set_function(lambda: linkedin_rate_limiter.levels("paused_for"))
@@ -1,25 +1,12 @@
-import requests
 import json
 import os
 from dotenv import load_dotenv
+from .http_client import LINKEDIN_API_BASE_URL, linkedin_session
 
 load_dotenv()
 
-def share_article(share_text, article_url, title=None, description=None, visibility="PUBLIC"):
-    """
-    Share an article on LinkedIn
-    
-    Parameters:
-    - share_text: The text commentary for your post
-    - article_url: The URL of the article to share
-    - title: Optional title for the article
-    - description: Optional description for the article
-    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
-    
-    Returns:
-    - Response from LinkedIn API
-    """
-    url = "https://api.linkedin.com/v2/ugcPosts"
+def _article_request(share_text, article_url, title, description, visibility):
+    url = f"{LINKEDIN_API_BASE_URL}/v2/ugcPosts"
     
     # Get authentication token from environment variables
     access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
@@ -73,10 +60,10 @@ def share_article(share_text, article_url, title=None, description=None, visibil
             "com.linkedin.ugc.MemberNetworkVisibility": visibility
         }
     }
-    
-    # Make the POST request
-    response = requests.post(url, headers=headers, data=json.dumps(payload))
-    
+    return url, headers, payload
+
+
+def _handle_article_response(response):
     # Check for successful response
     if response.status_code in [200, 201]:
         print(f"Article shared successfully! Status code: {response.status_code}")
@@ -90,6 +77,47 @@ def share_article(share_text, article_url, title=None, description=None, visibil
         print(response.text)
         return None
 
+
+def share_article(share_text, article_url, title=None, description=None, visibility="PUBLIC"):
+    """
+    Share an article on LinkedIn
+    
+    Parameters:
+    - share_text: The text commentary for your post
+    - article_url: The URL of the article to share
+    - title: Optional title for the article
+    - description: Optional description for the article
+    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    
+    Returns:
+    - Response from LinkedIn API
+    """
+    url, headers, payload = _article_request(share_text, article_url, title, description, visibility)
+    
+    # Make the POST request
+    response = linkedin_session.post(url, headers=headers, data=json.dumps(payload))
+    return _handle_article_response(response)
+
+
+async def ashare_article(client, share_text, article_url, title=None, description=None, visibility="PUBLIC"):
+    """
+    Async variant of share_article
+    
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - share_text: The text commentary for your post
+    - article_url: The URL of the article to share
+    - title: Optional title for the article
+    - description: Optional description for the article
+    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    
+    Returns:
+    - Response from LinkedIn API
+    """
+    url, headers, payload = _article_request(share_text, article_url, title, description, visibility)
+    response = await client.post(url, headers=headers, content=json.dumps(payload))
+    return _handle_article_response(response)
+
 # Example usage
 if __name__ == "__main__":
     # Example article post with the exact text from your example
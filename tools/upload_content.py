@@ -1,22 +1,33 @@
-from .upload_text import share_text_post
-from .upload_url import share_url_post
+from .upload_text import share_text_post, ashare_text_post
+from .upload_url import share_url_post, ashare_url_post
 from .upload_article import share_article
-from .upload_image import share_image_post
-from .upload_video import register_video, upload_video_binary
+from .upload_image import share_image_post, ashare_image_post
+from .upload_video import share_video_post, ashare_video_post
+from .http_client import create_linkedin_client, LINKEDIN_MAX_CONNECTIONS, LINKEDIN_MAX_KEEPALIVE, LINKEDIN_TIMEOUT
 import os
 
 class ContentUploader:
-    def __init__(self):
+    def __init__(self, max_connections=LINKEDIN_MAX_CONNECTIONS, max_keepalive=LINKEDIN_MAX_KEEPALIVE, timeout=LINKEDIN_TIMEOUT):
         self.access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
         self.user_id = os.getenv('LINKEDIN_USER_ID')
+        # One pooled keep-alive client for every async LinkedIn call
+        self.client = create_linkedin_client(max_connections, max_keepalive, timeout)
+
+    async def aclose(self):
+        await self.client.aclose()
 
     def upload_text_content(self,text_content,visibility):
         return share_text_post(text_content,visibility)
 
+    async def aupload_text_content(self, text_content, visibility):
+        return await ashare_text_post(self.client, text_content, visibility)
+
     def upload_url_content(self,share_text, url, title, visibility, description=None):
         return share_url_post(share_text, url, title, description, visibility)
-    
-    
+
+    async def aupload_url_content(self, share_text, url, title, visibility, description=None):
+        return await ashare_url_post(self.client, share_text, url, title, description, visibility)
+
     def upload_image_content(self, image_paths, share_text, visibility, titles=None, descriptions=None):
         return share_image_post(
             image_paths,
@@ -25,13 +36,33 @@ class ContentUploader:
             descriptions,
             visibility
         )
-    
-    def upload_video_content(self,video_path,share_text,title,visibility,description=None):
-        return share_image_post(
-            video_path,
+
+    async def aupload_image_content(self, image_paths, share_text, visibility, titles=None, descriptions=None):
+        return await ashare_image_post(
+            self.client,
+            image_paths,
             share_text,
             titles,
             descriptions,
             visibility
         )
-    
\ No newline at end of file
+
+    def upload_video_content(self,video_path,share_text,title,visibility,description=None):
+        return share_video_post(
+            video_path,
+            share_text,
+            title,
+            description,
+            visibility
+        )
+
+    async def aupload_video_content(self, video_path, share_text, title, visibility, description=None):
+        return await ashare_video_post(
+            self.client,
+            video_path,
+            share_text,
+            title,
+            description,
+            visibility
+        )
+
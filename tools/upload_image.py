@@ -1,10 +1,19 @@
 import requests
+import httpx
+import asyncio
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 from dotenv import load_dotenv
+from agents.cassette import http_session
+from .http_client import aiter_file, abounded_stream, FILE_CHUNK_SIZE, LINKEDIN_API_BASE_URL, LINKEDIN_UPLOAD_TIMEOUT, linkedin_session
+from .media_registry import media_registry, StreamDigest, source_validator
 
 load_dotenv()
 
+IMAGE_UPLOAD_CONCURRENCY = int(os.getenv("IMAGE_UPLOAD_CONCURRENCY", 4))
+
 def download_image(image_url, local_filename):
     """
     Downloads an image from a given URL and saves it to a local file.
@@ -18,7 +27,7 @@ def download_image(image_url, local_filename):
     """
     try:
         print(f"Attempting to download image from: {image_url}")
-        response = requests.get(image_url, stream=True)
+        response = http_session.get(image_url, stream=True)
         response.raise_for_status() # Raise an exception for HTTP errors
 
         with open(local_filename, 'wb') as file:
@@ -34,17 +43,8 @@ def download_image(image_url, local_filename):
         return None
 
 
-def register_image(user_id):
-    """
-    Step 1: Register an image to be uploaded to LinkedIn
-    
-    Parameters:
-    - user_id: Your LinkedIn user ID
-    
-    Returns:
-    - Dictionary containing uploadUrl and asset information
-    """
-    url = "https://api.linkedin.com/v2/assets?action=registerUpload"
+def _register_image_request(user_id):
+    url = f"{LINKEDIN_API_BASE_URL}/v2/assets?action=registerUpload"
     
     # Get authentication token from environment variables
     access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
@@ -72,10 +72,10 @@ def register_image(user_id):
             ]
         }
     }
-    
-    # Make the POST request
-    response = requests.post(url, headers=headers, data=json.dumps(payload))
-    
+    return url, headers, payload
+
+
+def _handle_register_image_response(response):
     # Check for successful response
     if response.status_code == 200:
         print("Image registration successful!")
@@ -95,26 +95,74 @@ def register_image(user_id):
         return None
 
 
-def upload_image_binary(upload_url, image_path):
+def register_image(user_id):
     """
-    Step 2: Upload the image binary file to LinkedIn
+    Step 1: Register an image to be uploaded to LinkedIn
     
     Parameters:
-    - upload_url: The URL provided by the registration step
-    - image_path: Path to the image file on your system
+    - user_id: Your LinkedIn user ID
     
     Returns:
-    - Boolean indicating success or failure
+    - Dictionary containing uploadUrl and asset information
     """
+    url, headers, payload = _register_image_request(user_id)
+    
+    # Make the POST request
+    response = linkedin_session.post(url, headers=headers, data=json.dumps(payload))
+    return _handle_register_image_response(response)
+
+
+async def aregister_image(client, user_id):
+    """
+    Async variant of register_image
+    
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - user_id: Your LinkedIn user ID
+    
+    Returns:
+    - Dictionary containing uploadUrl and asset information
+    """
+    url, headers, payload = _register_image_request(user_id)
+    response = await client.post(url, headers=headers, content=json.dumps(payload))
+    return _handle_register_image_response(response)
+
+
+def _upload_headers():
     # Get authentication token from environment variables
     access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
     if not access_token:
         raise ValueError("LinkedIn OAuth token not found in environment variables")
     
     # Set up headers
-    headers = {
+    return {
         "Authorization": f"Bearer {access_token}"
     }
+
+
+def _handle_upload_image_response(response):
+    # Check for successful response
+    if response.status_code in [200, 201]:
+        print("Image binary upload successful!")
+        return True
+    else:
+        print(f"Error uploading image binary: {response.status_code}")
+        print(response.text)
+        return False
+
+
+def upload_image_binary(upload_url, image_path):
+    """
+    Step 2: Upload the image binary file to LinkedIn
+    
+    Parameters:
+    - upload_url: The URL provided by the registration step
+    - image_path: Path to the image file on your system
+    
+    Returns:
+    - Boolean indicating success or failure
+    """
+    headers = _upload_headers()
     
     # Check if the image file exists
     if not os.path.exists(image_path):
@@ -124,47 +172,104 @@ def upload_image_binary(upload_url, image_path):
     # Open the image file in binary mode
     with open(image_path, 'rb') as image_file:
         # Make the POST request with the binary file
-        response = requests.post(upload_url, headers=headers, data=image_file)
+        response = linkedin_session.post(upload_url, headers=headers, data=image_file)
+    return _handle_upload_image_response(response)
+
+
+async def aupload_image_binary(client, upload_url, image_path):
+    """
+    Async variant of upload_image_binary, streaming the file in chunks
     
-    # Check for successful response
-    if response.status_code in [200, 201]:
-        print("Image binary upload successful!")
-        return True
-    else:
-        print(f"Error uploading image binary: {response.status_code}")
-        print(response.text)
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - upload_url: The URL provided by the registration step
+    - image_path: Path to the image file on your system
+    
+    Returns:
+    - Boolean indicating success or failure
+    """
+    headers = _upload_headers()
+    
+    # Check if the image file exists
+    if not os.path.exists(image_path):
+        print(f"Error: Image file not found at {image_path}")
         return False
+    
+    headers["Content-Length"] = str(os.path.getsize(image_path))
+    response = await client.post(upload_url, headers=headers, content=aiter_file(image_path), timeout=LINKEDIN_UPLOAD_TIMEOUT)
+    return _handle_upload_image_response(response)
 
 
-def create_image_share(user_id, asset, share_text, title=None, description=None, visibility="PUBLIC"):
+def _is_remote(image_path):
+    return image_path.startswith(("http://", "https://"))
+
+
+def upload_image_from_url(upload_url, image_url, digest=None):
     """
-    Step 3: Create the image share on LinkedIn
+    Step 2 (remote image): Stream an image from its URL straight into the LinkedIn upload
     
     Parameters:
-    - user_id: Your LinkedIn user ID
-    - asset: The asset URN from the registration step
-    - share_text: The text commentary for your post
-    - title: Optional title for the image
-    - description: Optional description for the image
-    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    - upload_url: The URL provided by the registration step
+    - image_url: The URL of the source image
+    - digest: Optional StreamDigest that hashes the bytes as they are relayed
     
     Returns:
-    - Response from LinkedIn API
+    - Boolean indicating success or failure
     """
-    url = "https://api.linkedin.com/v2/ugcPosts"
-    
-    # Get authentication token from environment variables
-    access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
-    if not access_token:
-        raise ValueError("LinkedIn OAuth token not found in environment variables")
+    headers = _upload_headers()
+    try:
+        with http_session.get(image_url, stream=True, timeout=LINKEDIN_UPLOAD_TIMEOUT) as source:
+            source.raise_for_status()
+            # The source body is relayed chunk by chunk; nothing touches the disk
+            chunks = source.iter_content(chunk_size=FILE_CHUNK_SIZE)
+            if digest is not None:
+                digest.validator = source_validator(source.headers)
+                chunks = digest.wrap(chunks)
+            response = linkedin_session.post(upload_url, headers=headers, data=chunks)
+    except requests.exceptions.RequestException as e:
+        print(f"Error downloading image from {image_url}: {e}")
+        return False
+    return _handle_upload_image_response(response)
+
+
+async def aupload_image_from_url(client, upload_url, image_url, digest=None):
+    """
+    Async variant of upload_image_from_url. The download runs ahead of the upload
+    through a bounded buffer, so neither waits on the other and memory stays bounded.
     
-    # Set up headers
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-        "X-Restli-Protocol-Version": "2.0.0"
-    }
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - upload_url: The URL provided by the registration step
+    - image_url: The URL of the source image
+    - digest: Optional StreamDigest that hashes the bytes as they are relayed
     
+    Returns:
+    - Boolean indicating success or failure
+    """
+    headers = _upload_headers()
+    try:
+        async with client.stream("GET", image_url, timeout=LINKEDIN_UPLOAD_TIMEOUT) as source:
+            source.raise_for_status()
+            # The length is only known up front when the body is not content-encoded
+            if "Content-Length" in source.headers and "Content-Encoding" not in source.headers:
+                headers["Content-Length"] = source.headers["Content-Length"]
+            chunks = source.aiter_bytes(FILE_CHUNK_SIZE)
+            if digest is not None:
+                digest.validator = source_validator(source.headers)
+                chunks = digest.awrap(chunks)
+            response = await client.post(
+                upload_url,
+                headers=headers,
+                content=abounded_stream(chunks),
+                timeout=LINKEDIN_UPLOAD_TIMEOUT
+            )
+    except httpx.HTTPError as e:
+        print(f"Error downloading image from {image_url}: {e}")
+        return False
+    return _handle_upload_image_response(response)
+
+
+def _media_object(asset, title=None, description=None):
     # Prepare the media object
     media = {
         "status": "READY",
@@ -182,6 +287,23 @@ def create_image_share(user_id, asset, share_text, title=None, description=None,
         media["description"] = {
             "text": description
         }
+    return media
+
+
+def _image_share_request(user_id, media_assets, share_text, visibility):
+    url = f"{LINKEDIN_API_BASE_URL}/v2/ugcPosts"
+    
+    # Get authentication token from environment variables
+    access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
+    if not access_token:
+        raise ValueError("LinkedIn OAuth token not found in environment variables")
+    
+    # Set up headers
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json",
+        "X-Restli-Protocol-Version": "2.0.0"
+    }
     
     # Prepare the post payload
     payload = {
@@ -193,17 +315,17 @@ def create_image_share(user_id, asset, share_text, title=None, description=None,
                     "text": share_text
                 },
                 "shareMediaCategory": "IMAGE",
-                "media": [media]
+                "media": media_assets
             }
         },
         "visibility": {
             "com.linkedin.ugc.MemberNetworkVisibility": visibility
         }
     }
-    
-    # Make the POST request
-    response = requests.post(url, headers=headers, data=json.dumps(payload))
-    
+    return url, headers, payload
+
+
+def _handle_image_share_response(response):
     # Check for successful response
     if response.status_code in [200, 201]:
         print(f"Image share created successfully! Status code: {response.status_code}")
@@ -218,20 +340,50 @@ def create_image_share(user_id, asset, share_text, title=None, description=None,
         return None
 
 
-def share_image_post(image_paths, share_text, titles=None, descriptions=None, visibility="PUBLIC"):
+def create_image_share(user_id, asset, share_text, title=None, description=None, visibility="PUBLIC"):
     """
-    Complete process to share multiple images in a single LinkedIn post.
-
+    Step 3: Create the image share on LinkedIn
+    
     Parameters:
-    - image_paths: List of image file paths (local paths, not URLs)
+    - user_id: Your LinkedIn user ID
+    - asset: The asset URN from the registration step
     - share_text: The text commentary for your post
-    - titles: Optional list of titles (same length as image_paths or None)
-    - descriptions: Optional list of descriptions (same length as image_paths or None)
+    - title: Optional title for the image
+    - description: Optional description for the image
     - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    
+    Returns:
+    - Response from LinkedIn API
+    """
+    url, headers, payload = _image_share_request(user_id, [_media_object(asset, title, description)], share_text, visibility)
+    
+    # Make the POST request
+    response = linkedin_session.post(url, headers=headers, data=json.dumps(payload))
+    return _handle_image_share_response(response)
 
+
+async def acreate_image_share(client, user_id, asset, share_text, title=None, description=None, visibility="PUBLIC"):
+    """
+    Async variant of create_image_share
+    
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - user_id: Your LinkedIn user ID
+    - asset: The asset URN from the registration step
+    - share_text: The text commentary for your post
+    - title: Optional title for the image
+    - description: Optional description for the image
+    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    
     Returns:
-    - Response from LinkedIn API or None if any step fails
+    - Response from LinkedIn API
     """
+    url, headers, payload = _image_share_request(user_id, [_media_object(asset, title, description)], share_text, visibility)
+    response = await client.post(url, headers=headers, content=json.dumps(payload))
+    return _handle_image_share_response(response)
+
+
+def _share_image_user_id(image_paths):
     # Get user ID from environment variables
     user_id = os.getenv('LINKEDIN_USER_ID')
     if not user_id:
@@ -239,77 +391,191 @@ def share_image_post(image_paths, share_text, titles=None, descriptions=None, vi
 
     if not image_paths or not isinstance(image_paths, list):
         raise ValueError("image_paths must be a non-empty list")
+    return user_id
 
-    media_assets = []
 
-    for idx, image_path in enumerate(image_paths):
-        # Step 1: Register the image
-        registration = register_image(user_id)
-        if not registration:
-            print(f"Failed to register image: {image_path}")
-            return None
+def _item_at(values, idx):
+    # Individual title/description if available
+    if values and idx < len(values) and values[idx]:
+        return values[idx]
+    return None
 
-        # Step 2: Upload the image binary
+
+class _ImageUploadFailed(Exception):
+    pass
+
+
+def _register_and_upload(user_id, image_path):
+    # Steps 1 and 2 for a single image, timed separately; skipped when the same bytes were uploaded before
+    start = time.perf_counter()
+    asset, sha256 = media_registry.find("image", user_id, image_path)
+    if asset:
+        return asset, _image_timing(image_path, start, time.perf_counter(), reused=True)
+    registration = register_image(user_id)
+    if not registration:
+        raise _ImageUploadFailed(f"Failed to register image: {image_path}")
+    registered = time.perf_counter()
+
+    digest = None
+    if _is_remote(image_path):
+        digest = StreamDigest()
+        upload_success = upload_image_from_url(registration["upload_url"], image_path, digest)
+    else:
         upload_success = upload_image_binary(registration["upload_url"], image_path)
+    if not upload_success:
+        raise _ImageUploadFailed(f"Failed to upload image: {image_path}")
+    media_registry.record_upload("image", user_id, image_path, registration["asset"], sha256, digest)
+    return registration["asset"], _image_timing(image_path, start, registered)
+
+
+async def _aregister_and_upload(client, user_id, image_path, semaphore):
+    async with semaphore:
+        start = time.perf_counter()
+        asset, sha256 = await media_registry.afind(client, "image", user_id, image_path)
+        if asset:
+            return asset, _image_timing(image_path, start, time.perf_counter(), reused=True)
+        registration = await aregister_image(client, user_id)
+        if not registration:
+            raise _ImageUploadFailed(f"Failed to register image: {image_path}")
+        registered = time.perf_counter()
+
+        digest = None
+        if _is_remote(image_path):
+            digest = StreamDigest()
+            upload_success = await aupload_image_from_url(client, registration["upload_url"], image_path, digest)
+        else:
+            upload_success = await aupload_image_binary(client, registration["upload_url"], image_path)
         if not upload_success:
-            print(f"Failed to upload image: {image_path}")
-            return None
+            raise _ImageUploadFailed(f"Failed to upload image: {image_path}")
+        await asyncio.to_thread(media_registry.record_upload, "image", user_id, image_path, registration["asset"], sha256, digest)
+    return registration["asset"], _image_timing(image_path, start, registered)
 
-        # Step 3: Add to media asset list
-        media_obj = {
-            "status": "READY",
-            "media": registration["asset"]
-        }
 
-        # Attach individual title/description if available
-        if titles and idx < len(titles) and titles[idx]:
-            media_obj["title"] = {"text": titles[idx]}
-        if descriptions and idx < len(descriptions) and descriptions[idx]:
-            media_obj["description"] = {"text": descriptions[idx]}
+def _image_timing(image_path, start, registered, reused=False):
+    done = time.perf_counter()
+    timing = {
+        "image": image_path,
+        "register_seconds": round(registered - start, 3),
+        "upload_seconds": round(done - registered, 3),
+        "reused": reused
+    }
+    if reused:
+        print(f"Image {image_path}: reusing an earlier upload, looked up in {timing['register_seconds']}s")
+    else:
+        print(f"Image {image_path}: registered in {timing['register_seconds']}s, uploaded in {timing['upload_seconds']}s")
+    return timing
+
+
+def _reused_assets(results):
+    return [asset for asset, timing in results if timing["reused"]]
+
 
-        media_assets.append(media_obj)
+def _image_post_result(result, timings):
+    # Attach per-image timings so callers can see where upload time goes
+    if result is not None:
+        result["image_timings"] = timings
+    return result
+
+
+def share_image_post(image_paths, share_text, titles=None, descriptions=None, visibility="PUBLIC", max_concurrency=IMAGE_UPLOAD_CONCURRENCY):
+    """
+    Complete process to share multiple images in a single LinkedIn post.
+    Images are registered and uploaded concurrently; the post keeps the input order.
+
+    Parameters:
+    - image_paths: List of local image paths or http(s) URLs (URLs are streamed, never written to disk)
+    - share_text: The text commentary for your post
+    - titles: Optional list of titles (same length as image_paths or None)
+    - descriptions: Optional list of descriptions (same length as image_paths or None)
+    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    - max_concurrency: Maximum number of images registered/uploaded at once
+
+    Returns:
+    - Response from LinkedIn API (with per-image timings) or None if any step fails
+    """
+    user_id = _share_image_user_id(image_paths)
+
+    # Steps 1 and 2 for every image
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        futures = [pool.submit(_register_and_upload, user_id, image_path) for image_path in image_paths]
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        failed = next((future for future in done if future.exception()), None)
+        if failed:
+            # Images not yet started are cancelled; in-flight ones finish on their own
+            pool.shutdown(wait=False, cancel_futures=True)
+            if isinstance(failed.exception(), _ImageUploadFailed):
+                print(failed.exception())
+                return None
+            raise failed.exception()
+        results = [future.result() for future in futures]
+
+    # Step 3: Add to media asset list, in input order
+    media_assets = [
+        _media_object(asset, _item_at(titles, idx), _item_at(descriptions, idx))
+        for idx, (asset, _) in enumerate(results)
+    ]
 
     # Step 4: Create the combined post with all media
-    url = "https://api.linkedin.com/v2/ugcPosts"
-    access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
-    if not access_token:
-        raise ValueError("LinkedIn OAuth token not found in environment variables")
+    url, headers, payload = _image_share_request(user_id, media_assets, share_text, visibility)
 
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-        "X-Restli-Protocol-Version": "2.0.0"
-    }
+    response = linkedin_session.post(url, headers=headers, data=json.dumps(payload))
+    result = _handle_image_share_response(response)
+    if result is None:
+        # A reused asset may have expired on LinkedIn's side; upload it again next time
+        for asset in _reused_assets(results):
+            media_registry.forget(asset)
+    return _image_post_result(result, [timing for _, timing in results])
 
-    payload = {
-        "author": f"urn:li:person:{user_id}",
-        "lifecycleState": "PUBLISHED",
-        "specificContent": {
-            "com.linkedin.ugc.ShareContent": {
-                "shareCommentary": {
-                    "text": share_text
-                },
-                "shareMediaCategory": "IMAGE",
-                "media": media_assets
-            }
-        },
-        "visibility": {
-            "com.linkedin.ugc.MemberNetworkVisibility": visibility
-        }
-    }
 
-    response = requests.post(url, headers=headers, data=json.dumps(payload))
+async def ashare_image_post(client, image_paths, share_text, titles=None, descriptions=None, visibility="PUBLIC", max_concurrency=IMAGE_UPLOAD_CONCURRENCY):
+    """
+    Async variant of share_image_post.
 
-    if response.status_code in [200, 201]:
-        print("Image share created successfully!")
-        post_id = response.headers.get('X-RestLi-Id')
-        if post_id:
-            print(f"Post ID: {post_id}")
-        return response.json()
-    else:
-        print(f"Error creating image share: {response.status_code}")
-        print(response.text)
-        return None
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - image_paths: List of local image paths or http(s) URLs (URLs are streamed, never written to disk)
+    - share_text: The text commentary for your post
+    - titles: Optional list of titles (same length as image_paths or None)
+    - descriptions: Optional list of descriptions (same length as image_paths or None)
+    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    - max_concurrency: Maximum number of images registered/uploaded at once
+
+    Returns:
+    - Response from LinkedIn API (with per-image timings) or None if any step fails
+    """
+    user_id = _share_image_user_id(image_paths)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # Steps 1 and 2 for every image; the first failure cancels the rest
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [
+                group.create_task(_aregister_and_upload(client, user_id, image_path, semaphore))
+                for image_path in image_paths
+            ]
+    except ExceptionGroup as errors:
+        error = errors.exceptions[0]
+        if isinstance(error, _ImageUploadFailed):
+            print(error)
+            return None
+        raise error
+    results = [task.result() for task in tasks]
+
+    # Step 3: Add to media asset list, in input order
+    media_assets = [
+        _media_object(asset, _item_at(titles, idx), _item_at(descriptions, idx))
+        for idx, (asset, _) in enumerate(results)
+    ]
+
+    # Step 4: Create the combined post with all media
+    url, headers, payload = _image_share_request(user_id, media_assets, share_text, visibility)
+
+    response = await client.post(url, headers=headers, content=json.dumps(payload))
+    result = _handle_image_share_response(response)
+    if result is None:
+        for asset in _reused_assets(results):
+            await asyncio.to_thread(media_registry.forget, asset)
+    return _image_post_result(result, [timing for _, timing in results])
 
 if __name__ == "__main__":
     # URL of the image you want to upload
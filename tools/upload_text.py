@@ -1,22 +1,12 @@
-import requests
 import json
 import os
 from dotenv import load_dotenv
+from .http_client import LINKEDIN_API_BASE_URL, linkedin_session
 
 load_dotenv()
 
-def share_text_post(text_content, visibility="PUBLIC"):
-    """
-    Share a text post on LinkedIn
-    
-    Parameters:
-    - text_content: The text content of your post
-    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
-    
-    Returns:
-    - Response from LinkedIn API
-    """
-    url = "https://api.linkedin.com/v2/ugcPosts"
+def _text_post_request(text_content, visibility):
+    url = f"{LINKEDIN_API_BASE_URL}/v2/ugcPosts"
     
 
     access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
@@ -51,10 +41,10 @@ def share_text_post(text_content, visibility="PUBLIC"):
             "com.linkedin.ugc.MemberNetworkVisibility": visibility
         }
     }
-    
-    # Make the POST request
-    response = requests.post(url, headers=headers, data=json.dumps(payload))
-    
+    return url, headers, payload
+
+
+def _handle_text_post_response(response):
     # Check for successful response
     if response.status_code in [200, 201]:
         print(f"Post shared successfully! Status code: {response.status_code}")
@@ -67,6 +57,41 @@ def share_text_post(text_content, visibility="PUBLIC"):
         print(response.text)
         return None
 
+
+def share_text_post(text_content, visibility="PUBLIC"):
+    """
+    Share a text post on LinkedIn
+    
+    Parameters:
+    - text_content: The text content of your post
+    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    
+    Returns:
+    - Response from LinkedIn API
+    """
+    url, headers, payload = _text_post_request(text_content, visibility)
+    
+    # Make the POST request
+    response = linkedin_session.post(url, headers=headers, data=json.dumps(payload))
+    return _handle_text_post_response(response)
+
+
+async def ashare_text_post(client, text_content, visibility="PUBLIC"):
+    """
+    Async variant of share_text_post
+    
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - text_content: The text content of your post
+    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    
+    Returns:
+    - Response from LinkedIn API
+    """
+    url, headers, payload = _text_post_request(text_content, visibility)
+    response = await client.post(url, headers=headers, content=json.dumps(payload))
+    return _handle_text_post_response(response)
+
 # Example usage
 if __name__ == "__main__":
     # Example post text
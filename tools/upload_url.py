@@ -1,25 +1,12 @@
-import requests
 import json
 import os
 from dotenv import load_dotenv
+from .http_client import LINKEDIN_API_BASE_URL, linkedin_session
 
 load_dotenv()
 
-def share_url_post(share_text, url, title=None, description=None, visibility="PUBLIC"):
-    """
-    Share a URL post on LinkedIn
-    
-    Parameters:
-    - share_text: The text commentary for your post
-    - url: The URL to share
-    - title: Optional title for the URL preview
-    - description: Optional description for the URL preview
-    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
-    
-    Returns:
-    - Response from LinkedIn API
-    """
-    url_endpoint = "https://api.linkedin.com/v2/ugcPosts"
+def _url_post_request(share_text, url, title, description, visibility):
+    url_endpoint = f"{LINKEDIN_API_BASE_URL}/v2/ugcPosts"
     
     # Get authentication token from environment variables
     access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
@@ -73,10 +60,10 @@ def share_url_post(share_text, url, title=None, description=None, visibility="PU
             "com.linkedin.ugc.MemberNetworkVisibility": visibility
         }
     }
-    
-    # Make the POST request
-    response = requests.post(url_endpoint, headers=headers, data=json.dumps(payload))
-    
+    return url_endpoint, headers, payload
+
+
+def _handle_url_post_response(response):
     # Check for successful response
     if response.status_code in [200, 201]:
         print(f"URL post shared successfully! Status code: {response.status_code}")
@@ -90,6 +77,47 @@ def share_url_post(share_text, url, title=None, description=None, visibility="PU
         print(response.text)
         return None
 
+
+def share_url_post(share_text, url, title=None, description=None, visibility="PUBLIC"):
+    """
+    Share a URL post on LinkedIn
+    
+    Parameters:
+    - share_text: The text commentary for your post
+    - url: The URL to share
+    - title: Optional title for the URL preview
+    - description: Optional description for the URL preview
+    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    
+    Returns:
+    - Response from LinkedIn API
+    """
+    url_endpoint, headers, payload = _url_post_request(share_text, url, title, description, visibility)
+    
+    # Make the POST request
+    response = linkedin_session.post(url_endpoint, headers=headers, data=json.dumps(payload))
+    return _handle_url_post_response(response)
+
+
+async def ashare_url_post(client, share_text, url, title=None, description=None, visibility="PUBLIC"):
+    """
+    Async variant of share_url_post
+    
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - share_text: The text commentary for your post
+    - url: The URL to share
+    - title: Optional title for the URL preview
+    - description: Optional description for the URL preview
+    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    
+    Returns:
+    - Response from LinkedIn API
+    """
+    url_endpoint, headers, payload = _url_post_request(share_text, url, title, description, visibility)
+    response = await client.post(url_endpoint, headers=headers, content=json.dumps(payload))
+    return _handle_url_post_response(response)
+
 # Example usage
 if __name__ == "__main__":
 
@@ -1,21 +1,25 @@
-import requests
+import asyncio
+import hashlib
 import json
+import mmap
 import os
+import time
+import httpx
+import requests
 from dotenv import load_dotenv
+from .http_client import aiter_file, LINKEDIN_API_BASE_URL, LINKEDIN_UPLOAD_TIMEOUT, linkedin_session
+from .rate_limit import linkedin_rate_limiter
+from .media_registry import media_registry
 
 load_dotenv()
 
-def register_video(user_id):
-    """
-    Step 1: Register a video to be uploaded to LinkedIn
-    
-    Parameters:
-    - user_id: Your LinkedIn user ID
-    
-    Returns:
-    - Dictionary containing uploadUrl and asset information
-    """
-    url = "https://api.linkedin.com/v2/assets?action=registerUpload"
+VIDEO_PART_CONCURRENCY = int(os.getenv("VIDEO_PART_CONCURRENCY", 4))
+VIDEO_PART_RETRIES = int(os.getenv("VIDEO_PART_RETRIES", 3))
+VIDEO_BUFFER_SIZE = int(os.getenv("VIDEO_BUFFER_SIZE", 256 * 1024))
+VIDEO_UPLOAD_STATE_DIR = os.getenv("VIDEO_UPLOAD_STATE_DIR", os.path.join(os.getenv("CACHE_DIR", ".cache"), "video_uploads"))
+
+def _register_video_request(user_id):
+    url = f"{LINKEDIN_API_BASE_URL}/v2/assets?action=registerUpload"
     
     # Get authentication token from environment variables
     access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
@@ -43,10 +47,10 @@ def register_video(user_id):
             ]
         }
     }
-    
-    # Make the POST request
-    response = requests.post(url, headers=headers, data=json.dumps(payload))
-    
+    return url, headers, payload
+
+
+def _handle_register_video_response(response):
     # Check for successful response
     if response.status_code == 200:
         print("Video registration successful!")
@@ -66,26 +70,74 @@ def register_video(user_id):
         return None
 
 
-def upload_video_binary(upload_url, video_path):
+def register_video(user_id):
     """
-    Step 2: Upload the video binary file to LinkedIn
+    Step 1: Register a video to be uploaded to LinkedIn
     
     Parameters:
-    - upload_url: The URL provided by the registration step
-    - video_path: Path to the video file on your system
+    - user_id: Your LinkedIn user ID
     
     Returns:
-    - Boolean indicating success or failure
+    - Dictionary containing uploadUrl and asset information
+    """
+    url, headers, payload = _register_video_request(user_id)
+    
+    # Make the POST request
+    response = linkedin_session.post(url, headers=headers, data=json.dumps(payload))
+    return _handle_register_video_response(response)
+
+
+async def aregister_video(client, user_id):
+    """
+    Async variant of register_video
+    
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - user_id: Your LinkedIn user ID
+    
+    Returns:
+    - Dictionary containing uploadUrl and asset information
     """
+    url, headers, payload = _register_video_request(user_id)
+    response = await client.post(url, headers=headers, content=json.dumps(payload))
+    return _handle_register_video_response(response)
+
+
+def _upload_headers():
     # Get authentication token from environment variables
     access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
     if not access_token:
         raise ValueError("LinkedIn OAuth token not found in environment variables")
     
     # Set up headers
-    headers = {
+    return {
         "Authorization": f"Bearer {access_token}"
     }
+
+
+def _handle_upload_video_response(response):
+    # Check for successful response
+    if response.status_code in [200, 201]:
+        print("Video binary upload successful!")
+        return True
+    else:
+        print(f"Error uploading video binary: {response.status_code}")
+        print(response.text)
+        return False
+
+
+def upload_video_binary(upload_url, video_path):
+    """
+    Step 2: Upload the video binary file to LinkedIn
+    
+    Parameters:
+    - upload_url: The URL provided by the registration step
+    - video_path: Path to the video file on your system
+    
+    Returns:
+    - Boolean indicating success or failure
+    """
+    headers = _upload_headers()
     
     # Check if the video file exists
     if not os.path.exists(video_path):
@@ -95,34 +147,36 @@ def upload_video_binary(upload_url, video_path):
     # Open the video file in binary mode
     with open(video_path, 'rb') as video_file:
         # Make the POST request with the binary file
-        response = requests.post(upload_url, headers=headers, data=video_file)
-    
-    # Check for successful response
-    if response.status_code in [200, 201]:
-        print("Video binary upload successful!")
-        return True
-    else:
-        print(f"Error uploading video binary: {response.status_code}")
-        print(response.text)
-        return False
+        response = linkedin_session.post(upload_url, headers=headers, data=video_file)
+    return _handle_upload_video_response(response)
 
 
-def create_video_share(user_id, asset, share_text, title=None, description=None, visibility="PUBLIC"):
+async def aupload_video_binary(client, upload_url, video_path):
     """
-    Step 3: Create the video share on LinkedIn
+    Async variant of upload_video_binary, streaming the file in chunks
     
     Parameters:
-    - user_id: Your LinkedIn user ID
-    - asset: The asset URN from the registration step
-    - share_text: The text commentary for your post
-    - title: Optional title for the video
-    - description: Optional description for the video
-    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - upload_url: The URL provided by the registration step
+    - video_path: Path to the video file on your system
     
     Returns:
-    - Response from LinkedIn API
+    - Boolean indicating success or failure
     """
-    url = "https://api.linkedin.com/v2/ugcPosts"
+    headers = _upload_headers()
+    
+    # Check if the video file exists
+    if not os.path.exists(video_path):
+        print(f"Error: Video file not found at {video_path}")
+        return False
+    
+    headers["Content-Length"] = str(os.path.getsize(video_path))
+    response = await client.post(upload_url, headers=headers, content=aiter_file(video_path), timeout=LINKEDIN_UPLOAD_TIMEOUT)
+    return _handle_upload_video_response(response)
+
+
+def _video_share_request(user_id, asset, share_text, title, description, visibility):
+    url = f"{LINKEDIN_API_BASE_URL}/v2/ugcPosts"
     
     # Get authentication token from environment variables
     access_token = os.getenv('LINKEDIN_OAUTH_TOKEN')
@@ -171,10 +225,10 @@ def create_video_share(user_id, asset, share_text, title=None, description=None,
             "com.linkedin.ugc.MemberNetworkVisibility": visibility
         }
     }
-    
-    # Make the POST request
-    response = requests.post(url, headers=headers, data=json.dumps(payload))
-    
+    return url, headers, payload
+
+
+def _handle_video_share_response(response):
     # Check for successful response
     if response.status_code in [200, 201]:
         print(f"Video share created successfully! Status code: {response.status_code}")
@@ -189,6 +243,461 @@ def create_video_share(user_id, asset, share_text, title=None, description=None,
         return None
 
 
+def create_video_share(user_id, asset, share_text, title=None, description=None, visibility="PUBLIC"):
+    """
+    Step 3: Create the video share on LinkedIn
+    
+    Parameters:
+    - user_id: Your LinkedIn user ID
+    - asset: The asset URN from the registration step
+    - share_text: The text commentary for your post
+    - title: Optional title for the video
+    - description: Optional description for the video
+    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    
+    Returns:
+    - Response from LinkedIn API
+    """
+    url, headers, payload = _video_share_request(user_id, asset, share_text, title, description, visibility)
+    
+    # Make the POST request
+    response = linkedin_session.post(url, headers=headers, data=json.dumps(payload))
+    return _handle_video_share_response(response)
+
+
+async def acreate_video_share(client, user_id, asset, share_text, title=None, description=None, visibility="PUBLIC"):
+    """
+    Async variant of create_video_share
+    
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - user_id: Your LinkedIn user ID
+    - asset: The asset URN from the registration step
+    - share_text: The text commentary for your post
+    - title: Optional title for the video
+    - description: Optional description for the video
+    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    
+    Returns:
+    - Response from LinkedIn API
+    """
+    url, headers, payload = _video_share_request(user_id, asset, share_text, title, description, visibility)
+    response = await client.post(url, headers=headers, content=json.dumps(payload))
+    return _handle_video_share_response(response)
+
+
+class _VideoUploadFailed(Exception):
+    pass
+
+
+def _register_video_multipart_request(user_id, file_size):
+    url, headers, payload = _register_video_request(user_id)
+    # Ask for LinkedIn's multipart mechanism; the response splits the file into parts
+    payload["registerUploadRequest"]["supportedUploadMechanism"] = ["MULTIPART_UPLOAD"]
+    payload["registerUploadRequest"]["fileSize"] = file_size
+    return url, headers, payload
+
+
+def _handle_register_video_multipart_response(response):
+    if response.status_code == 200:
+        print("Video multipart registration successful!")
+        result = response.json()["value"]
+        mechanisms = result["uploadMechanism"]
+        mechanism = mechanisms.get("com.linkedin.digitalmedia.uploading.MultipartUpload")
+        if mechanism is None:
+            single = mechanisms.get("com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest")
+            if single is None:
+                print(f"Error registering video: no supported upload mechanism in {sorted(mechanisms)}")
+                return None
+            # LinkedIn may answer a multipart registration (e.g. for a small file) with a single upload URL
+            print("LinkedIn returned a single upload URL, uploading the video in one request.")
+            return {"asset": result["asset"], "upload_url": single["uploadUrl"]}
+        return {
+            "asset": result["asset"],
+            "media_artifact": result["mediaArtifact"],
+            "metadata": mechanism["metadata"],
+            "parts": [
+                {
+                    "url": part["url"],
+                    "first_byte": part["byteRange"]["firstByte"],
+                    "last_byte": part["byteRange"]["lastByte"],
+                    "headers": part.get("headers", {}),
+                    "expires_at": part.get("urlExpiresAt")
+                }
+                for part in mechanism["partUploadRequests"]
+            ],
+            "responses": {}
+        }
+    else:
+        print(f"Error registering video: {response.status_code}")
+        print(response.text)
+        return None
+
+
+async def aregister_video_multipart(client, user_id, file_size):
+    """
+    Step 1 (multipart): Register a video for a multipart upload
+    
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - user_id: Your LinkedIn user ID
+    - file_size: Size of the video file in bytes
+    
+    Returns:
+    - Dictionary with the asset, media artifact, upload metadata and part upload requests,
+      or with the asset and upload_url if LinkedIn returned a single upload URL instead
+    """
+    url, headers, payload = _register_video_multipart_request(user_id, file_size)
+    response = await client.post(url, headers=headers, content=json.dumps(payload))
+    return _handle_register_video_multipart_response(response)
+
+
+def register_video_multipart(user_id, file_size):
+    """
+    Step 1 (multipart): Register a video for a multipart upload
+    
+    Parameters:
+    - user_id: Your LinkedIn user ID
+    - file_size: Size of the video file in bytes
+    
+    Returns:
+    - Dictionary with the asset, media artifact, upload metadata and part upload requests,
+      or with the asset and upload_url if LinkedIn returned a single upload URL instead
+    """
+    url, headers, payload = _register_video_multipart_request(user_id, file_size)
+    response = linkedin_session.post(url, headers=headers, data=json.dumps(payload))
+    return _handle_register_video_multipart_response(response)
+
+
+def _complete_multipart_request(registration):
+    url = f"{LINKEDIN_API_BASE_URL}/v2/assets?action=completeMultiPartUpload"
+    headers = _upload_headers()
+    headers["Content-Type"] = "application/json"
+    payload = {
+        "completeMultipartUploadRequest": {
+            "mediaArtifact": registration["media_artifact"],
+            "metadata": registration["metadata"],
+            "partUploadResponses": [registration["responses"][str(idx)] for idx in range(len(registration["parts"]))]
+        }
+    }
+    return url, headers, payload
+
+
+def _handle_complete_multipart_response(response):
+    if response.status_code in [200, 201]:
+        print("Video multipart upload completed!")
+        return True
+    print(f"Error completing video multipart upload: {response.status_code}")
+    print(response.text)
+    return False
+
+
+async def acomplete_multipart_upload(client, registration):
+    """
+    Step 2b (multipart): Tell LinkedIn every part has been uploaded
+    
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - registration: The multipart registration with every part response filled in
+    
+    Returns:
+    - Boolean indicating success or failure
+    """
+    url, headers, payload = _complete_multipart_request(registration)
+    response = await client.post(url, headers=headers, content=json.dumps(payload))
+    return _handle_complete_multipart_response(response)
+
+
+def complete_multipart_upload(registration):
+    """
+    Step 2b (multipart): Tell LinkedIn every part has been uploaded
+    
+    Parameters:
+    - registration: The multipart registration with every part response filled in
+    
+    Returns:
+    - Boolean indicating success or failure
+    """
+    url, headers, payload = _complete_multipart_request(registration)
+    response = linkedin_session.post(url, headers=headers, data=json.dumps(payload))
+    return _handle_complete_multipart_response(response)
+
+
+def _upload_state_path(video_path):
+    # Progress is tied to this exact file: same path, size and modification time
+    stat = os.stat(video_path)
+    key = hashlib.sha256(f"{os.path.abspath(video_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+    return os.path.join(VIDEO_UPLOAD_STATE_DIR, f"{key}.json")
+
+
+def _load_upload_state(state_path):
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path) as file:
+        registration = json.load(file)
+    # Part URLs expire; a stale registration cannot be resumed
+    now_ms = time.time() * 1000
+    if any(part["expires_at"] and part["expires_at"] < now_ms for part in registration["parts"]):
+        print("Saved video upload has expired part URLs, starting over.")
+        return None
+    return registration
+
+
+def _save_upload_state(state_path, content):
+    os.makedirs(VIDEO_UPLOAD_STATE_DIR, exist_ok=True)
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write(content)
+    os.replace(tmp_path, state_path)
+
+
+async def _asave_upload_state(state_path, registration, lock):
+    # Serialized on the loop, where parts are confirmed, and written in a worker thread one save at a time
+    async with lock:
+        await asyncio.to_thread(_save_upload_state, state_path, json.dumps(registration))
+
+
+async def _aiter_part(view, first_byte, last_byte, buffer_size):
+    # Only one buffer_size slice of the mmap is copied at a time, in a worker thread:
+    # the copy is where the file is paged in, and a page fault would block the loop
+    for offset in range(first_byte, last_byte + 1, buffer_size):
+        yield await asyncio.to_thread(bytes, view[offset:min(offset + buffer_size, last_byte + 1)])
+
+
+def _part_headers(part):
+    # Part URLs are presigned: the member's token is not needed, only the part's own headers
+    return {**part["headers"], "Content-Length": str(part["last_byte"] - part["first_byte"] + 1)}
+
+
+def _handle_part_response(response):
+    # Returns the part response on success, or the error and whether it is worth retrying
+    if response.status_code in [200, 201]:
+        return {"headers": {"ETag": response.headers.get("ETag")}, "httpStatusCode": response.status_code}, None, False
+    # Only server errors and throttling are worth retrying
+    retryable = response.status_code >= 500 or response.status_code == 429
+    return None, f"HTTP {response.status_code}: {response.text[:200]}", retryable
+
+
+async def _aupload_part(client, view, idx, part, buffer_size, retries):
+    headers = _part_headers(part)
+    # Without an Authorization header the client's transport does not rate limit the call, so take an upload token here
+    upload_bucket = [linkedin_rate_limiter.buckets["upload"]]
+    for attempt in range(retries + 1):
+        delay = linkedin_rate_limiter.reserve(upload_bucket)
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            response = await client.put(
+                part["url"],
+                headers=headers,
+                content=_aiter_part(view, part["first_byte"], part["last_byte"], buffer_size),
+                timeout=LINKEDIN_UPLOAD_TIMEOUT
+            )
+            result, error, retryable = _handle_part_response(response)
+            if result:
+                return result
+            if not retryable:
+                break
+            status_code, response_headers = response.status_code, response.headers
+        except httpx.TransportError as e:
+            error = str(e)
+            status_code, response_headers = None, {}
+        if attempt < retries:
+            # Streamed parts are not replayed by the client's transport, so back off (honouring Retry-After) here
+            delay = linkedin_rate_limiter.retry_delay(status_code, response_headers, attempt, upload_bucket)
+            print(f"Video part {idx} failed ({error}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+    raise _VideoUploadFailed(f"Video part {idx} failed after {attempt + 1} attempts: {error}")
+
+
+def _upload_part(view, idx, part, retries):
+    headers = _part_headers(part)
+    upload_bucket = [linkedin_rate_limiter.buckets["upload"]]
+    for attempt in range(retries + 1):
+        delay = linkedin_rate_limiter.reserve(upload_bucket)
+        if delay:
+            time.sleep(delay)
+        try:
+            # requests needs a sized body, so one part (not the whole file) is held in memory at a time
+            response = linkedin_session.put(
+                part["url"],
+                headers=headers,
+                data=bytes(view[part["first_byte"]:part["last_byte"] + 1]),
+                timeout=LINKEDIN_UPLOAD_TIMEOUT
+            )
+            result, error, retryable = _handle_part_response(response)
+            if result:
+                return result
+            if not retryable:
+                break
+            status_code, response_headers = response.status_code, response.headers
+        except requests.RequestException as e:
+            error = str(e)
+            status_code, response_headers = None, {}
+        if attempt < retries:
+            delay = linkedin_rate_limiter.retry_delay(status_code, response_headers, attempt, upload_bucket)
+            print(f"Video part {idx} failed ({error}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+    raise _VideoUploadFailed(f"Video part {idx} failed after {attempt + 1} attempts: {error}")
+
+
+def _video_file_size(video_path):
+    if not os.path.exists(video_path):
+        print(f"Error: Video file not found at {video_path}")
+        return None
+    file_size = os.path.getsize(video_path)
+    if file_size == 0:
+        print(f"Error: Video file is empty: {video_path}")
+        return None
+    return file_size
+
+
+def _pending_parts(registration):
+    pending = [idx for idx in range(len(registration["parts"])) if str(idx) not in registration["responses"]]
+    pending_bytes = sum(registration["parts"][idx]["last_byte"] - registration["parts"][idx]["first_byte"] + 1 for idx in pending)
+    return pending, pending_bytes
+
+
+def _upload_stats(asset, parts, pending, pending_bytes, elapsed):
+    throughput = pending_bytes / elapsed / (1024 * 1024) if elapsed else 0.0
+    print(f"Uploaded {pending_bytes} bytes in {pending} parts in {elapsed:.2f}s ({throughput:.2f} MB/s)")
+    return {
+        "asset": asset,
+        "parts": parts,
+        "resumed_parts": parts - pending,
+        "bytes_uploaded": pending_bytes,
+        "seconds": round(elapsed, 3),
+        "throughput_mb_per_s": round(throughput, 3)
+    }
+
+
+async def aupload_video_multipart(client, user_id, video_path, max_concurrency=VIDEO_PART_CONCURRENCY, buffer_size=VIDEO_BUFFER_SIZE, retries=VIDEO_PART_RETRIES):
+    """
+    Step 2 (multipart): Upload a video in parts, resuming from the last confirmed part
+    
+    Parts are read from an mmap of the file through a fixed-size buffer and uploaded
+    concurrently with per-part retry. Confirmed parts are saved to VIDEO_UPLOAD_STATE_DIR
+    so a failed upload of the same file picks up where it left off. If LinkedIn answers
+    the registration with a single upload URL, the file is streamed in one request.
+    
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - user_id: Your LinkedIn user ID
+    - video_path: Path to the video file on your system
+    - max_concurrency: Maximum number of parts uploaded at once
+    - buffer_size: Bytes read from the file per chunk
+    - retries: Retries per part for transport errors, 429 and 5xx responses
+    
+    Returns:
+    - Dictionary with the asset URN and upload throughput, or None if the upload fails
+    """
+    file_size = _video_file_size(video_path)
+    if not file_size:
+        return None
+
+    state_path = _upload_state_path(video_path)
+    state_lock = asyncio.Lock()
+    registration = await asyncio.to_thread(_load_upload_state, state_path)
+    if registration:
+        print(f"Resuming video upload: {len(registration['responses'])}/{len(registration['parts'])} parts already confirmed")
+    else:
+        registration = await aregister_video_multipart(client, user_id, file_size)
+        if not registration:
+            return None
+        if "upload_url" in registration:
+            start = time.perf_counter()
+            if not await aupload_video_binary(client, registration["upload_url"], video_path):
+                return None
+            return _upload_stats(registration["asset"], 1, 1, file_size, time.perf_counter() - start)
+        await _asave_upload_state(state_path, registration, state_lock)
+
+    pending, pending_bytes = _pending_parts(registration)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    start = time.perf_counter()
+
+    async def upload(idx, view):
+        async with semaphore:
+            registration["responses"][str(idx)] = await _aupload_part(client, view, idx, registration["parts"][idx], buffer_size, retries)
+            await _asave_upload_state(state_path, registration, state_lock)
+
+    with open(video_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            async with asyncio.TaskGroup() as group:
+                for idx in pending:
+                    group.create_task(upload(idx, view))
+        except ExceptionGroup as errors:
+            error = errors.exceptions[0]
+            if isinstance(error, _VideoUploadFailed):
+                print(f"{error}. {len(registration['responses'])}/{len(registration['parts'])} parts saved for resume.")
+                return None
+            raise error
+        finally:
+            view.release()
+
+    elapsed = time.perf_counter() - start
+    if not await acomplete_multipart_upload(client, registration):
+        return None
+    await asyncio.to_thread(os.remove, state_path)
+    return _upload_stats(registration["asset"], len(registration["parts"]), len(pending), pending_bytes, elapsed)
+
+
+def upload_video_multipart(user_id, video_path, retries=VIDEO_PART_RETRIES):
+    """
+    Step 2 (multipart): Upload a video in parts, resuming from the last confirmed part
+    
+    The synchronous counterpart of aupload_video_multipart: parts go up one at a time,
+    with the same per-part retry and the same saved progress, so either variant can
+    resume an upload the other started.
+    
+    Parameters:
+    - user_id: Your LinkedIn user ID
+    - video_path: Path to the video file on your system
+    - retries: Retries per part for transport errors, 429 and 5xx responses
+    
+    Returns:
+    - Dictionary with the asset URN and upload throughput, or None if the upload fails
+    """
+    file_size = _video_file_size(video_path)
+    if not file_size:
+        return None
+
+    state_path = _upload_state_path(video_path)
+    registration = _load_upload_state(state_path)
+    if registration:
+        print(f"Resuming video upload: {len(registration['responses'])}/{len(registration['parts'])} parts already confirmed")
+    else:
+        registration = register_video_multipart(user_id, file_size)
+        if not registration:
+            return None
+        if "upload_url" in registration:
+            start = time.perf_counter()
+            if not upload_video_binary(registration["upload_url"], video_path):
+                return None
+            return _upload_stats(registration["asset"], 1, 1, file_size, time.perf_counter() - start)
+        _save_upload_state(state_path, json.dumps(registration))
+
+    pending, pending_bytes = _pending_parts(registration)
+    start = time.perf_counter()
+    with open(video_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            for idx in pending:
+                registration["responses"][str(idx)] = _upload_part(view, idx, registration["parts"][idx], retries)
+                _save_upload_state(state_path, json.dumps(registration))
+        except _VideoUploadFailed as error:
+            print(f"{error}. {len(registration['responses'])}/{len(registration['parts'])} parts saved for resume.")
+            return None
+        finally:
+            view.release()
+
+    elapsed = time.perf_counter() - start
+    if not complete_multipart_upload(registration):
+        return None
+    os.remove(state_path)
+    return _upload_stats(registration["asset"], len(registration["parts"]), len(pending), pending_bytes, elapsed)
+
+
 def share_video_post(video_path, share_text, title=None, description=None, visibility="PUBLIC"):
     """
     Complete process to share a video post on LinkedIn
@@ -208,26 +717,80 @@ def share_video_post(video_path, share_text, title=None, description=None, visib
     if not user_id:
         raise ValueError("LinkedIn User ID not found in environment variables")
     
-    # Step 1: Register the video
-    registration = register_video(user_id)
-    if not registration:
-        return None
-    
-    # Step 2: Upload the video binary
-    upload_success = upload_video_binary(registration["upload_url"], video_path)
-    if not upload_success:
-        return None
+    # The same file uploaded recently is reused instead of registered and uploaded again
+    asset, sha256 = media_registry.find("video", user_id, video_path)
+    reused = asset is not None
+    if reused:
+        print(f"Reusing uploaded video asset {asset}")
+    else:
+        # Steps 1 and 2: Register and upload the video in parts, resuming an earlier attempt
+        upload = upload_video_multipart(user_id, video_path)
+        if not upload:
+            return None
+        asset = upload["asset"]
+        media_registry.record_upload("video", user_id, video_path, asset, sha256)
     
     # Step 3: Create the video share
     result = create_video_share(
         user_id=user_id,
-        asset=registration["asset"],
+        asset=asset,
         share_text=share_text,
         title=title,
         description=description,
         visibility=visibility
     )
+    if result is None and reused:
+        # The asset may have expired on LinkedIn's side; upload it again next time
+        media_registry.forget(asset)
+    
+    return result
+
+
+async def ashare_video_post(client, video_path, share_text, title=None, description=None, visibility="PUBLIC"):
+    """
+    Async variant of share_video_post, uploading the video's parts concurrently
+    
+    Parameters:
+    - client: The pooled httpx.AsyncClient owned by ContentUploader
+    - video_path: Path to the video file on your system
+    - share_text: The text commentary for your post
+    - title: Optional title for the video
+    - description: Optional description for the video
+    - visibility: Post visibility (PUBLIC, CONNECTIONS, or LOGGED_IN)
+    
+    Returns:
+    - Response from LinkedIn API (with upload stats) or None if any step fails
+    """
+    # Get user ID from environment variables
+    user_id = os.getenv('LINKEDIN_USER_ID')
+    if not user_id:
+        raise ValueError("LinkedIn User ID not found in environment variables")
     
+    # Steps 1 and 2: Register and upload the video in parts, unless the same file was uploaded recently
+    asset, sha256 = await media_registry.afind(client, "video", user_id, video_path)
+    if asset:
+        print(f"Reusing uploaded video asset {asset}")
+        upload = {"asset": asset, "reused": True}
+    else:
+        upload = await aupload_video_multipart(client, user_id, video_path)
+        if not upload:
+            return None
+        await asyncio.to_thread(media_registry.record_upload, "video", user_id, video_path, upload["asset"], sha256)
+    
+    # Step 3: Create the video share
+    result = await acreate_video_share(
+        client,
+        user_id=user_id,
+        asset=upload["asset"],
+        share_text=share_text,
+        title=title,
+        description=description,
+        visibility=visibility
+    )
+    if result is not None:
+        result["video_upload"] = upload
+    elif upload.get("reused"):
+        await asyncio.to_thread(media_registry.forget, asset)
     return result
 
 